@@ -3,20 +3,33 @@ Find API route: Accepts a video file and a query (text or voice), runs chunking,
 """
 
 import os
+import asyncio
 import tempfile
 import uuid
+import logging
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from fastapi.responses import JSONResponse
 from typing import List
 from ..services.whisper_service import WhisperCppService
 from ..services.clip_generator import ClipGenerator
+from ..services.transcript_index import TranscriptIndex, get_transcript_index_store, match_span, HYBRID_FUZZY_WEIGHT
 from ..utils.chunking import ChunkingStrategy
-import unicodedata
-import re
-from rapidfuzz import fuzz
+from ..utils.text_embedding import get_text_embedder
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["find"])
 
+# Seconds of context kept around the matched words or segment
+FIND_CLIP_PADDING = float(os.getenv("FIND_CLIP_PADDING", "0.5"))
+# Ask Whisper for word timings so clips can be cut to the matched words
+FIND_WORD_TIMESTAMPS = os.getenv("FIND_WORD_TIMESTAMPS", "1") not in ("0", "false", "False")
+# ClipGenerator rejects clips shorter than 2 seconds
+FIND_MIN_CLIP_SECONDS = 2.0
+# Concurrent clip cuts per text search; separate from find-by-image's FIND_CUT_CONCURRENCY
+FIND_TEXT_CUT_CONCURRENCY = int(os.getenv("FIND_TEXT_CUT_CONCURRENCY", "3"))
+SEARCH_MODES = ("fuzzy", "semantic", "hybrid")
+
 # Initialize services (reuse from process.py if possible)
 whisper_service = WhisperCppService()
 clip_generator = ClipGenerator()
@@ -28,94 +41,102 @@ async def find_clip(
     chunk_strategy: str = Form("adaptive"),
     max_results: int = Form(3),
     fuzzy: bool = Form(True),
-    language: str = Form("auto")  # Add language selection, default auto
+    language: str = Form("auto"),  # Add language selection, default auto
+    search_mode: str = Form("fuzzy")  # fuzzy (wording), semantic (meaning) or hybrid (both)
 ):
     """
     Accept a video file and a query, return matching video clips.
     """
+    if search_mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"search_mode must be one of {', '.join(SEARCH_MODES)}")
+
     # Save uploaded video to temp file
     with tempfile.NamedTemporaryFile(delete=False, suffix=f"_{video.filename}") as tmp_file:
         tmp_file.write(await video.read())
         temp_video_path = tmp_file.name
 
     try:
-        # Step 1: Chunk video into audio segments
-        chunks = ChunkingStrategy.chunk_video(temp_video_path, tempfile.gettempdir(), strategy=chunk_strategy)
-        if not chunks:
-            raise HTTPException(status_code=400, detail="Failed to chunk video.")
+        # Step 1: Reuse the transcript index of this video, or chunk and transcribe it once
+        store = get_transcript_index_store()
+        index_path = await asyncio.to_thread(store.index_path, temp_video_path, language, chunk_strategy)
+        index = await asyncio.to_thread(store.load, index_path)
+        if index is None:
+            chunks = ChunkingStrategy.chunk_video(temp_video_path, tempfile.gettempdir(), strategy=chunk_strategy)
+            if not chunks:
+                raise HTTPException(status_code=400, detail="Failed to chunk video.")
 
-        # Step 2: Transcribe each chunk (pass language to use Sarvam for Malayalam)
-        segments = []
-        for chunk in chunks:
-            result = await whisper_service.transcribe_audio(chunk["path"], language=language)
-            print(f"[FIND DEBUG] Sarvam result for chunk {chunk['path']}: {result}")
-            if result.get("segments"):
-                for seg in result["segments"]:
-                    segments.append({
-                        "start": seg.get("start"),
-                        "end": seg.get("end"),
-                        "text": seg.get("text"),
-                        "chunk_path": chunk["path"]
-                    })
-            elif result.get("text"):
-                # Sarvam returns the whole chunk as 'text'
-                segments.append({
-                    "start": None,
-                    "end": None,
-                    "text": result["text"],
-                    "chunk_path": chunk["path"]
-                })
-        print(f"[FIND DEBUG] Query: {query}")
-        for seg in segments:
-            print(f"[FIND DEBUG] Segment: {seg['text']}")
+            # Step 2: Transcribe each chunk (pass language to use Sarvam for Malayalam)
+            transcriptions = []
+            for chunk in chunks:
+                result = await whisper_service.transcribe_audio(chunk["path"], language=language,
+                                                                word_timestamps=FIND_WORD_TIMESTAMPS)
+                summary = result or {}
+                logger.debug(f"[find] Transcribed {os.path.basename(chunk['path'])}: "
+                             f"{len(summary.get('text') or '')} chars, {len(summary.get('segments') or [])} segments")
+                transcriptions.append(result)
+            index = TranscriptIndex.from_transcriptions(chunks, transcriptions)
+            await asyncio.to_thread(store.save, index_path, index)
+        logger.debug(f"[find] {len(query)}-char query against {len(index)} indexed segments")
 
-        # Step 3: Search for matching segments (robust Unicode/fuzzy match)
-        def normalize_text(text):
-            # For Malayalam and other Indic scripts, only NFC normalize and lowercase
-            return unicodedata.normalize('NFC', text).strip().lower()
+        # Step 3: Search for matching segments (n-gram candidates, then substring/fuzzy match)
+        # and narrow each to the matched words (or segment) plus padding
+        # (semantic modes: one cosine top-k over the segment embeddings, built once per video)
+        if search_mode == "fuzzy":
+            matches = index.search(query, limit=max_results, fuzzy=fuzzy)
+        else:
+            embedder = await asyncio.to_thread(get_text_embedder)
+            await asyncio.to_thread(store.load_embeddings, index_path, index, embedder)
+            fuzzy_weight = HYBRID_FUZZY_WEIGHT if search_mode == "hybrid" else 0.0
+            matches = await asyncio.to_thread(index.semantic_search, query, embedder, limit=max_results,
+                                              fuzzy_weight=fuzzy_weight)
 
-        query_norm = normalize_text(query)
-        matches = []
-        for seg in segments:
-            seg_norm = normalize_text(seg["text"])
-            # Fuzzy match: allow >80% similarity or substring
-            if query_norm in seg_norm or fuzz.partial_ratio(query_norm, seg_norm) > 80:
-                chunk = next((c for c in chunks if c["path"] == seg["chunk_path"]), None)
-                if chunk:
-                    matches.append({
-                        "chunk_start": chunk["start_time"],
-                        "chunk_end": chunk["end_time"],
-                        "segment_start": seg["start"],
-                        "segment_end": seg["end"],
-                        "text": seg["text"],
-                        "chunk_path": seg["chunk_path"]
-                    })
-        top_matches = matches[:max_results]
+        top_matches = []
+        for segment, score in matches:
+            # A paraphrase has no words to align with, so semantic matches keep the whole segment
+            span_query = query if search_mode != "semantic" else ""
+            clip_start, clip_end = match_span(segment, span_query, padding=FIND_CLIP_PADDING,
+                                              min_duration=FIND_MIN_CLIP_SECONDS)
+            top_matches.append({
+                "chunk_start": segment["chunk_start"],
+                "chunk_end": segment["chunk_end"],
+                "segment_start": segment["start"],
+                "segment_end": segment["end"],
+                "clip_start": clip_start,
+                "clip_end": clip_end,
+                "text": segment["text"],
+                "score": score
+            })
 
-        # Step 4: Generate video clips for matches
-        results = []
-        for idx, match in enumerate(top_matches):
+        # Step 4: Generate video clips for matches, several ffmpeg cuts at a time
+        semaphore = asyncio.Semaphore(FIND_TEXT_CUT_CONCURRENCY)
+
+        async def cut_match(idx, match):
             clip_data = {
-                "start_time": match["chunk_start"],
-                "end_time": match["chunk_end"],
+                "start_time": match["clip_start"],
+                "end_time": match["clip_end"],
                 "title": f"Find Clip {idx+1}"
             }
-            clip_info = await clip_generator._generate_single_clip(
-                video_path=temp_video_path,
-                clip_data=clip_data,
-                clip_number=idx,
-                fast_mode=False
-            )
+            async with semaphore:
+                return await clip_generator._generate_single_clip(
+                    video_path=temp_video_path,
+                    clip_data=clip_data,
+                    clip_number=idx,
+                    fast_mode=False
+                )
+
+        clip_infos = await asyncio.gather(*(cut_match(idx, match) for idx, match in enumerate(top_matches)))
+        results = []
+        for match, clip_info in zip(top_matches, clip_infos):
             if clip_info:
                 results.append({
                     "video_url": clip_info["url"],
                     "thumbnail_url": clip_info.get("thumbnail_url"),
-                    "start": match["chunk_start"],
-                    "end": match["chunk_end"],
+                    "start": match["clip_start"],
+                    "end": match["clip_end"],
                     "transcript": match["text"]
                 })
 
-        return JSONResponse({"results": results, "segments": segments})
+        return JSONResponse({"results": results, "segments": index.segments})
     finally:
         try:
             os.unlink(temp_video_path)
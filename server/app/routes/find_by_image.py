@@ -1,18 +1,16 @@
-import cv2
-import face_recognition
-import numpy as np
 import os
-import sys
-import threading
-import queue
-import time
+import uuid
 import shutil
+import asyncio
 import logging
-import subprocess # New: For FFmpeg
 
-from fastapi import APIRouter, File, UploadFile, HTTPException
+from fastapi import APIRouter, BackgroundTasks, File, UploadFile, HTTPException
 from fastapi.responses import JSONResponse
-from typing import List, Tuple, Dict, Any
+from pydantic import BaseModel
+from typing import List, Tuple, Dict, Any, Optional
+
+from ..services.face_search import extract_character_clips
+from ..utils.uploads import validate_uploads
 
 # Get the logger instance from main.py or configure it similarly
 logger = logging.getLogger("clipcraft")
@@ -28,198 +26,22 @@ CLIPS_OUTPUT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../.
 # Make sure this directory is configured as a static files mount point in main.py if not already.
 # I'll add this to main.py later.
 
-# --- FrameReader Class (unchanged, but added more robust queue handling) ---
-class FrameReader:
-    def __init__(self, video_path, queue_max_size=128):
-        self.video_path = video_path
-        self.cap = None
-        self.q = queue.Queue(maxsize=queue_max_size)
-        self.stopped = False
-        self.thread = threading.Thread(target=self._reader_loop, args=())
-        self.thread.daemon = True
-
-    def start(self):
-        self.cap = cv2.VideoCapture(self.video_path)
-        if not self.cap.isOpened():
-            logger.error(f"Error: Could not open video file '{self.video_path}' in FrameReader.")
-            self.stopped = True
-            return None
-        self.thread.start()
-        return self
-
-    def _reader_loop(self):
-        while not self.stopped:
-            if not self.q.full():
-                if self.cap is None or not self.cap.isOpened():
-                    self.stopped = True
-                    break
-                ret, frame = self.cap.read()
-                if not ret:
-                    self.stopped = True
-                    break
-                try:
-                    self.q.put(frame, block=True, timeout=5) # Add timeout for put
-                except queue.Full:
-                    logger.warning("FrameReader queue is full, skipping frame.")
-                    time.sleep(0.01) # Small sleep if full
-            else:
-                time.sleep(0.001)
-
-    def read(self):
-        if self.q.empty() and self.stopped:
-            return None
-        try:
-            return self.q.get(timeout=1)
-        except queue.Empty:
-            return None
-
-    def running(self):
-        return not self.stopped or not self.q.empty()
-
-    def stop(self):
-        self.stopped = True
-        if self.thread.is_alive():
-            self.thread.join(timeout=5) # Join with a timeout
-            if self.thread.is_alive():
-                logger.warning("FrameReader thread did not terminate gracefully.")
-        if self.cap:
-            self.cap.release()
-        logger.info("FrameReader stopped and resources released.")
-
-# --- extract_character_clips Function (unchanged logic, only return timestamps) ---
-def extract_character_clips(video_path: str, character_image_path: str, tolerance: float = 0.6, frames_after_detection: int = 30, scale_factor: float = 1) -> List[Tuple[float, float]]:
-    """
-    Searches a video for a specific character and extracts clips where the character is present.
-    This version only generates timestamps.
-    """
-
-    if sys.version_info >= (3, 13):
-        logger.warning(
-            "You are using Python 3.13 or newer. face_recognition (and its underlying dlib library) "
-            "might not have full, stable support for this version yet. If you encounter issues, "
-            "consider trying Python 3.10, 3.11, or 3.12 in a virtual environment."
-        )
-
-    try:
-        character_image = face_recognition.load_image_file(character_image_path)
-        character_face_encodings = face_recognition.face_encodings(character_image)
+# --- Character search (sampling, worker processes) lives in services/face_search.py ---
 
-        if not character_face_encodings:
-            logger.error(
-                f"No face found in the character image '{character_image_path}'. "
-                "Please provide a clear image of the character's face."
-            )
-            return []
+# Concurrent ffmpeg cuts per request; each cut is a short re-encode, so a couple per core
+FIND_CUT_CONCURRENCY = int(os.getenv("FIND_CUT_CONCURRENCY", str(max(1, (os.cpu_count() or 2) // 2))))
+FIND_CUT_PRESET = os.getenv("FIND_CUT_PRESET", "veryfast")
 
-        known_character_encoding = character_face_encodings[0]
-        logger.info(f"Character '{os.path.basename(character_image_path)}' encoding loaded successfully.")
 
-    except FileNotFoundError:
-        logger.error(f"Character image not found at '{character_image_path}'.")
-        return []
-    except Exception as e:
-        logger.error(f"Error loading or encoding character image: {e}")
-        return []
-
-    frame_reader = FrameReader(video_path)
-    if not frame_reader.start():
-        return []
-
-    fps = int(frame_reader.cap.get(cv2.CAP_PROP_FPS))
-    if fps == 0:
-        logger.warning(f"FPS is 0 for video '{video_path}'. Cannot process timestamps accurately.")
-        frame_reader.stop()
-        return []
-
-    width = int(frame_reader.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(frame_reader.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-
-    recording_active = False
-    frames_since_last_detection = 0
-
-    clip_timestamps = []
-    current_clip_start_frame = -1
-
-    logger.info("Starting multi-threaded video processing for timestamp extraction...")
-    logger.info(f"Video resolution: {width}x{height}, FPS: {fps}")
-    logger.info(f"Processing frames at scale factor: {scale_factor}")
-
-    frame_count = 0
-    while frame_reader.running():
-        frame = frame_reader.read()
-        if frame is None:
-            break
-
-        frame_count += 1
-        current_time_seconds = frame_count / fps
-
-        if scale_factor != 1.0:
-            small_frame = cv2.resize(frame, (0, 0), fx=scale_factor, fy=scale_factor)
-        else:
-            small_frame = frame
-
-        rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-
-        face_locations = face_recognition.face_locations(rgb_small_frame)
-
-        face_encodings = []
-        if face_locations:
-            try:
-                face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
-            except Exception as e:
-                logger.error(f"Error getting face encodings for frame {frame_count}: {e}")
-                logger.debug(f"Debug Info: frame shape={rgb_small_frame.shape}, face_locations={face_locations}")
-                face_encodings = []
-
-        character_found_in_frame = False
-        for i, face_encoding in enumerate(face_encodings):
-            matches = face_recognition.compare_faces([known_character_encoding], face_encoding, tolerance=tolerance)
-            
-            if True in matches:
-                character_found_in_frame = True
-                frames_since_last_detection = 0
-                break
-
-        if character_found_in_frame:
-            if not recording_active:
-                recording_active = True
-                current_clip_start_frame = frame_count
-                logger.info(f"Character detected. Starting new timestamp period at time {current_time_seconds:.2f}s")
-        else:
-            if recording_active:
-                frames_since_last_detection += 1
-                if frames_since_last_detection > frames_after_detection:
-                    recording_active = False
-                    
-                    clip_end_frame = frame_count - 1
-                    clip_end_time = clip_end_frame / fps
-                    if current_clip_start_frame != -1:
-                        clip_start_time = current_clip_start_frame / fps
-                        clip_timestamps.append((clip_start_time, clip_end_time))
-                    
-                    frames_since_last_detection = 0
-                    logger.info(f"Character not detected for {frames_after_detection} frames. Ending current timestamp period. Duration: {clip_end_time - clip_start_time:.2f}s")
-                    current_clip_start_frame = -1
-            
-    if recording_active and current_clip_start_frame != -1:
-        clip_end_frame = frame_count
-        clip_end_time = clip_end_frame / fps
-        clip_start_time = current_clip_start_frame / fps
-        clip_timestamps.append((clip_start_time, clip_end_time))
-
-    frame_reader.stop()
-    cv2.destroyAllWindows()
-    logger.info("Video processing for timestamps complete.")
-    
-    logger.info(f"Found {len(clip_timestamps)} periods where the character was present.")
-    
-    return clip_timestamps
-
-# --- NEW: Function to cut video clips using FFmpeg ---
-def cut_video_clip(input_video_path: str, start_time: float, end_time: float, output_path: str) -> None:
+async def cut_video_clip(input_video_path: str, start_time: float, end_time: float, output_path: str) -> None:
     """
     Cuts a video clip using FFmpeg from start_time to end_time.
 
+    `-ss` goes before `-i` (input seeking: the demuxer jumps to the nearest keyframe
+    instead of decoding from the start of the file) and the clip is re-encoded, so
+    ffmpeg decodes from that keyframe and drops frames up to start_time: the clip
+    starts on the exact frame. Stream copy would have to start on the keyframe.
+
     Args:
         input_video_path (str): Path to the original video file.
         start_time (float): Start time of the clip in seconds.
@@ -231,66 +53,97 @@ def cut_video_clip(input_video_path: str, start_time: float, end_time: float, ou
         logger.warning(f"Clip duration is non-positive ({duration:.2f}s) for {input_video_path} from {start_time:.2f}s to {end_time:.2f}s. Skipping.")
         return
 
-    # FFmpeg command:
-    # -y: Overwrite output file without asking
-    # -i: Input file
-    # -ss: Start time (seek to this time before decoding)
-    # -t: Duration
-    # -c:v copy -c:a copy: Copy video and audio streams without re-encoding
-    #     This is much faster but might not work perfectly with all codecs/formats
-    #     For robustness, if quality is not critical, or for specific formats,
-    #     you might use re-encoding options like -c:v libx264 -preset veryfast -crf 23 -c:a aac
-    #     For this example, we'll stick to copy for speed.
-    
     # Ensure the output directory exists
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
     command = [
-        "ffmpeg",
-        "-y",                   # Overwrite output files without asking
+        "ffmpeg", "-y", "-v", "error",
+        "-ss", f"{start_time:.3f}",     # Input seeking: fast, and frame-accurate when re-encoding
         "-i", input_video_path,
-        "-ss", str(start_time),
-        "-to", str(end_time),   # Using -to for end time
-        "-c", "copy",           # Copy video and audio streams without re-encoding for speed
+        "-t", f"{duration:.3f}",
+        "-map", "0:v:0", "-map", "0:a:0?",
+        "-c:v", "libx264", "-preset", FIND_CUT_PRESET, "-crf", "20",
+        "-c:a", "aac", "-b:a", "128k",
+        "-movflags", "+faststart",
         output_path
     ]
-    
+
     logger.info(f"Executing FFmpeg command: {' '.join(command)}")
     try:
-        # Use subprocess.run for simpler execution and error handling
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
-        logger.info(f"FFmpeg stdout: {result.stdout}")
-        if result.stderr:
-            logger.warning(f"FFmpeg stderr: {result.stderr}") # FFmpeg often outputs progress to stderr
-        logger.info(f"Clip saved to: {output_path}")
-    except subprocess.CalledProcessError as e:
-        logger.error(f"FFmpeg failed to cut clip from {start_time:.2f}s to {end_time:.2f}s for {input_video_path}. Error: {e.stderr}")
-        raise HTTPException(status_code=500, detail=f"Failed to process video clip with FFmpeg: {e.stderr}")
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+        )
     except FileNotFoundError:
         logger.error("FFmpeg executable not found. Please ensure FFmpeg is installed and in your system's PATH.")
         raise HTTPException(status_code=500, detail="FFmpeg not found on the server.")
-    except Exception as e:
-        logger.error(f"An unexpected error occurred while cutting video clip: {e}")
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
+    try:
+        _, stderr = await process.communicate()
+    except asyncio.CancelledError:
+        # Do not leave ffmpeg reading an input the caller is about to delete
+        process.kill()
+        await process.wait()
+        raise
+    if process.returncode != 0:
+        error = stderr.decode(errors="replace")
+        logger.error(f"FFmpeg failed to cut clip from {start_time:.2f}s to {end_time:.2f}s for {input_video_path}. Error: {error}")
+        raise HTTPException(status_code=500, detail=f"Failed to process video clip with FFmpeg: {error}")
+    logger.info(f"Clip saved to: {output_path}")
+
+
+async def cut_period(input_video_path: str, clip_id: int, start_time: float, end_time: float, output_dir: str,
+                     request_id: str, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    """Cut one period under `semaphore` and return its clip record."""
+    clip_filename = f"clip_{clip_id}_{request_id}.mp4" # Unique filename for each clip
+    async with semaphore:
+        await cut_video_clip(input_video_path, start_time, end_time, os.path.join(output_dir, clip_filename))
+    # Assuming CLIPS_OUTPUT_DIR is mounted at '/extracted_clips' on the web server
+    return {
+        "id": clip_id,
+        "start": round(start_time, 2),
+        "end": round(end_time, 2),
+        "duration": round(end_time - start_time, 2),
+        "url": f"/extracted_clips/{request_id}/{clip_filename}"
+    }
+
+
+async def cut_video_clips(input_video_path: str, periods: List[Tuple[int, float, float]], output_dir: str,
+                          request_id: str) -> List[Dict[str, Any]]:
+    """
+    Cut every (clip id, start, end) period concurrently, at most FIND_CUT_CONCURRENCY
+    ffmpeg processes at a time. Returns the clip records in period order. A period that
+    fails to cut is logged and left out; the first error is raised only if none succeed.
+    """
+    semaphore = asyncio.Semaphore(FIND_CUT_CONCURRENCY)
+    results = await asyncio.gather(
+        *(cut_period(input_video_path, clip_id, start_time, end_time, output_dir, request_id, semaphore)
+          for clip_id, start_time, end_time in periods),
+        return_exceptions=True
+    )
+    clips = []
+    errors = []
+    for (clip_id, _, _), result in zip(periods, results):
+        if isinstance(result, Exception):
+            logger.error(f"Failed to cut clip {clip_id}: {result}")
+            errors.append(result)
+            continue
+        clips.append(result)
+    if errors and not clips:
+        # Nothing to return (e.g. ffmpeg missing): fail the request with the first error
+        raise errors[0]
+    return clips
 
 
 # --- FastAPI Endpoint ---
 @router.post("/by-image")
-async def find_clips_by_image(video_file: UploadFile = File(...), image_file: UploadFile = File(...)) -> JSONResponse:
+async def find_clips_by_image(video_file: UploadFile = File(...), image_file: UploadFile = File(...),
+                              reference_files: List[UploadFile] = File(default=[])) -> JSONResponse:
     """
     API endpoint to receive a video and an image, process them,
     find character occurrences, cut clips, and return clip URLs.
+    Optional `reference_files` are more photos of the same character; every face in
+    every photo is matched.
     """
-    if not video_file.filename or not image_file.filename:
-        raise HTTPException(status_code=400, detail="Video and image files are required.")
-
-    video_ext = os.path.splitext(video_file.filename)[1].lower()
-    image_ext = os.path.splitext(image_file.filename)[1].lower()
-
-    if video_ext not in ('.mp4', '.avi', '.mov', '.mkv', '.webm'):
-        raise HTTPException(status_code=400, detail=f"Invalid video file format '{video_ext}'. Supported: MP4, AVI, MOV, MKV, WebM.")
-    if image_ext not in ('.png', '.jpg', '.jpeg'):
-        raise HTTPException(status_code=400, detail=f"Invalid image file format '{image_ext}'. Supported: PNG, JPG, JPEG.")
+    validate_uploads(video_file, image_file, reference_files)
 
     # Define a temporary directory for uploaded source files
     temp_upload_dir = "temp_uploads"
@@ -305,6 +158,8 @@ async def find_clips_by_image(video_file: UploadFile = File(...), image_file: Up
 
     temp_video_path = os.path.join(temp_upload_dir, video_file.filename)
     temp_image_path = os.path.join(temp_upload_dir, image_file.filename)
+    temp_reference_paths = [os.path.join(temp_upload_dir, f"ref{i}_{reference_file.filename}")
+                            for i, reference_file in enumerate(reference_files)]
 
     all_clip_data: List[Dict[str, Any]] = [] # To store details of each clip including URL
 
@@ -319,10 +174,17 @@ async def find_clips_by_image(video_file: UploadFile = File(...), image_file: Up
             shutil.copyfileobj(image_file.file, buffer)
         logger.info(f"Saved temporary image to {temp_image_path}")
 
-        # Step 1: Find timestamps where the character is present
-        extracted_timestamps = extract_character_clips(
+        for reference_file, reference_path in zip(reference_files, temp_reference_paths):
+            with open(reference_path, "wb") as buffer:
+                shutil.copyfileobj(reference_file.file, buffer)
+        if temp_reference_paths:
+            logger.info(f"Saved {len(temp_reference_paths)} additional reference image(s)")
+
+        # Step 1: Find timestamps where the character is present (worker processes, off the event loop)
+        extracted_timestamps = await asyncio.to_thread(
+            extract_character_clips,
             video_path=temp_video_path,
-            character_image_path=temp_image_path,
+            character_image_path=[temp_image_path] + temp_reference_paths,
             tolerance=0.6,
             frames_after_detection=40, # 2 seconds at 30fps
             scale_factor=0.5
@@ -332,39 +194,16 @@ async def find_clips_by_image(video_file: UploadFile = File(...), image_file: Up
             logger.info("No character presence periods detected, returning empty list.")
             return JSONResponse(content={"message": "No clips found.", "clips": []})
 
-        # Step 2: Cut video clips based on timestamps
+        # Step 2: Cut video clips based on timestamps (concurrent, input-seeked ffmpeg cuts)
         logger.info(f"Attempting to cut {len(extracted_timestamps)} clips...")
+        periods = []
         for i, (start_time, end_time) in enumerate(extracted_timestamps):
             # Ensure clip duration is reasonable (e.g., at least 1 second)
             if (end_time - start_time) < 1.0:
                 logger.warning(f"Skipping clip {i+1} due to very short duration ({end_time - start_time:.2f}s).")
                 continue
-
-            clip_filename = f"clip_{i+1}_{request_id}.mp4" # Unique filename for each clip
-            output_clip_path = os.path.join(output_clips_sub_dir, clip_filename)
-
-            try:
-                cut_video_clip(temp_video_path, start_time, end_time, output_clip_path)
-                
-                # Construct URL for the frontend
-                # Assuming CLIPS_OUTPUT_DIR is mounted at '/extracted_clips' on the web server
-                public_clip_url = f"/extracted_clips/{request_id}/{clip_filename}"
-                
-                all_clip_data.append({
-                    "id": i + 1,
-                    "start": round(start_time, 2),
-                    "end": round(end_time, 2),
-                    "duration": round(end_time - start_time, 2),
-                    "url": public_clip_url
-                })
-            except HTTPException as e:
-                # Re-raise FFmpeg errors so they are caught by the outer except
-                raise e
-            except Exception as e:
-                logger.error(f"Failed to cut clip {i+1}: {e}")
-                # Continue processing other clips even if one fails, or decide to fail fast
-                # For now, we'll continue and just won't include this clip.
-                # If a critical error, you might want to re-raise.
+            periods.append((i + 1, start_time, end_time))
+        all_clip_data = await cut_video_clips(temp_video_path, periods, output_clips_sub_dir, request_id)
 
         logger.info(f"Successfully generated {len(all_clip_data)} clips.")
         return JSONResponse(content={"message": "Clips found and generated successfully!", "clips": all_clip_data})
@@ -379,6 +218,9 @@ async def find_clips_by_image(video_file: UploadFile = File(...), image_file: Up
         if os.path.exists(temp_video_path):
             os.remove(temp_video_path)
             logger.info(f"Cleaned up temporary video: {temp_video_path}")
+        for reference_path in temp_reference_paths:
+            if os.path.exists(reference_path):
+                os.remove(reference_path)
         if os.path.exists(temp_image_path):
             os.remove(temp_image_path)
             logger.info(f"Cleaned up temporary image: {temp_image_path}")
@@ -396,4 +238,135 @@ async def find_clips_by_image(video_file: UploadFile = File(...), image_file: Up
         # Clean up the main temp_upload_dir only if it's empty
         if os.path.exists(temp_upload_dir) and not os.listdir(temp_upload_dir):
              os.rmdir(temp_upload_dir)
-             logger.info(f"Cleaned up empty directory {temp_upload_dir}")
\ No newline at end of file
+             logger.info(f"Cleaned up empty directory {temp_upload_dir}")
+
+
+# --- Job mode: return a job id at once, poll for progress and clips cut so far ---
+class FindByImageStatus(BaseModel):
+    job_id: str
+    status: str  # "processing", "completed", "failed"
+    progress: float
+    current_step: str
+    frames_processed: int = 0
+    total_frames: int = 0
+    clips: List[Dict[str, Any]] = []  # Clips already cut, available before the scan finishes
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+# In-memory job storage, like the processing jobs in routes/process.py
+find_by_image_jobs: Dict[str, FindByImageStatus] = {}
+
+
+@router.post("/by-image/jobs")
+async def start_find_by_image_job(background_tasks: BackgroundTasks, video_file: UploadFile = File(...),
+                                  image_file: UploadFile = File(...),
+                                  reference_files: List[UploadFile] = File(default=[])):
+    """
+    Same inputs as /by-image, but returns a job id immediately. Poll
+    /by-image/jobs/{job_id} for frames processed and for clips cut so far.
+    """
+    validate_uploads(video_file, image_file, reference_files)
+
+    job_id = str(uuid.uuid4())
+    job_upload_dir = os.path.join("temp_uploads", job_id)
+    os.makedirs(job_upload_dir, exist_ok=True)
+    video_path = os.path.join(job_upload_dir, os.path.basename(video_file.filename))
+    image_paths = [os.path.join(job_upload_dir, f"ref{i}_{os.path.basename(upload.filename)}")
+                   for i, upload in enumerate([image_file] + list(reference_files))]
+    for upload, path in zip([video_file, image_file] + list(reference_files), [video_path] + image_paths):
+        with open(path, "wb") as buffer:
+            shutil.copyfileobj(upload.file, buffer)
+
+    find_by_image_jobs[job_id] = FindByImageStatus(
+        job_id=job_id,
+        status="processing",
+        progress=0.0,
+        current_step="scanning"
+    )
+    background_tasks.add_task(run_find_by_image_job, job_id, video_path, image_paths, job_upload_dir)
+    return {"job_id": job_id, "status": "processing"}
+
+
+@router.get("/by-image/jobs/{job_id}")
+async def get_find_by_image_status(job_id: str):
+    if job_id not in find_by_image_jobs:
+        raise HTTPException(404, "Job not found")
+    return find_by_image_jobs[job_id]
+
+
+@router.get("/by-image/jobs/{job_id}/result")
+async def get_find_by_image_result(job_id: str):
+    if job_id not in find_by_image_jobs:
+        raise HTTPException(404, "Job not found")
+    job = find_by_image_jobs[job_id]
+    if job.status != "completed":
+        raise HTTPException(400, f"Job not completed (status: {job.status})")
+    return job.result
+
+
+async def run_find_by_image_job(job_id: str, video_path: str, image_paths: List[str], job_upload_dir: str):
+    """
+    Background task: scan for the character and cut each clip as soon as the scan has
+    settled it, so early clips are downloadable while later shards are still scanning.
+    """
+    job = find_by_image_jobs[job_id]
+    loop = asyncio.get_running_loop()
+    output_dir = os.path.join(CLIPS_OUTPUT_DIR, job_id)
+    semaphore = asyncio.Semaphore(FIND_CUT_CONCURRENCY)
+    cuts: Dict[Tuple[float, float], asyncio.Task] = {}
+
+    async def cut(clip_id: int, start_time: float, end_time: float) -> Dict[str, Any]:
+        record = await cut_period(video_path, clip_id, start_time, end_time, output_dir, job_id, semaphore)
+        job.clips = sorted(job.clips + [record], key=lambda clip: clip["start"])
+        return record
+
+    def schedule_cuts(periods: List[Tuple[float, float]]):
+        for start_time, end_time in periods:
+            if (start_time, end_time) in cuts or end_time - start_time < 1.0:
+                continue
+            cuts[(start_time, end_time)] = asyncio.create_task(cut(len(cuts) + 1, start_time, end_time))
+
+    def on_progress(frames_processed: int, total_frames: int, settled: List[Tuple[float, float]]):
+        # Called from the search thread; job state and cut tasks belong to the event loop
+        def update():
+            job.frames_processed, job.total_frames = frames_processed, total_frames
+            job.progress = round(90.0 * frames_processed / total_frames, 1) if total_frames else 0.0
+            job.current_step = f"scanning_frame_{frames_processed}_{total_frames}"
+            schedule_cuts(settled)
+        loop.call_soon_threadsafe(update)
+
+    try:
+        extracted_timestamps = await asyncio.to_thread(
+            extract_character_clips,
+            video_path=video_path,
+            character_image_path=image_paths,
+            tolerance=0.6,
+            frames_after_detection=40, # 2 seconds at 30fps
+            scale_factor=0.5,
+            progress=on_progress
+        )
+        job.current_step = "cutting_clips"
+        job.progress = 90.0
+        schedule_cuts(extracted_timestamps)
+        results = await asyncio.gather(*cuts.values(), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"[find_by_image] Job {job_id}: failed to cut clip: {result}")
+
+        message = "Clips found and generated successfully!" if job.clips else "No clips found."
+        job.result = {"message": message, "clips": job.clips}
+        job.status = "completed"
+        job.progress = 100.0
+        job.current_step = "completed"
+        logger.info(f"[find_by_image] Job {job_id}: {len(job.clips)} clips")
+    except Exception as e:
+        logger.exception(f"[find_by_image] Job {job_id} failed")
+        # Cuts scheduled during the scan must stop before the input video is removed
+        for task in cuts.values():
+            task.cancel()
+        await asyncio.gather(*cuts.values(), return_exceptions=True)
+        job.status = "failed"
+        job.error = str(e)
+        job.current_step = "failed"
+    finally:
+        shutil.rmtree(job_upload_dir, ignore_errors=True)
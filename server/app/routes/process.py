@@ -12,20 +12,27 @@ import logging
 import requests
 from urllib.parse import urlparse
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Depends, Body
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Depends, Body, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
 from ..services.whisper_service import WhisperCppService, TranscriptionManager
 from ..services.llm_service import SimpleVibeAnalyzer, GeminiVibeAnalyzer, VibeAnalysisManager, list_gemini_models
+from ..services.local_vibe_analyzer import LocalVibeAnalyzer
 from ..services.clip_generator import ClipGenerator, ClipGenerationManager
-from ..services.video_renderer import VideoRenderer, VideoRenderingManager
+from ..services.video_renderer import VideoRenderer, VideoRenderingManager, build_output_filename
 from ..utils.chunking import ChunkingStrategy
 from ..utils.performance_profiler import get_profiler, cleanup_profiler
+from ..utils.media_server import serve_media, resolve_media_path
+from ..utils.llm_cache import get_llm_cache
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["video-processing"])
 
+# Output directories, also used to serve files without building the services
+CLIPS_DIR = os.path.join(os.getcwd(), "generated_clips")
+RENDERED_DIR = os.path.join(os.getcwd(), "rendered_videos")
+
 # Global service instances (in production, use dependency injection)
 whisper_service = None
 vibe_analyzer = None
@@ -48,40 +55,45 @@ def get_services():
             threads=int(os.getenv("WHISPER_THREADS", "4"))
         )
         
-    # LLM provider selection
+    # LLM provider selection; "local" scores offline, and is used when no API key is configured
     llm_provider = os.getenv("VIBE_LLM_PROVIDER", "claude").lower()
     if vibe_analyzer is None:
-        if llm_provider == "gemini":
+        if llm_provider == "gemini" and os.getenv("GEMINI_API_KEY"):
             vibe_analyzer = GeminiVibeAnalyzer(
                 api_key=os.getenv("GEMINI_API_KEY"),
                 model=os.getenv("GEMINI_MODEL", "gemini-1.5-flash-latest")
             )
-        else:
+        elif llm_provider not in ("local", "gemini") and os.getenv("ANTHROPIC_API_KEY"):
             vibe_analyzer = SimpleVibeAnalyzer(
                 api_key=os.getenv("ANTHROPIC_API_KEY"),
                 model=os.getenv("CLAUDE_MODEL", "claude-3-5-sonnet-20241022")
             )
+        else:
+            if llm_provider != "local":
+                logger.warning(f"No API key for vibe provider '{llm_provider}', using local scoring")
+            vibe_analyzer = LocalVibeAnalyzer()
     
     if transcription_manager is None:
         transcription_manager = TranscriptionManager(whisper_service)
         
     if vibe_manager is None:
-        vibe_manager = VibeAnalysisManager(vibe_analyzer)
+        # Remote analyzers fall back to local scoring when the API is slow or down; the local
+        # analyzer (and its embedding model) is only built the first time that happens
+        fallback_factory = None if isinstance(vibe_analyzer, LocalVibeAnalyzer) else LocalVibeAnalyzer
+        vibe_manager = VibeAnalysisManager(vibe_analyzer, fallback_factory=fallback_factory)
     
     if clip_generator is None:
         # Create clips directory
-        clips_dir = os.path.join(os.getcwd(), "generated_clips")
-        os.makedirs(clips_dir, exist_ok=True)
-        clip_generator = ClipGenerator(output_base_dir=clips_dir)
+        os.makedirs(CLIPS_DIR, exist_ok=True)
+        clip_generator = ClipGenerator(output_base_dir=CLIPS_DIR)
     
     if clip_manager is None:
         clip_manager = ClipGenerationManager(clip_generator)
     
     if video_renderer is None:
         # Create rendered videos directory
-        rendered_dir = os.path.join(os.getcwd(), "rendered_videos")
-        os.makedirs(rendered_dir, exist_ok=True)
-        video_renderer = VideoRenderer(output_base_dir=rendered_dir)
+        os.makedirs(RENDERED_DIR, exist_ok=True)
+        video_renderer = VideoRenderer(output_base_dir=RENDERED_DIR)
     
     if render_manager is None:
         render_manager = VideoRenderingManager(video_renderer)
@@ -158,12 +170,14 @@ class RenderRequest(BaseModel):
     bgm_filename: Optional[str] = None  # BGM filename if uploaded
     sfx_list: Optional[List[Dict[str, Any]]] = None  # SFX list: [{"path": str, "delay_ms": int}]
     bgm_regions: Optional[List[Dict[str, float]]] = None  # List of {start, duration} for selective BGM
+    render_profile: Literal['final', 'preview'] = 'final'  # 'preview' renders a fast low-resolution proxy
 
 class RenderStatus(BaseModel):
     job_id: str
     status: str  # "rendering", "completed", "failed"
     progress: float
     current_step: str
+    stream_url: Optional[str] = None  # Playable while rendering (fragmented MP4)
     result: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
 
@@ -708,29 +722,10 @@ async def get_vibe_categories():
     }
 
 @router.get("/clips/{filename}")
-async def get_clip_file(filename: str):
-    """Serve generated clip files."""
-    clips_dir = os.path.join(os.getcwd(), "generated_clips")
-    file_path = os.path.join(clips_dir, filename)
-    
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="Clip file not found")
-    
-    # Determine media type based on file extension
-    if filename.endswith('.mp4'):
-        media_type = "video/mp4"
-    elif filename.endswith('.jpg') or filename.endswith('.jpeg'):
-        media_type = "image/jpeg"
-    elif filename.endswith('.png'):
-        media_type = "image/png"
-    else:
-        media_type = "application/octet-stream"
-    
-    return FileResponse(
-        file_path,
-        media_type=media_type,
-        filename=filename
-    )
+async def get_clip_file(filename: str, request: Request):
+    """Serve generated clip files with Range and conditional-GET support."""
+    file_path = resolve_media_path(CLIPS_DIR, filename)
+    return await serve_media(request, file_path, download_name=filename)
 
 @router.get("/test-clips")
 async def get_test_clips():
@@ -812,12 +807,19 @@ async def render_timeline_video(
     bgm_filename = validated_request.bgm_filename
     sfx_list = validated_request.sfx_list or []
     bgm_regions = validated_request.bgm_regions or []
+    render_profile = validated_request.render_profile
     job_id = str(uuid.uuid4())
+    render_id = job_id[:8]
+    output_filename = build_output_filename(project_name, render_id, render_profile)
+    _, _, _, render_manager = get_services()
+    # Register before the task starts so the stream URL can be requested right away
+    render_manager.video_renderer.pending_outputs.add(output_filename)
     render_jobs[job_id] = RenderStatus(
         job_id=job_id,
         status="rendering",
         progress=0.0,
-        current_step="preparing"
+        current_step="preparing",
+        stream_url=f"/api/v1/process/rendered-videos/{output_filename}"
     )
     background_tasks.add_task(
         render_timeline_background,
@@ -826,9 +828,11 @@ async def render_timeline_video(
         project_name,
         bgm_filename,
         sfx_list,
-        bgm_regions
+        bgm_regions,
+        render_profile,
+        render_id
     )
-    return {"job_id": job_id, "status": "rendering"}
+    return {"job_id": job_id, "status": "rendering", "stream_url": render_jobs[job_id].stream_url}
 
 @router.get("/render-status/{job_id}")
 async def get_render_status(job_id: str):
@@ -850,20 +854,41 @@ async def get_render_result(job_id: str):
     
     return job.result
 
+async def stream_growing_file(file_path: str, is_active, chunk_size: int = 256 * 1024, poll_interval: float = 0.25):
+    """Yield a file's bytes, following it as it grows until is_active() turns false."""
+    while not os.path.exists(file_path):
+        if not is_active():
+            return
+        await asyncio.sleep(poll_interval)
+    with open(file_path, 'rb') as f:
+        while True:
+            # Reads go through a thread so a slow disk does not stall the event loop
+            chunk = await asyncio.to_thread(f.read, chunk_size)
+            if chunk:
+                yield chunk
+                continue
+            if not is_active():
+                # Render finished: drain whatever was written after the last read
+                remainder = await asyncio.to_thread(f.read)
+                if remainder:
+                    yield remainder
+                return
+            await asyncio.sleep(poll_interval)
+
 @router.get("/rendered-videos/{filename}")
-async def get_rendered_video_file(filename: str):
-    """Serve rendered video files."""
-    rendered_dir = os.path.join(os.getcwd(), "rendered_videos")
-    file_path = os.path.join(rendered_dir, filename)
-    
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="Rendered video file not found")
-    
-    return FileResponse(
-        file_path,
-        media_type="video/mp4",
-        filename=filename
-    )
+async def get_rendered_video_file(filename: str, request: Request):
+    """Serve rendered video files. Renders still in progress are streamed as they are written."""
+    # No render can be in progress before the services exist, so they are not built here
+    pending_outputs = render_manager.video_renderer.pending_outputs if render_manager is not None else set()
+    if filename in pending_outputs:
+        file_path = os.path.join(RENDERED_DIR, os.path.basename(filename))
+        return StreamingResponse(
+            stream_growing_file(file_path, lambda: filename in pending_outputs),
+            media_type="video/mp4"
+        )
+    
+    file_path = resolve_media_path(RENDERED_DIR, filename)
+    return await serve_media(request, file_path, download_name=filename)
 
 @router.get("/rendered-videos")
 async def list_rendered_videos():
@@ -928,7 +953,9 @@ async def render_timeline_background(
     project_name: str,
     bgm_filename: Optional[str],
     sfx_list: Optional[List[Dict[str, Any]]] = None,
-    bgm_regions: Optional[List[Dict[str, float]]] = None
+    bgm_regions: Optional[List[Dict[str, float]]] = None,
+    render_profile: str = "final",
+    render_id: Optional[str] = None
 ):
     """Background task for rendering timeline video. Supports BGM and SFX."""
     try:
@@ -936,7 +963,9 @@ async def render_timeline_background(
         render_jobs[job_id].current_step = "initializing"
         render_jobs[job_id].progress = 10.0
         timeline_data = {
-            'timeline_clips': [clip.dict() for clip in timeline_clips]
+            'timeline_clips': [clip.dict() for clip in timeline_clips],
+            'render_profile': render_profile,
+            'render_id': render_id
         }
         if bgm_filename:
             bgm_dir = os.path.join(os.getcwd(), "uploaded_bgm")
@@ -963,10 +992,22 @@ async def render_timeline_background(
         logger.info(f"✅ Timeline rendering completed for job {job_id}")
     except Exception as e:
         logger.error(f"Timeline rendering failed for job {job_id}: {e}")
+        if render_id and video_renderer is not None:
+            video_renderer.pending_outputs.discard(
+                build_output_filename(project_name, render_id, render_profile)
+            )
         render_jobs[job_id].status = "failed"
         render_jobs[job_id].error = str(e)
         render_jobs[job_id].current_step = "failed"
 
+@router.get("/llm-cache/stats")
+async def get_llm_cache_stats():
+    """Hit/miss counters and entry counts of the vibe score cache, per provider/model."""
+    cache = get_llm_cache()
+    if cache is None:
+        return {"enabled": False, "namespaces": {}}
+    return {"enabled": True, "namespaces": cache.stats()}
+
 @router.get("/gemini-models")
 async def get_gemini_models():
     """Return the list of available Gemini models for the configured API key."""
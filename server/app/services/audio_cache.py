@@ -0,0 +1,129 @@
+"""
+Persistent cache of decoded audio assets (BGM tracks and sound effects).
+
+Decoded PCM is stored as float32 .npy files keyed by the source file's content
+hash and the target sample rate / channel count, and loaded memory-mapped so
+repeated renders neither re-decode the MP3 nor copy the samples into memory.
+"""
+
+import os
+import logging
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from .audio_mixer import decode_audio, SAMPLE_RATE, CHANNELS
+from .render_manifest import hash_file, hash_parts
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.m4a', '.aac', '.ogg', '.flac')
+
+
+class DecodedAudioCache:
+    """
+    Content-addressed, size-capped LRU cache of decoded audio.
+
+    Layout on disk:
+        <cache_dir>/<key>.npy    float32, shape (samples, channels)
+    File mtimes double as the LRU clock: a hit touches the file, eviction
+    removes the least recently used entries until the cache fits max_bytes.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 1024 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        # (path, size, mtime_ns) -> sha256, so unchanged sources are hashed once per process
+        self._source_hashes: Dict[Tuple[str, int, int], str] = {}
+        self._lock = threading.Lock()
+
+    def _source_hash(self, path: str) -> str:
+        st = os.stat(path)
+        stat_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        digest = self._source_hashes.get(stat_key)
+        if digest is None:
+            digest = hash_file(path)
+            self._source_hashes[stat_key] = digest
+        return digest
+
+    def cache_path(self, path: str, sample_rate: int = SAMPLE_RATE, channels: int = CHANNELS) -> str:
+        key = hash_parts(self._source_hash(path), sample_rate, channels, 'f32')
+        return os.path.join(self.cache_dir, f"{key[:32]}.npy")
+
+    def decode(self, path: str, sample_rate: int = SAMPLE_RATE, channels: int = CHANNELS) -> np.ndarray:
+        """Decoded samples for `path`, from the cache when possible. Same signature as decode_audio."""
+        cached_path = self.cache_path(path, sample_rate, channels)
+        if os.path.exists(cached_path):
+            try:
+                data = np.load(cached_path, mmap_mode='r')
+                os.utime(cached_path)
+                logger.info(f"[audio_cache] Hit for {os.path.basename(path)}")
+                return data
+            except (OSError, ValueError) as e:
+                logger.warning(f"[audio_cache] Corrupt entry {cached_path}, re-decoding: {e}")
+        logger.info(f"[audio_cache] Decoding {os.path.basename(path)} at {sample_rate} Hz / {channels} ch")
+        data = decode_audio(path, sample_rate, channels)
+        tmp_path = cached_path[:-len('.npy')] + f".{threading.get_ident()}.tmp.npy"
+        np.save(tmp_path, data)
+        os.replace(tmp_path, cached_path)
+        self.evict()
+        if os.path.exists(cached_path):
+            return np.load(cached_path, mmap_mode='r')
+        # Larger than the whole cache: evicted straight away, use the in-memory copy
+        return data
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits max_bytes."""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith('.npy') or name.endswith('.tmp.npy'):
+                    continue
+                full = os.path.join(self.cache_dir, name)
+                try:
+                    st = os.stat(full)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, full))
+            total = sum(size for _, size, _ in entries)
+            for _, size, full in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(full)
+                    total -= size
+                    logger.info(f"[audio_cache] Evicted {os.path.basename(full)}")
+                except OSError:
+                    pass
+
+    def prewarm(self, directories: Iterable[str], sample_rate: int = SAMPLE_RATE, channels: int = CHANNELS) -> int:
+        """Decode every audio file under `directories` into the cache. Returns the number warmed."""
+        warmed = 0
+        for directory in directories:
+            if not os.path.isdir(directory):
+                continue
+            for name in sorted(os.listdir(directory)):
+                if not name.lower().endswith(AUDIO_EXTENSIONS):
+                    continue
+                try:
+                    self.decode(os.path.join(directory, name), sample_rate, channels)
+                    warmed += 1
+                except Exception as e:
+                    logger.warning(f"[audio_cache] Failed to pre-warm {name}: {e}")
+        logger.info(f"[audio_cache] Pre-warmed {warmed} assets")
+        return warmed
+
+
+_audio_cache: Optional[DecodedAudioCache] = None
+
+
+def get_audio_cache() -> DecodedAudioCache:
+    """Shared cache instance, configured by AUDIO_CACHE_DIR and AUDIO_CACHE_MAX_MB."""
+    global _audio_cache
+    if _audio_cache is None:
+        cache_dir = os.getenv("AUDIO_CACHE_DIR", os.path.join(os.getcwd(), "decoded_audio"))
+        max_mb = int(os.getenv("AUDIO_CACHE_MAX_MB", "1024"))
+        _audio_cache = DecodedAudioCache(cache_dir, max_bytes=max_mb * 1024 * 1024)
+    return _audio_cache
@@ -0,0 +1,199 @@
+"""
+In-process audio mixing engine for the final audio bed.
+
+Clip audio, looped BGM and sound effects are decoded once to float32 PCM, mixed
+block by block with NumPy and piped into a single ffmpeg encode. No per-SFX
+decoder inputs or filter graph nodes are created, so the cost of adding
+sound effects is one slice-add per overlapping block.
+"""
+
+import os
+import shutil
+import tempfile
+import subprocess
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+BLOCK_SECONDS = 5.0
+
+# BGM gain while timeline clips carry their own audio; the duck starts slightly early
+# so the clip's first syllable is not masked
+BGM_DUCK_GAIN = 0.2
+BGM_DUCK_LEAD = 0.05
+
+
+def merge_regions(regions: List[Dict], gap: float = 0.0) -> List[Tuple[float, float]]:
+    """Sort {start, end} regions and merge overlapping (or nearly touching) ones."""
+    spans = sorted((float(r['start']), float(r['end'])) for r in regions if float(r['end']) > float(r['start']))
+    merged = []
+    for start, end in spans:
+        if merged and start <= merged[-1][1] + gap:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def decode_audio(path: str, sample_rate: int = SAMPLE_RATE, channels: int = CHANNELS) -> np.ndarray:
+    """Decode any audio/video file to a (samples, channels) float32 array."""
+    cmd = [
+        'ffmpeg', '-v', 'error', '-i', path,
+        '-vn', '-f', 'f32le', '-acodec', 'pcm_f32le',
+        '-ar', str(sample_rate), '-ac', str(channels), 'pipe:1'
+    ]
+    result = subprocess.run(cmd, capture_output=True, check=True)
+    return np.frombuffer(result.stdout, dtype=np.float32).reshape(-1, channels)
+
+
+class GainEnvelope:
+    """Piecewise-constant gain curve over merged regions, sampled per block."""
+
+    def __init__(self, regions: List[Dict], sample_rate: int = SAMPLE_RATE,
+                 gain: float = BGM_DUCK_GAIN, lead: float = BGM_DUCK_LEAD):
+        merged = merge_regions(regions, gap=lead)
+        self.gain = gain
+        self.starts = np.array([int(max(0.0, s - lead) * sample_rate) for s, _ in merged], dtype=np.int64)
+        self.ends = np.array([int(e * sample_rate) for _, e in merged], dtype=np.int64)
+
+    def block(self, start_sample: int, n: int) -> np.ndarray:
+        """Gain for samples [start_sample, start_sample + n) as a (n, 1) array."""
+        gains = np.ones(n, dtype=np.float32)
+        if len(self.starts):
+            positions = np.arange(start_sample, start_sample + n, dtype=np.int64)
+            idx = np.searchsorted(self.starts, positions, side='right') - 1
+            inside = (idx >= 0) & (positions < self.ends[np.maximum(idx, 0)])
+            gains[inside] = self.gain
+        return gains[:, None]
+
+
+class AudioMixer:
+    """
+    Mixes clip audio, a looped BGM track and positioned SFX.
+
+    Assets are decoded once per mixer through `decoder`, so the same effect used
+    many times on the timeline is only decoded once.
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, channels: int = CHANNELS,
+                 decoder: Optional[Callable[[str, int, int], np.ndarray]] = None):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.decoder = decoder or decode_audio
+        self._assets: Dict[str, np.ndarray] = {}
+
+    def load(self, path: str) -> np.ndarray:
+        if path not in self._assets:
+            self._assets[path] = self.decoder(path, self.sample_rate, self.channels)
+        return self._assets[path]
+
+    def place_sfx(self, sfx_list: List[Dict]) -> Tuple[np.ndarray, np.ndarray, List[np.ndarray]]:
+        """Resolve SFX to (start samples, end samples, arrays), sorted by start."""
+        events = []
+        for sfx in sfx_list:
+            sfx_path = sfx.get('path')
+            if not sfx_path or not os.path.exists(sfx_path):
+                continue
+            data = self.load(sfx_path)
+            if not len(data):
+                continue
+            offset = int(int(sfx.get('delay_ms', 0)) * self.sample_rate / 1000)
+            events.append((offset, data))
+        events.sort(key=lambda e: e[0])
+        starts = np.array([o for o, _ in events], dtype=np.int64)
+        ends = np.array([o + len(d) for o, d in events], dtype=np.int64)
+        return starts, ends, [d for _, d in events]
+
+    def mix_block(self, main: np.ndarray, start_sample: int, bgm: Optional[np.ndarray],
+                  envelope: Optional[GainEnvelope], sfx: Tuple[np.ndarray, np.ndarray, List[np.ndarray]]) -> np.ndarray:
+        """Mix one block of clip audio starting at `start_sample` on the timeline."""
+        n = len(main)
+        out = main.astype(np.float32, copy=True)
+        if bgm is not None and len(bgm):
+            # Loop BGM by tiling: wrap the sample index around the track length
+            looped = np.take(bgm, np.arange(start_sample, start_sample + n), axis=0, mode='wrap')
+            if envelope is not None:
+                looped = looped * envelope.block(start_sample, n)
+            out += looped
+        starts, ends, datas = sfx
+        if len(starts):
+            block_end = start_sample + n
+            last = np.searchsorted(starts, block_end, side='left')
+            for i in np.nonzero(ends[:last] > start_sample)[0]:
+                s = max(starts[i], start_sample)
+                e = min(ends[i], block_end)
+                out[s - start_sample:e - start_sample] += datas[i][s - starts[i]:e - starts[i]]
+        np.clip(out, -1.0, 1.0, out=out)
+        return out
+
+    def mix_to_file(self, video_path: str, output_path: str, bgm_path: Optional[str] = None,
+                    sfx_list: Optional[List[Dict]] = None, duck_regions: Optional[List[Dict]] = None,
+                    audio_bitrate: str = '192k', output_flags: Optional[List[str]] = None) -> str:
+        """
+        Stream the clip audio of `video_path` through the mixer and encode the
+        result once, copying the video stream. Blocking; run it in a thread.
+        """
+        bgm = self.load(bgm_path) if bgm_path and os.path.exists(bgm_path) else None
+        envelope = GainEnvelope(duck_regions, self.sample_rate) if (bgm is not None and duck_regions) else None
+        sfx = self.place_sfx(sfx_list or [])
+        logger.info(f"[mixer] Mixing with bgm={'yes' if bgm is not None else 'no'}, "
+                    f"{len(sfx[0])} sfx, {len(envelope.starts) if envelope else 0} duck regions")
+
+        ffmpeg = shutil.which('ffmpeg') or 'ffmpeg'
+        decode_cmd = [
+            ffmpeg, '-v', 'error', '-i', video_path,
+            '-vn', '-f', 'f32le', '-acodec', 'pcm_f32le',
+            '-ar', str(self.sample_rate), '-ac', str(self.channels), 'pipe:1'
+        ]
+        encode_cmd = [
+            ffmpeg, '-y', '-v', 'error',
+            '-i', video_path,
+            '-f', 'f32le', '-ar', str(self.sample_rate), '-ac', str(self.channels), '-i', 'pipe:0',
+            '-map', '0:v:0', '-map', '1:a:0',
+            '-c:v', 'copy',
+            '-c:a', 'aac', '-b:a', audio_bitrate,
+            *(output_flags or []),
+            output_path
+        ]
+        frame_bytes = 4 * self.channels
+        block_bytes = int(BLOCK_SECONDS * self.sample_rate) * frame_bytes
+        with tempfile.TemporaryFile() as encode_log:
+            decoder = subprocess.Popen(decode_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            encoder = subprocess.Popen(encode_cmd, stdin=subprocess.PIPE, stderr=encode_log)
+            position = 0
+            pending = b''
+            try:
+                while True:
+                    chunk = decoder.stdout.read(block_bytes)
+                    if not chunk:
+                        break
+                    pending += chunk
+                    usable = len(pending) - len(pending) % frame_bytes
+                    if not usable:
+                        continue
+                    main = np.frombuffer(pending[:usable], dtype=np.float32).reshape(-1, self.channels)
+                    pending = pending[usable:]
+                    try:
+                        encoder.stdin.write(self.mix_block(main, position, bgm, envelope, sfx).tobytes())
+                    except BrokenPipeError:
+                        # Encoder exited early; its log is reported below
+                        break
+                    position += len(main)
+            finally:
+                decoder.stdout.close()
+                decoder.wait()
+                try:
+                    encoder.stdin.close()
+                except BrokenPipeError:
+                    pass
+                encoder.wait()
+            if encoder.returncode != 0:
+                encode_log.seek(0)
+                raise RuntimeError(encode_log.read().decode('utf-8', 'replace'))
+        logger.info(f"[mixer] Mixed {position / self.sample_rate:.1f}s of audio")
+        return output_path
@@ -4,6 +4,7 @@ Generates actual video clips from timestamps.
 """
 
 import os
+import asyncio
 import subprocess
 import tempfile
 import uuid
@@ -123,7 +124,7 @@ class ClipGenerator:
         ]
         
         try:
-            subprocess.run(thumb_cmd, capture_output=True, check=True, timeout=5)  # Reduced timeout
+            await asyncio.to_thread(subprocess.run, thumb_cmd, capture_output=True, check=True, timeout=5)  # Reduced timeout
             logger.info(f"📸 Generated thumbnail: {thumbnail_filename}")
         except Exception as e:
             logger.warning(f"Failed to generate thumbnail: {e}")
@@ -147,8 +148,8 @@ class ClipGenerator:
             # Higher quality mode
             cmd = [
                 'ffmpeg', '-y',  # Overwrite output files
-                '-i', video_path,  # Input file first for frame-accurate seek
-                '-ss', str(start_time),  # Seek after input for accuracy
+                '-ss', str(start_time),  # Input seek: fast, and frame-accurate since we re-encode
+                '-i', video_path,  # Input file
                 '-t', str(duration),  # Duration
                 '-c:v', 'libx264',  # Video codec
                 '-c:a', 'aac',  # Re-encode audio for accurate cuts
@@ -164,7 +165,8 @@ class ClipGenerator:
             # Adjust timeout based on mode
             timeout = 5 if fast_mode else 15  # Much faster timeout for copy mode
             
-            result = subprocess.run(
+            result = await asyncio.to_thread(
+                subprocess.run,
                 cmd, 
                 capture_output=True, 
                 text=True, 
@@ -0,0 +1,238 @@
+"""
+Persistent per-video face index for find-by-image.
+
+The first search of a video stores every face detected at its sampled frames
+(128-d encodings and boxes) in one .npz file keyed by the video's content hash
+and the sampling parameters. Later searches of the same video, for the same or
+another character, load the index and match against it with one vectorized
+distance computation instead of decoding and detecting again. Frames probed
+while refining clip boundaries are stored with their faces too, so repeating
+a search needs no decoding at all.
+"""
+
+import os
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .render_manifest import hash_file, hash_parts
+
+logger = logging.getLogger(__name__)
+
+# Bump when detection or the stored layout changes so stale indexes are rebuilt
+FACE_INDEX_VERSION = 2
+ENCODING_SIZE = 128
+
+# One scanned shard: (sampled frames, frame of each face, encodings (n, 128), boxes (n, 4), last frame)
+ShardFaces = Tuple[List[int], List[int], np.ndarray, np.ndarray, int]
+
+
+class FaceIndex:
+    """
+    Faces found at the sampled frames of one video.
+
+    sample_frames  int32 (s,)       every frame detection ran on, with or without faces
+    face_frames    int32 (n,)       frame number of each face
+    encodings      float32 (n, 128) face_recognition encodings
+    boxes          int32 (n, 4)     (top, right, bottom, left) in source-resolution pixels
+    probes         {frame: float32 (k, 128)} faces on frames probed between samples
+    """
+
+    def __init__(self, sample_frames: np.ndarray, face_frames: np.ndarray, encodings: np.ndarray,
+                 boxes: np.ndarray, fps: float, total_frames: int, step: int,
+                 probes: Optional[Dict[int, np.ndarray]] = None):
+        self.sample_frames = np.asarray(sample_frames, dtype=np.int32)
+        self.face_frames = np.asarray(face_frames, dtype=np.int32)
+        self.encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        self.boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        self.fps = float(fps)
+        self.total_frames = int(total_frames)
+        self.step = int(step)
+        self.probes: Dict[int, np.ndarray] = dict(probes or {})
+
+    @classmethod
+    def from_shards(cls, shards: Sequence[ShardFaces], fps: float, step: int) -> "FaceIndex":
+        sample_frames = [frame for shard in shards for frame in shard[0]]
+        face_frames = [frame for shard in shards for frame in shard[1]]
+        encodings = [shard[2] for shard in shards if len(shard[2])]
+        boxes = [shard[3] for shard in shards if len(shard[3])]
+        return cls(
+            np.unique(np.asarray(sample_frames, dtype=np.int32)),
+            face_frames,
+            np.concatenate(encodings) if encodings else np.empty((0, ENCODING_SIZE), np.float32),
+            np.concatenate(boxes) if boxes else np.empty((0, 4), np.int32),
+            fps,
+            max((shard[4] for shard in shards), default=0),
+            step,
+        )
+
+    def __len__(self) -> int:
+        return len(self.face_frames)
+
+    def match_all(self, matcher: "FaceMatcher") -> Dict[str, Dict[int, bool]]:
+        """{character: {sampled frame: any face matches}} for every character of the matcher, in one pass."""
+        matched = np.zeros((len(self.sample_frames), len(matcher.names)), dtype=bool)
+        if len(self.face_frames):
+            face_matches = matcher.matches(self.encodings)
+            rows = np.searchsorted(self.sample_frames, self.face_frames)
+            # A sampled frame matches a character if any of its faces does
+            np.logical_or.at(matched, rows, face_matches)
+        frames = self.sample_frames.tolist()
+        return {name: dict(zip(frames, matched[:, column].tolist())) for column, name in enumerate(matcher.names)}
+
+    def match(self, known_encodings: np.ndarray, tolerance: float) -> Dict[int, bool]:
+        """{sampled frame: any face within `tolerance` of any of the encodings}, for one character."""
+        return self.match_all(FaceMatcher({'': known_encodings}, tolerance))['']
+
+    def add_probes(self, probes: Dict[int, np.ndarray]) -> int:
+        """Remember the faces of probed frames; returns how many frames were new."""
+        new = {frame: encodings for frame, encodings in probes.items() if frame not in self.probes}
+        self.probes.update(new)
+        return len(new)
+
+    def save(self, path: str):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        probe_frames = sorted(self.probes)
+        probe_encodings = [np.asarray(self.probes[frame], np.float32).reshape(-1, ENCODING_SIZE) for frame in probe_frames]
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, sample_frames=self.sample_frames, face_frames=self.face_frames,
+                     encodings=self.encodings, boxes=self.boxes,
+                     probe_frames=np.asarray(probe_frames, dtype=np.int32),
+                     probe_counts=np.asarray([len(e) for e in probe_encodings], dtype=np.int32),
+                     probe_encodings=(np.concatenate(probe_encodings) if probe_encodings
+                                      else np.empty((0, ENCODING_SIZE), np.float32)),
+                     meta=np.array([self.fps, self.total_frames, self.step, FACE_INDEX_VERSION], dtype=np.float64))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "FaceIndex":
+        with np.load(path) as data:
+            fps, total_frames, step, version = data['meta'].tolist()
+            if int(version) != FACE_INDEX_VERSION:
+                raise ValueError(f"face index version {int(version)}, expected {FACE_INDEX_VERSION}")
+            offsets = np.concatenate([[0], np.cumsum(data['probe_counts'])])
+            probe_encodings = data['probe_encodings']
+            probes = {int(frame): probe_encodings[offsets[i]:offsets[i + 1]]
+                      for i, frame in enumerate(data['probe_frames'].tolist())}
+            return cls(data['sample_frames'], data['face_frames'], data['encodings'], data['boxes'],
+                       fps, int(total_frames), int(step), probes)
+
+
+class FaceMatcher:
+    """
+    Reference encodings of one or more characters (any number per character: several
+    photos, every face in a photo), matched against a batch of face encodings with a
+    single distance matrix. Adding characters adds columns, not passes.
+    """
+
+    def __init__(self, references: Dict[str, np.ndarray], tolerance: float):
+        self.names = list(references)
+        stacked = [np.asarray(references[name], dtype=np.float64).reshape(-1, ENCODING_SIZE) for name in self.names]
+        self.references = np.concatenate(stacked) if stacked else np.empty((0, ENCODING_SIZE))
+        self.tolerance = tolerance
+        # (references, characters) one-hot ownership, to fold reference columns into characters
+        owner = np.repeat(np.arange(len(self.names)), [len(refs) for refs in stacked])
+        self._owner = np.zeros((len(self.references), len(self.names)), dtype=np.float64)
+        self._owner[np.arange(len(owner)), owner] = 1.0
+        self._squared = np.einsum('ij,ij->i', self.references, self.references)
+
+    def distances(self, encodings: np.ndarray) -> np.ndarray:
+        """(faces, references) Euclidean distances, as face_recognition.face_distance computes them."""
+        faces = np.asarray(encodings, dtype=np.float64).reshape(-1, ENCODING_SIZE)
+        squared = np.einsum('ij,ij->i', faces, faces)[:, None] + self._squared[None, :] - 2.0 * faces @ self.references.T
+        return np.sqrt(np.maximum(squared, 0.0))
+
+    def matches(self, encodings: np.ndarray) -> np.ndarray:
+        """(faces, characters) bool: the face is within tolerance of any of the character's references."""
+        close = (self.distances(encodings) <= self.tolerance).astype(np.float64)
+        return (close @ self._owner) > 0
+
+    def frame_matches(self, encodings: np.ndarray) -> np.ndarray:
+        """(characters,) bool: any face of one frame matches each character."""
+        if len(encodings) == 0:
+            return np.zeros(len(self.names), dtype=bool)
+        return self.matches(encodings).any(axis=0)
+
+
+class FaceIndexStore:
+    """
+    Content-addressed, size-capped LRU store of face indexes.
+
+    Layout on disk:
+        <cache_dir>/<key>.npz
+    File mtimes double as the LRU clock, as in the decoded audio cache.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._video_hashes: Dict[Tuple[str, int, int], str] = {}
+        self._lock = threading.Lock()
+
+    def _video_hash(self, video_path: str) -> str:
+        st = os.stat(video_path)
+        stat_key = (os.path.abspath(video_path), st.st_size, st.st_mtime_ns)
+        digest = self._video_hashes.get(stat_key)
+        if digest is None:
+            digest = hash_file(video_path)
+            self._video_hashes[stat_key] = digest
+        return digest
+
+    def index_path(self, video_path: str, sampling: str, step: int, scale_factor: float) -> str:
+        key = hash_parts(self._video_hash(video_path), sampling, step, scale_factor, FACE_INDEX_VERSION)
+        return os.path.join(self.cache_dir, f"{key[:32]}.npz")
+
+    def load(self, path: str) -> Optional[FaceIndex]:
+        if not os.path.exists(path):
+            return None
+        try:
+            index = FaceIndex.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"[face_index] Unusable entry {path}, rebuilding: {e}")
+            return None
+        os.utime(path)
+        return index
+
+    def save(self, path: str, index: FaceIndex):
+        index.save(path)
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used indexes until the store fits max_bytes."""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith('.npz'):
+                    continue
+                full = os.path.join(self.cache_dir, name)
+                try:
+                    st = os.stat(full)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, full))
+            total = sum(size for _, size, _ in entries)
+            for _, size, full in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(full)
+                    total -= size
+                    logger.info(f"[face_index] Evicted {os.path.basename(full)}")
+                except OSError:
+                    pass
+
+
+_face_index_store: Optional[FaceIndexStore] = None
+
+
+def get_face_index_store() -> FaceIndexStore:
+    """Shared store, configured by FACE_INDEX_DIR and FACE_INDEX_MAX_MB."""
+    global _face_index_store
+    if _face_index_store is None:
+        cache_dir = os.getenv("FACE_INDEX_DIR", os.path.join(os.getcwd(), "face_index"))
+        max_mb = int(os.getenv("FACE_INDEX_MAX_MB", "256"))
+        _face_index_store = FaceIndexStore(cache_dir, max_bytes=max_mb * 1024 * 1024)
+    return _face_index_store
@@ -0,0 +1,425 @@
+"""
+Character face search for find-by-image.
+
+The video is split into time shards that worker processes decode and scan
+independently (dlib is CPU-bound, so threads would share one core). Every
+face found on the sampled frames is kept in a per-video face index
+(services/face_index.py), so a video is decoded and detected once and any
+later character search is a distance computation against the index. Any number
+of characters, each with any number of reference encodings, are matched with
+one distance matrix (FaceMatcher). Boundary refinements run in the same pool, and the frames_after_detection hysteresis is
+applied to the merged timeline so clips spanning shard boundaries come out whole.
+"""
+
+import os
+import sys
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import cv2
+import face_recognition
+import numpy as np
+
+from .face_index import ENCODING_SIZE, FaceIndex, FaceMatcher, ShardFaces, get_face_index_store
+from ..utils.face_timeline import (
+    FrameSampler, sample_step, sample_transitions, refine_boundary, hits_to_clips, plan_shards, settled_clips
+)
+from ..utils.frame_reader import FrameReader, seek_to_frame
+
+logger = logging.getLogger(__name__)
+
+# "fps": detect FACE_SAMPLE_FPS times per second; "keyframes": on scene cuts (plus the hysteresis window)
+FACE_SAMPLE_FPS = float(os.getenv("FACE_SAMPLE_FPS", "2"))
+FACE_SAMPLING = os.getenv("FACE_SAMPLING", "fps").lower()
+# Worker processes for detection; shards shorter than FACE_SHARD_MIN_SECONDS are not split further
+FACE_WORKERS = int(os.getenv("FACE_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) - 1)))))
+FACE_SHARD_MIN_SECONDS = float(os.getenv("FACE_SHARD_MIN_SECONDS", "30"))
+# Binary-search clip boundaries to the exact frame (a few detections per boundary). The probed
+# frames are stored in the face index, so a repeated search refines without decoding; off,
+# searches are pure encoding matches, accurate to one sampling step
+FACE_REFINE_BOUNDARIES = os.getenv("FACE_REFINE_BOUNDARIES", "1").lower() not in ("0", "false", "no")
+
+# (character column, sampled miss frame, sampled hit frame)
+Transition = Tuple[int, int, int]
+# progress(frames_scanned, total_frames, {character: settled clips})
+ProgressCallback = Callable[[int, int, Dict[str, List[Tuple[float, float]]]], None]
+
+_face_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_face_pool() -> ProcessPoolExecutor:
+    """Shared detection pool. Spawned, not forked, so workers never inherit the server's threads."""
+    global _face_pool
+    if _face_pool is None:
+        _face_pool = ProcessPoolExecutor(max_workers=FACE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        logger.info(f"[face_search] Started {FACE_WORKERS} detection worker processes")
+    return _face_pool
+
+
+def shutdown_face_pool():
+    global _face_pool
+    if _face_pool is not None:
+        _face_pool.shutdown(wait=False, cancel_futures=True)
+        _face_pool = None
+
+
+def _prepare_frame(frame, scale_factor: float):
+    """Scale a decoded BGR frame and convert it to RGB, as FrameReader does."""
+    if scale_factor != 1.0:
+        height, width = frame.shape[:2]
+        size = (max(1, int(round(width * scale_factor))), max(1, int(round(height * scale_factor))))
+        frame = cv2.resize(frame, size)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+
+def _detect_faces(rgb_small_frame, frame_number: int) -> Tuple[list, list]:
+    """(face locations, face encodings) in the scaled RGB frame."""
+    face_locations = face_recognition.face_locations(rgb_small_frame)
+    if not face_locations:
+        return [], []
+    try:
+        return face_locations, face_recognition.face_encodings(rgb_small_frame, face_locations)
+    except Exception as e:
+        logger.error(f"Error getting face encodings for frame {frame_number}: {e}")
+        logger.debug(f"Debug Info: frame shape={rgb_small_frame.shape}, face_locations={face_locations}")
+        return [], []
+
+
+def load_character_encodings(character_image_paths: Union[str, Sequence[str]]) -> Optional[np.ndarray]:
+    """
+    (n, 128) encodings of every face in one or more reference photos of a character.
+    Photos without a usable face are skipped; None when none of them has one.
+    """
+    if isinstance(character_image_paths, str):
+        character_image_paths = [character_image_paths]
+    encodings = []
+    for character_image_path in character_image_paths:
+        try:
+            character_image = face_recognition.load_image_file(character_image_path)
+            character_face_encodings = face_recognition.face_encodings(character_image)
+        except FileNotFoundError:
+            logger.error(f"Character image not found at '{character_image_path}'.")
+            continue
+        except Exception as e:
+            logger.error(f"Error loading or encoding character image: {e}")
+            continue
+        if not character_face_encodings:
+            logger.warning(f"No face found in the character image '{character_image_path}'.")
+            continue
+        encodings.extend(character_face_encodings)
+        logger.info(f"Character '{os.path.basename(character_image_path)}': "
+                    f"{len(character_face_encodings)} face encoding(s) loaded.")
+
+    if not encodings:
+        logger.error("No face found in the character image(s). Please provide a clear image of the character's face.")
+        return None
+    return np.asarray(encodings, dtype=np.float64)
+
+
+def scan_shard(video_path: str, scale_factor: float, sampling: str, step: int,
+               start_frame: int, end_frame: Optional[int]) -> ShardFaces:
+    """
+    Worker: detect and encode every face on the sampled frames of one shard.
+    Returns the shard's part of the face index (see face_index.ShardFaces).
+    """
+    sampler = FrameSampler(sampling, step)
+    frame_reader = FrameReader(video_path, sampler=sampler, scale_factor=scale_factor,
+                               start_frame=start_frame, end_frame=end_frame)
+    empty = (np.empty((0, ENCODING_SIZE), np.float32), np.empty((0, 4), np.int32))
+    if not frame_reader.start():
+        return [], [], *empty, start_frame - 1
+    sample_frames: List[int] = []
+    face_frames: List[int] = []
+    encodings = []
+    boxes = []
+    try:
+        while True:
+            item = frame_reader.read()
+            if item is None:
+                break
+            frame_number, rgb_small_frame = item
+            sample_frames.append(frame_number)
+            face_locations, face_encodings = _detect_faces(rgb_small_frame, frame_number)
+            for location, encoding in zip(face_locations, face_encodings):
+                face_frames.append(frame_number)
+                encodings.append(encoding)
+                # Boxes are stored in source-resolution pixels so they do not depend on scale_factor
+                boxes.append([int(round(v / scale_factor)) for v in location])
+    finally:
+        frame_reader.stop()
+    last_frame = frame_reader.total_frames() if end_frame is None else frame_reader.frames_decoded
+    if not face_frames:
+        return sample_frames, face_frames, *empty, last_frame
+    return (sample_frames, face_frames, np.asarray(encodings, dtype=np.float32),
+            np.asarray(boxes, dtype=np.int32), last_frame)
+
+
+def refine_transitions(video_path: str, matcher: FaceMatcher, scale_factor: float,
+                       transitions: List[Transition], known: Optional[Dict[int, np.ndarray]] = None
+                       ) -> Tuple[List[int], Dict[int, np.ndarray]]:
+    """
+    Worker: exact hit frame nearest each (character, miss, hit) transition, by random-access
+    probes. One detection answers every character, so probes are shared between them.
+    Frames in `known` ({frame: face encodings}) are not decoded again. Returns the hit
+    frames and the encodings of the frames probed here, for the face index.
+    """
+    known = known or {}
+    probed: Dict[int, np.ndarray] = {}
+    cap = None
+    fps = 0.0
+
+    def probe(frame_number: int) -> np.ndarray:
+        nonlocal cap, fps
+        encodings = known.get(frame_number)
+        if encodings is None:
+            encodings = probed.get(frame_number)
+        if encodings is None:
+            if cap is None:
+                cap = cv2.VideoCapture(video_path)
+                fps = cap.get(cv2.CAP_PROP_FPS)
+            # Timestamp seek plus read-back, as FrameReader does, so probes see the frame they name
+            if seek_to_frame(cap, frame_number - 1, fps) == frame_number - 1:
+                ret, frame = cap.read()
+            else:
+                ret, frame = False, None
+            _, face_encodings = _detect_faces(_prepare_frame(frame, scale_factor), frame_number) if ret else ([], [])
+            encodings = np.asarray(face_encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+            probed[frame_number] = encodings
+        return matcher.frame_matches(encodings)
+
+    try:
+        frames = [refine_boundary(miss, hit, lambda n: bool(probe(n)[column])) for column, miss, hit in transitions]
+    finally:
+        if cap is not None:
+            cap.release()
+    return frames, probed
+
+
+def _refine_cached(matcher: FaceMatcher, transitions: List[Transition],
+                   probes: Dict[int, np.ndarray]) -> Tuple[Dict[Transition, int], List[Transition]]:
+    """Transitions whose binary search only visits already-probed frames, and the rest."""
+    refined, missing = {}, []
+    for transition in transitions:
+        column, miss, hit = transition
+        try:
+            refined[transition] = refine_boundary(
+                miss, hit, lambda n: bool(matcher.frame_matches(probes[n])[column]))
+        except KeyError:
+            missing.append(transition)
+    return refined, missing
+
+
+def build_face_index(video_path: str, fps: float, step: int, scale_factor: float, sampling: str,
+                     shards: List[Tuple[int, Optional[int]]],
+                     on_shard: Optional[Callable[[List[ShardFaces], int], None]] = None) -> FaceIndex:
+    """
+    Scan the shards (in the worker pool when there are several) and merge them into one index.
+    `on_shard(prefix, frames_scanned)` is called as shards finish, with the run of finished
+    shards from the start of the video and the number of frames scanned so far.
+    """
+    if len(shards) == 1:
+        results = [scan_shard(video_path, scale_factor, sampling, step, *shards[0])]
+    else:
+        pool = get_face_pool()
+        futures = {pool.submit(scan_shard, video_path, scale_factor, sampling, step, start_frame, end_frame): position
+                   for position, (start_frame, end_frame) in enumerate(shards)}
+        results: List[Optional[ShardFaces]] = [None] * len(shards)
+        ready = frames_scanned = 0
+        for future in as_completed(futures):
+            position = futures[future]
+            results[position] = future.result()
+            frames_scanned += max(0, results[position][4] - shards[position][0] + 1)
+            while ready < len(results) and results[ready] is not None:
+                ready += 1
+            if on_shard is not None:
+                on_shard(results[:ready], frames_scanned)
+    return FaceIndex.from_shards(results, fps, step)
+
+
+def _refine_all(video_path: str, matcher: FaceMatcher, scale_factor: float,
+                transitions: List[Transition], workers: int,
+                probes: Optional[Dict[int, np.ndarray]] = None) -> Dict[Transition, int]:
+    """
+    {transition: refined hit frame}, split over up to `workers` pool workers. A single
+    group runs in-process.
+    `probes` ({frame: face encodings}) answers frames probed before and collects the new ones;
+    transitions it fully answers never leave this process.
+    """
+    probes = probes if probes is not None else {}
+    refined, transitions = _refine_cached(matcher, transitions, probes)
+    if not transitions:
+        return refined
+    # Neighbouring transitions (often the same boundary for several characters) stay in one worker
+    transitions = sorted(transitions, key=lambda t: t[1])
+    size = -(-len(transitions) // workers)
+    groups = [transitions[i:i + size] for i in range(0, len(transitions), size)]
+    if len(groups) == 1:
+        results = [(transitions, refine_transitions(video_path, matcher, scale_factor, transitions, probes))]
+    else:
+        pool = get_face_pool()
+        futures = [(group, pool.submit(refine_transitions, video_path, matcher, scale_factor, group, probes))
+                   for group in groups]
+        results = [(group, future.result()) for group, future in futures]
+    for group, (frames, probed) in results:
+        refined.update(zip(group, frames))
+        probes.update(probed)
+    return refined
+
+
+def search_characters(video_path: str, references: Dict[str, np.ndarray], tolerance: float = 0.6,
+                      frames_after_detection: int = 30, scale_factor: float = 1,
+                      sample_fps: float = FACE_SAMPLE_FPS, sampling: str = FACE_SAMPLING,
+                      workers: int = FACE_WORKERS,
+                      refine: bool = FACE_REFINE_BOUNDARIES,
+                      progress: Optional[ProgressCallback] = None) -> Dict[str, List[Tuple[float, float]]]:
+    """
+    (start, end) periods for each character in `references` ({name: (n, 128) encodings}).
+
+    Faces are detected on sampled frames only ("fps": sample_fps detections per second,
+    "keyframes": scene cuts plus enough frames to cover the hysteresis window), in up to
+    `workers` processes each scanning one time shard. The detections are kept in a
+    per-video face index and matched against all characters with one distance matrix,
+    so extra characters (and searching the same video again) cost no extra detections.
+    With `refine`, each clip boundary is then moved to the exact frame by binary search.
+
+    `progress(frames_scanned, total_frames, clips)` is called while scanning, with the
+    clips that later shards can no longer change; the video is then scanned in
+    FACE_SHARD_MIN_SECONDS shards so they arrive early. Blocking; call it off the event loop.
+    """
+    matcher = FaceMatcher(references, tolerance)
+    if not matcher.names:
+        return {}
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        logger.error(f"Error: Could not open video file '{video_path}'.")
+        return {name: [] for name in matcher.names}
+    fps = int(cap.get(cv2.CAP_PROP_FPS))
+    estimated_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+    if fps == 0:
+        logger.warning(f"FPS is 0 for video '{video_path}'. Cannot process timestamps accurately.")
+        return {name: [] for name in matcher.names}
+
+    step = sample_step(fps, sample_fps, frames_after_detection)
+    min_shard_frames = int(FACE_SHARD_MIN_SECONDS * fps)
+    shard_count = max(1, workers)
+    if progress is not None:
+        shard_count = max(shard_count, estimated_frames // max(1, min_shard_frames))
+    shards = plan_shards(max(estimated_frames, 1), step, shard_count, min_shard_frames)
+    refined: Dict[Transition, int] = {}
+    # {frame: face encodings} of every frame probed between samples, shared with the face index
+    probes: Dict[int, np.ndarray] = {}
+
+    def refine_pending(samples: Dict[str, Dict[int, bool]], parallel: int):
+        if not refine:
+            return
+        # Transitions are found on the merged samples, so pairs straddling a shard boundary are included
+        pending = [(column, miss, hit) for column, name in enumerate(matcher.names)
+                   for miss, hit in sample_transitions(samples[name]) if (column, miss, hit) not in refined]
+        try:
+            refined.update(_refine_all(video_path, matcher, scale_factor, pending, parallel, probes=probes))
+        except BrokenProcessPool as e:
+            logger.error(f"[face_search] Worker pool failed ({e}), refining in-process")
+            shutdown_face_pool()
+            refined.update(_refine_all(video_path, matcher, scale_factor, pending, 1, probes=probes))
+
+    def clips_for(samples: Dict[str, Dict[int, bool]], total_frames: int) -> Dict[str, List[Tuple[float, float]]]:
+        results = {}
+        for column, name in enumerate(matcher.names):
+            hit_frames = {frame for frame, found in samples[name].items() if found}
+            hit_frames.update(frame for (owner, _, _), frame in refined.items() if owner == column)
+            results[name] = hits_to_clips(sorted(hit_frames), fps, frames_after_detection, total_frames)
+        return results
+
+    def on_shard(prefix: List[ShardFaces], frames_scanned: int):
+        settled = {name: [] for name in matcher.names}
+        partial = FaceIndex.from_shards(prefix, fps, step) if prefix else None
+        if partial is not None and len(partial.sample_frames):
+            samples = partial.match_all(matcher)
+            # Refined here on the scanning thread: pool jobs would queue behind the shards still
+            # scanning, holding back clips that are already settled
+            refine_pending(samples, 1)
+            last_sample = int(partial.sample_frames[-1])
+            # A clip whose hysteresis window closed before the last scanned sample cannot grow
+            settled = {name: settled_clips(clips, fps, last_sample)
+                       for name, clips in clips_for(samples, last_sample).items()}
+        progress(frames_scanned, max(estimated_frames, frames_scanned), settled)
+
+    store = get_face_index_store()
+    index_path = store.index_path(video_path, sampling, step, scale_factor)
+    index = store.load(index_path)
+
+    if index is not None:
+        probes.update(index.probes)
+        logger.info(f"[face_search] Reusing face index {os.path.basename(index_path)}: "
+                    f"{len(index)} faces on {len(index.sample_frames)} sampled frames, {len(probes)} probed")
+    else:
+        logger.info(f"Video resolution: {width}x{height}, FPS: {fps}, ~{estimated_frames} frames")
+        logger.info(f"Processing frames at scale factor: {scale_factor}, sampling: {sampling} (every {step} frames), "
+                    f"{len(shards)} shard(s)")
+        try:
+            index = build_face_index(video_path, fps, step, scale_factor, sampling, shards,
+                                     on_shard if progress is not None else None)
+        except BrokenProcessPool as e:
+            logger.error(f"[face_search] Worker pool failed ({e}), scanning in-process")
+            shutdown_face_pool()
+            shards = [(1, None)]
+            index = build_face_index(video_path, fps, step, scale_factor, sampling, shards)
+        store.save(index_path, index)
+        logger.info(f"[face_search] Indexed {len(index)} faces on {len(index.sample_frames)} sampled frames")
+
+    samples = index.match_all(matcher)
+    refine_pending(samples, min(len(shards), max(1, workers)))
+    new_probes = index.add_probes(probes)
+    if new_probes:
+        # Boundaries refined once are answered from the index next time, without decoding
+        store.save(index_path, index)
+        logger.info(f"[face_search] Stored {new_probes} probed frame(s) in the face index")
+    results = clips_for(samples, index.total_frames)
+    if progress is not None:
+        progress(index.total_frames, index.total_frames, results)
+    logger.info(f"Video processing for timestamps complete: {len(index.sample_frames)} sampled + {len(refined)} "
+                f"refined boundaries for {index.total_frames} frames, {len(matcher.names)} character(s).")
+    return results
+
+
+def extract_character_clips(video_path: str, character_image_path: Union[str, Sequence[str]], tolerance: float = 0.6, frames_after_detection: int = 30, scale_factor: float = 1,
+                            sample_fps: float = FACE_SAMPLE_FPS, sampling: str = FACE_SAMPLING,
+                            workers: int = FACE_WORKERS,
+                            refine: bool = FACE_REFINE_BOUNDARIES,
+                            progress: Optional[Callable[[int, int, List[Tuple[float, float]]], None]] = None
+                            ) -> List[Tuple[float, float]]:
+    """
+    Searches a video for a specific character and returns the (start, end) periods where
+    the character is present. `character_image_path` may be several photos of the
+    character; every face in them is used as a reference. `progress(frames_scanned,
+    total_frames, clips)` reports the clips settled so far. See search_characters.
+    """
+
+    if sys.version_info >= (3, 13):
+        logger.warning(
+            "You are using Python 3.13 or newer. face_recognition (and its underlying dlib library) "
+            "might not have full, stable support for this version yet. If you encounter issues, "
+            "consider trying Python 3.10, 3.11, or 3.12 in a virtual environment."
+        )
+
+    known_character_encodings = load_character_encodings(character_image_path)
+    if known_character_encodings is None:
+        return []
+
+    clip_timestamps = search_characters(
+        video_path, {'character': known_character_encodings}, tolerance=tolerance,
+        frames_after_detection=frames_after_detection, scale_factor=scale_factor,
+        sample_fps=sample_fps, sampling=sampling, workers=workers, refine=refine,
+        progress=(lambda done, total, clips: progress(done, total, clips['character'])) if progress else None,
+    ).get('character', [])
+
+    logger.info(f"Found {len(clip_timestamps)} periods where the character was present.")
+
+    return clip_timestamps
@@ -5,11 +5,18 @@ Analyzes transcriptions based on 9 vibes and 6 age groups from frontend.
 
 import os
 import json
+import time
 import asyncio
-from typing import Dict, Optional, List
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Optional, List
 import logging
-import random
-import time
+
+from ..utils.rate_limiter import LLMScheduler, get_scheduler
+from ..utils.prerank import select_candidates, VIBE_MAX_LLM_CHUNKS
+from ..utils.llm_cache import LLMResponseCache, get_llm_cache, score_cache_key
+from ..utils.score_stream import ScoreStreamParser, SCORE_FIELDS
+from ..utils.audio_features import describe_acoustics, has_acoustic_content
 
 try:
     from anthropic import Anthropic
@@ -24,9 +31,247 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
-class SimpleVibeAnalyzer:
+# Bump when the scoring prompts change so cached scores are not reused
+PROMPT_VERSION = 2
+
+# Batched scoring: many chunks per request, bounded by an estimated input-token budget
+VIBE_BATCH_TOKEN_BUDGET = int(os.getenv("VIBE_BATCH_TOKEN_BUDGET", "6000"))
+VIBE_BATCH_MAX_CHUNKS = int(os.getenv("VIBE_BATCH_MAX_CHUNKS", "20"))
+MAX_CHUNK_TEXT_LEN = 2000
+BATCH_PROMPT_OVERHEAD_TOKENS = 300
+OUTPUT_TOKENS_PER_CHUNK = 120
+SCORES_ONLY_TOKENS_PER_CHUNK = 50
+
+# Per-attempt deadline for Gemini calls (batched calls get twice as long)
+GEMINI_CALL_DEADLINE = float(os.getenv("GEMINI_CALL_DEADLINE", "60"))
+# Threads reserved for the sync Gemini SDK fallback, kept apart from the default executor
+GEMINI_MAX_THREADS = int(os.getenv("GEMINI_MAX_THREADS", os.getenv("GEMINI_MAX_CONCURRENCY", "4")))
+
+# Overall budget for a remote vibe analysis before the manager switches to its fallback
+VIBE_LLM_TIMEOUT = float(os.getenv("VIBE_LLM_TIMEOUT", "300"))
+
+# Scores-only mode skips the free-text reason / best_moment fields
+VIBE_SCORES_ONLY = os.getenv("VIBE_SCORES_ONLY", "").lower() in ("1", "true", "yes")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+def chunk_text(chunk: Dict) -> str:
+    return chunk.get('transcription', {}).get('text', '')[:MAX_CHUNK_TEXT_LEN]
+
+
+def chunk_audio(chunk: Dict) -> str:
+    """Acoustic description of the chunk for prompts ('' when not available)."""
+    return describe_acoustics(chunk.get('transcription', {}).get('acoustic'))
+
+
+def is_scorable_chunk(chunk: Dict) -> bool:
+    """Transcribed chunks with some text, or loud enough to score on their audio alone (e.g. music)."""
+    if not chunk.get('success'):
+        return False
+    transcription = chunk.get('transcription') or {}
+    text = transcription.get('text', '')
+    return bool(text.strip() and len(text) > 4) or has_acoustic_content(transcription.get('acoustic'))
+
+
+def pack_chunk_batches(chunks: List[Dict], indices: Optional[List[int]] = None,
+                       token_budget: int = VIBE_BATCH_TOKEN_BUDGET,
+                       max_chunks: int = VIBE_BATCH_MAX_CHUNKS) -> List[List[tuple]]:
+    """Greedily pack (index, chunk) pairs into batches that fit the token budget."""
+    batches, current, used = [], [], BATCH_PROMPT_OVERHEAD_TOKENS
+    for index in (range(len(chunks)) if indices is None else indices):
+        chunk = chunks[index]
+        cost = estimate_tokens(chunk_text(chunk)) + 40  # id/timestamp/audio line
+        if current and (used + cost > token_budget or len(current) >= max_chunks):
+            batches.append(current)
+            current, used = [], BATCH_PROMPT_OVERHEAD_TOKENS
+        current.append((index, chunk))
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def score_format(indent: str = "    ", scores_only: bool = False) -> str:
+    """Field lines of the JSON response format; the score fields always come first."""
+    lines = [f'"{field}": 0-100' for field in SCORE_FIELDS]
+    if not scores_only:
+        lines += ['"reason": "brief explanation of why this does/doesn\'t match"',
+                  '"best_moment": "describe the most interesting part if any"']
+    return ',\n'.join(indent + line for line in lines)
+
+
+def build_batch_prompt(batch: List[tuple], target_vibe: str, target_age_group: str,
+                       scores_only: bool = False) -> str:
+    """One prompt scoring every chunk in the batch; instructions are sent once."""
+    segments = '\n'.join(
+        f'[{index}] ({chunk.get("start_time", 0):.1f}s-{chunk.get("end_time", 0):.1f}s): "{chunk_text(chunk)}"'
+        + (f' [audio: {chunk_audio(chunk)}]' if chunk_audio(chunk) else '')
+        for index, chunk in batch
+    )
+    return f"""
+Analyze these video segments to see how well each matches the target vibe and age group.
+
+Target Vibe: {target_vibe}
+Target Age Group: {target_age_group}
+
+Segments (id, time range, text, audio character when known):
+{segments}
+
+Use the audio character too: music, energy and tempo matter for the vibe, and a segment
+with little or no speech can still be a strong clip.
+
+Rate every segment on:
+1. How well it matches the "{target_vibe}" vibe (0-100)
+2. How suitable it is for "{target_age_group}" audience (0-100)
+3. How good it would be as a short clip (0-100)
+
+Respond with a JSON array containing one object per segment id, in this exact format:
+[
+    {{
+        "id": <segment id>,
+{score_format("        ", scores_only)}
+    }}
+]
+"""
+
+
+def batch_max_tokens(batch_size: int, scores_only: bool = False) -> int:
+    per_chunk = SCORES_ONLY_TOKENS_PER_CHUNK if scores_only else OUTPUT_TOKENS_PER_CHUNK
+    return per_chunk * batch_size + 100
+
+
+def parse_batch_response(response: str, expected_ids: List[int]) -> Dict[int, Dict]:
+    """Parse a JSON array of per-chunk scores into {chunk index: analysis}."""
+    try:
+        start_idx = response.find('[')
+        end_idx = response.rfind(']') + 1
+        if start_idx < 0 or end_idx <= start_idx:
+            return {}
+        items = json.loads(response[start_idx:end_idx])
+    except json.JSONDecodeError as e:
+        logger.warning(f"Failed to parse batch response: {e}")
+        return {}
+    expected = set(expected_ids)
+    analyses = {}
+    for item in items:
+        if not isinstance(item, dict) or not all(field in item for field in SCORE_FIELDS):
+            continue
+        try:
+            index = int(item.pop('id'))
+        except (KeyError, TypeError, ValueError):
+            continue
+        if index in expected:
+            analyses[index] = item
+    return analyses
+
+
+def _chunk_cache_keys(chunks: List[Dict], target_vibe: str, target_age_group: str,
+                      scores_only: bool = False) -> List[str]:
+    version = f"{PROMPT_VERSION}:scores" if scores_only else PROMPT_VERSION
+    return [score_cache_key(chunk_text(chunk) + '\n' + chunk_audio(chunk), target_vibe, target_age_group, version)
+            for chunk in chunks]
+
+
+def lookup_cached_analyses(cache: Optional[LLMResponseCache], namespace: str, chunks: List[Dict],
+                           target_vibe: str, target_age_group: str, scores_only: bool = False) -> Dict[int, Dict]:
+    """Cached analyses for the chunks, as {chunk index: analysis}."""
+    if cache is None:
+        return {}
+    keys = _chunk_cache_keys(chunks, target_vibe, target_age_group, scores_only)
+    found = cache.get_many(namespace, keys)
+    analyses = {i: dict(found[key]) for i, key in enumerate(keys) if key in found}
+    if analyses:
+        logger.info(f"[llm_cache] {len(analyses)}/{len(chunks)} chunk scores served from cache ({namespace})")
+    return analyses
+
+
+def store_cached_analyses(cache: Optional[LLMResponseCache], namespace: str, chunks: List[Dict],
+                          analyses: Dict[int, Dict], target_vibe: str, target_age_group: str,
+                          scores_only: bool = False):
+    if cache is None:
+        return
+    keys = _chunk_cache_keys(chunks, target_vibe, target_age_group, scores_only)
+    cache.put_many(namespace, {keys[i]: analysis for i, analysis in analyses.items() if analysis})
+
+
+async def analyze_chunks_batched(namespace: str, chunks: List[Dict], target_vibe: str, target_age_group: str,
+                                 scores_only: bool,
+                                 call_batch: Callable[[str, List[int], int], Awaitable[str]],
+                                 analyze_single: Callable[[Dict], Awaitable[Optional[Dict]]],
+                                 log_prefix: str = "", cache: Optional[LLMResponseCache] = None,
+                                 token_budget: int = VIBE_BATCH_TOKEN_BUDGET,
+                                 max_chunks: int = VIBE_BATCH_MAX_CHUNKS) -> List[Dict]:
     """
-    Basic vibe analyzer that works with frontend's 9 vibes and 6 age groups.
+    Score chunks with any provider: serve what we can from the score cache, pack the rest
+    into token-budgeted multi-chunk requests sent concurrently, and score any chunk
+    missing from a reply on its own.
+
+    `call_batch(prompt, expected_ids, max_tokens)` sends one batched prompt and returns the
+    reply text; `analyze_single(chunk)` scores one chunk with the single-chunk prompt.
+    `cache` is the score cache (None: no caching); `token_budget` and `max_chunks` bound each batch.
+    """
+    # SQLite work stays off the event loop
+    cached = await asyncio.to_thread(lookup_cached_analyses, cache, namespace, chunks, target_vibe,
+                                     target_age_group, scores_only)
+    pending = [i for i in range(len(chunks)) if i not in cached]
+    batches = pack_chunk_batches(chunks, pending, token_budget, max_chunks)
+
+    async def score_batch(batch: List[tuple]) -> Dict[int, Dict]:
+        if len(batch) < 2:
+            return {}  # A lone chunk uses the single-chunk prompt
+        prompt = build_batch_prompt(batch, target_vibe, target_age_group, scores_only)
+        expected_ids = [index for index, _ in batch]
+        try:
+            response = await call_batch(prompt, expected_ids, batch_max_tokens(len(batch), scores_only))
+            return parse_batch_response(response, expected_ids)
+        except Exception as e:
+            logger.error(f"{log_prefix}Error analyzing chunk batch: {e}")
+            return {}
+
+    analyses = {}
+    for batch_analyses in await asyncio.gather(*[score_batch(batch) for batch in batches]):
+        analyses.update(batch_analyses)
+
+    missing = [i for i in pending if i not in analyses]
+    if missing:
+        logger.info(f"{log_prefix}Scoring {len(missing)} chunks individually after batched requests")
+        singles = await asyncio.gather(*[analyze_single(chunks[i]) for i in missing])
+        analyses.update({i: a for i, a in zip(missing, singles) if a})
+
+    logger.info(f"{log_prefix}Scored {len(pending)} chunks with {len(batches)} batched requests, {len(cached)} from cache")
+    await asyncio.to_thread(store_cached_analyses, cache, namespace, chunks, analyses, target_vibe,
+                            target_age_group, scores_only)
+    analyses.update(cached)
+    return build_chunk_results(chunks, analyses)
+
+
+def build_chunk_results(chunks: List[Dict], analyses: Dict[int, Dict]) -> List[Dict]:
+    """Attach analyses (keyed by chunk index) to chunk metadata, in timeline order."""
+    results = []
+    for index, chunk in enumerate(chunks):
+        analysis = analyses.get(index)
+        if analysis:
+            start_time = chunk.get('start_time', 0)
+            end_time = chunk.get('end_time', 0)
+            results.append({
+                'chunk_id': chunk.get('id'),
+                'start_time': start_time,
+                'end_time': end_time,
+                'duration': end_time - start_time,
+                'text': chunk.get('transcription', {}).get('text', ''),
+                'analysis': analysis
+            })
+    return results
+
+
+class VibeAnalyzerBase:
+    """
+    Vibes, age groups and result formatting shared by every vibe analyzer,
+    whether it calls an API or scores locally.
     """
     
     # Frontend vibes (must match exactly)
@@ -40,17 +285,84 @@ class SimpleVibeAnalyzer:
         "kids", "teens", "young-adults", "adults", "seniors", "general"
     ]
     
-    def __init__(self, api_key: Optional[str] = None, model: str = "claude-3-5-sonnet-20241022"):
+    def _rank_clips(self, analyzed_chunks: List[Dict], 
+                   target_vibe: str, target_age_group: str) -> List[Dict]:
+        """Rank clips by their scores and return the best ones."""
+        # Filter out chunks without analysis
+        valid_chunks = [
+            chunk for chunk in analyzed_chunks 
+            if chunk.get('analysis') and chunk['analysis'].get('overall_score', 0) > 15
+        ]
+        
+        # Sort by overall score (descending)
+        valid_chunks.sort(
+            key=lambda x: x.get('analysis', {}).get('overall_score', 0), 
+            reverse=True
+        )
+        
+        # Format for frontend
+        ranked_clips = []
+        for i, chunk in enumerate(valid_chunks):
+            analysis = chunk.get('analysis', {})
+            ranked_clips.append({
+                'rank': i + 1,
+                'start_time': chunk.get('start_time'),
+                'end_time': chunk.get('end_time'),
+                'duration': chunk.get('duration'),
+                'title': f"{target_vibe} Clip {i + 1}",
+                'text_preview': chunk.get('text', '')[:100] + "..." if len(chunk.get('text', '')) > 100 else chunk.get('text', ''),
+                'scores': {
+                    'vibe_match': analysis.get('vibe_match_score', 0),
+                    'age_group_match': analysis.get('age_group_match_score', 0),
+                    'clip_potential': analysis.get('clip_potential_score', 0),
+                    'overall': analysis.get('overall_score', 0)
+                },
+                'reason': analysis.get('reason', ''),
+                'best_moment': analysis.get('best_moment', ''),
+                'recommended_for': target_age_group,
+                'vibe': target_vibe
+            })
+        
+        return ranked_clips
+    
+    def _empty_result(self) -> Dict:
+        """Return empty result structure."""
+        return {
+            'selected_vibe': '',
+            'selected_age_group': '',
+            'total_chunks_analyzed': 0,
+            'clips_found': 0,
+            'top_clips': [],
+            'status': 'no_content',
+            'message': 'No valid transcription chunks found for analysis'
+        }
+
+
+class SimpleVibeAnalyzer(VibeAnalyzerBase):
+    """
+    Basic vibe analyzer that works with frontend's 9 vibes and 6 age groups.
+    """
+    
+    def __init__(self, api_key: Optional[str] = None, model: str = "claude-3-5-sonnet-20241022",
+                 scheduler: Optional[LLMScheduler] = None, cache: Optional[LLMResponseCache] = None,
+                 batch_token_budget: int = VIBE_BATCH_TOKEN_BUDGET, batch_max_chunks: int = VIBE_BATCH_MAX_CHUNKS):
         self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
         if not self.api_key:
             raise ValueError("Anthropic API key not provided. Set ANTHROPIC_API_KEY environment variable.")
         
-        self.client = Anthropic(api_key=self.api_key)
+        # Retries are handled by the shared scheduler so 429s back off across all requests
+        self.client = Anthropic(api_key=self.api_key, max_retries=0)
         self.model = model
+        # Shared provider scheduler and score cache unless given explicitly (e.g. in tests)
+        self.scheduler = scheduler or get_scheduler("anthropic")
+        self.cache = cache if cache is not None else get_llm_cache()
+        self.batch_token_budget = batch_token_budget
+        self.batch_max_chunks = batch_max_chunks
     
     async def analyze_video_chunks(self, transcription_data: Dict, 
                                  selected_vibe: str, 
-                                 selected_age_group: str) -> Dict:
+                                 selected_age_group: str,
+                                 scores_only: bool = VIBE_SCORES_ONLY) -> Dict:
         """
         Analyze video chunks and find the best clips for the selected vibe and age group.
         
@@ -58,6 +370,7 @@ class SimpleVibeAnalyzer:
             transcription_data: Complete transcription with chunks
             selected_vibe: One of the 9 frontend vibes
             selected_age_group: One of the 6 frontend age groups
+            scores_only: Skip the free-text reason / best_moment to cut output tokens
             
         Returns:
             Simple analysis with ranked clips
@@ -77,24 +390,18 @@ class SimpleVibeAnalyzer:
             return self._empty_result()
         
         # Filter successful chunks with good transcription
-        valid_chunks = [
-            chunk for chunk in chunks 
-            if chunk.get('success') and 
-            chunk.get('transcription', {}).get('text', '').strip() and
-            len(chunk.get('transcription', {}).get('text', '')) > 4
-        ]
+        valid_chunks = [chunk for chunk in chunks if is_scorable_chunk(chunk)]
         
-        # LIMIT TO FIRST 10 CHUNKS TO SAVE CREDITS
-        if len(valid_chunks) > 10:
-            logger.info(f"Limiting analysis to first 10 chunks (out of {len(valid_chunks)}) to save API credits")
-            valid_chunks = valid_chunks[:10]
+        # Pre-rank locally so only the most promising chunks, spread over the whole video, reach the LLM
+        if len(valid_chunks) > VIBE_MAX_LLM_CHUNKS:
+            valid_chunks = select_candidates(valid_chunks, selected_vibe, VIBE_MAX_LLM_CHUNKS)
         
         if not valid_chunks:
             return self._empty_result()
         
         # Analyze chunks for the specific vibe and age group
         analyzed_chunks = await self._analyze_chunks_for_vibe(
-            valid_chunks, selected_vibe, selected_age_group
+            valid_chunks, selected_vibe, selected_age_group, scores_only
         )
         
         # Rank and return top clips
@@ -104,6 +411,7 @@ class SimpleVibeAnalyzer:
             'selected_vibe': selected_vibe,
             'selected_age_group': selected_age_group,
             'total_chunks_analyzed': len(valid_chunks),
+            'chunks_scored': len(analyzed_chunks),
             'clips_found': len(top_clips),
             'top_clips': top_clips[:5],  # Return top 5 clips
             'status': 'success'
@@ -111,51 +419,37 @@ class SimpleVibeAnalyzer:
     
     async def _analyze_chunks_for_vibe(self, chunks: List[Dict], 
                                      target_vibe: str, 
-                                     target_age_group: str) -> List[Dict]:
+                                     target_age_group: str,
+                                     scores_only: bool = False) -> List[Dict]:
         """Analyze each chunk for the target vibe and age group."""
-        analyzed_chunks = []
-        
-        # Process chunks in batches to avoid API limits
-        batch_size = 3
-        for i in range(0, len(chunks), batch_size):
-            batch = chunks[i:i + batch_size]
-            batch_results = await self._analyze_chunk_batch(batch, target_vibe, target_age_group)
-            analyzed_chunks.extend(batch_results)
-        
-        return analyzed_chunks
+        # All chunks are submitted at once; the scheduler paces them to the provider's limits
+        return await self._analyze_chunk_batch(chunks, target_vibe, target_age_group, scores_only)
     
     async def _analyze_chunk_batch(self, chunks: List[Dict], 
                                  target_vibe: str, 
-                                 target_age_group: str) -> List[Dict]:
-        """Analyze a batch of chunks."""
-        results = []
-        
-        for chunk in chunks:
-            text = chunk.get('transcription', {}).get('text', '')
-            start_time = chunk.get('start_time', 0)
-            end_time = chunk.get('end_time', 0)
-            
-            analysis = await self._analyze_single_chunk(
-                text, start_time, end_time, target_vibe, target_age_group
-            )
-            
-            if analysis:
-                results.append({
-                    'chunk_id': chunk.get('id'),
-                    'start_time': start_time,
-                    'end_time': end_time,
-                    'duration': end_time - start_time,
-                    'text': text,
-                    'analysis': analysis
-                })
-            await asyncio.sleep(1) # Add a 1-second delay to respect rate limits
+                                 target_age_group: str,
+                                 scores_only: bool = False) -> List[Dict]:
+        """Score chunks through Claude in cached, batched requests (see analyze_chunks_batched)."""
+        async def call_batch(prompt: str, expected_ids: List[int], max_tokens: int) -> str:
+            return await self._call_claude(prompt, max_tokens=max_tokens,
+                                           expected_ids=expected_ids, scores_only=scores_only)
         
-        return results
+        return await analyze_chunks_batched(
+            f"anthropic:{self.model}", chunks, target_vibe, target_age_group, scores_only, call_batch,
+            lambda chunk: self._analyze_single_chunk(
+                chunk.get('transcription', {}).get('text', ''), chunk.get('start_time', 0), chunk.get('end_time', 0),
+                target_vibe, target_age_group, scores_only, audio=chunk_audio(chunk)
+            ),
+            cache=self.cache, token_budget=self.batch_token_budget, max_chunks=self.batch_max_chunks
+        )
     
     async def _analyze_single_chunk(self, text: str, start_time: float, 
                                   end_time: float, target_vibe: str, 
-                                  target_age_group: str) -> Optional[Dict]:
+                                  target_age_group: str,
+                                  scores_only: bool = False,
+                                  audio: str = '') -> Optional[Dict]:
         """Analyze a single chunk for vibe match."""
+        audio_line = f"Audio: {audio}\n" if audio else ""
         
         prompt = f"""
 Analyze this video segment text to see how well it matches the target vibe and age group.
@@ -165,7 +459,7 @@ Target Age Group: {target_age_group}
 
 Segment (from {start_time:.1f}s to {end_time:.1f}s):
 "{text}"
-
+{audio_line}
 Rate this segment on:
 1. How well it matches the "{target_vibe}" vibe (0-100)
 2. How suitable it is for "{target_age_group}" audience (0-100)
@@ -173,44 +467,50 @@ Rate this segment on:
 
 Respond in this exact JSON format:
 {{
-    "vibe_match_score": 0-100,
-    "age_group_match_score": 0-100,
-    "clip_potential_score": 0-100,
-    "overall_score": 0-100,
-    "reason": "brief explanation of why this does/doesn't match",
-    "best_moment": "describe the most interesting part if any"
+{score_format("    ", scores_only)}
 }}
 """
         
         try:
-            response = await self._call_claude(prompt, max_tokens=500)
+            response = await self._call_claude(prompt, max_tokens=100 if scores_only else 500,
+                                               scores_only=scores_only)
             return self._parse_response(response)
         except Exception as e:
             logger.error(f"Error analyzing chunk: {e}")
             return None
     
-    async def _call_claude(self, prompt: str, max_tokens: int = 500) -> str:
-        """Make API call to Claude."""
+    async def _call_claude(self, prompt: str, max_tokens: int = 500,
+                           expected_ids: Optional[List[int]] = None,
+                           scores_only: bool = False) -> str:
+        """Make a streaming API call to Claude through the shared rate-limit scheduler."""
         try:
-            response = await asyncio.to_thread(
-                self.client.messages.create,
-                model=self.model,
-                max_tokens=max_tokens,
-                temperature=0.1,  # Low temperature for consistent scoring
-                messages=[{
-                    "role": "user",
-                    "content": prompt
-                }]
+            return await self.scheduler.run(
+                asyncio.to_thread, self._stream_claude, prompt, max_tokens, expected_ids, scores_only
             )
-            # Handle different response types
-            if hasattr(response.content[0], 'text'):
-                return response.content[0].text
-            else:
-                return str(response.content[0])
         except Exception as e:
             logger.error(f"Claude API call failed: {e}")
             raise
     
+    def _stream_claude(self, prompt: str, max_tokens: int,
+                       expected_ids: Optional[List[int]], scores_only: bool) -> str:
+        """Stream the response and close it as soon as the scores are complete."""
+        parser = ScoreStreamParser(expected_ids, scores_only)
+        with self.client.messages.stream(
+            model=self.model,
+            max_tokens=max_tokens,
+            temperature=0.1,  # Low temperature for consistent scoring
+            messages=[{
+                "role": "user",
+                "content": prompt
+            }]
+        ) as stream:
+            for delta in stream.text_stream:
+                if parser.feed(delta):
+                    break
+        if parser.stopped_early:
+            logger.info(f"Closed Claude stream early after {len(parser.text)} chars")
+        return parser.result_text()
+    
     def _parse_response(self, response: str) -> Optional[Dict]:
         """Parse Claude's JSON response."""
         try:
@@ -232,70 +532,29 @@ Respond in this exact JSON format:
         except (json.JSONDecodeError, KeyError) as e:
             logger.warning(f"Failed to parse response: {e}")
             return None
-    
-    def _rank_clips(self, analyzed_chunks: List[Dict], 
-                   target_vibe: str, target_age_group: str) -> List[Dict]:
-        """Rank clips by their scores and return the best ones."""
-        # Filter out chunks without analysis
-        valid_chunks = [
-            chunk for chunk in analyzed_chunks 
-            if chunk.get('analysis') and chunk['analysis'].get('overall_score', 0) > 15
-        ]
-        
-        # Sort by overall score (descending)
-        valid_chunks.sort(
-            key=lambda x: x.get('analysis', {}).get('overall_score', 0), 
-            reverse=True
-        )
-        
-        # Format for frontend
-        ranked_clips = []
-        for i, chunk in enumerate(valid_chunks):
-            analysis = chunk.get('analysis', {})
-            ranked_clips.append({
-                'rank': i + 1,
-                'start_time': chunk.get('start_time'),
-                'end_time': chunk.get('end_time'),
-                'duration': chunk.get('duration'),
-                'title': f"{target_vibe} Clip {i + 1}",
-                'text_preview': chunk.get('text', '')[:100] + "..." if len(chunk.get('text', '')) > 100 else chunk.get('text', ''),
-                'scores': {
-                    'vibe_match': analysis.get('vibe_match_score', 0),
-                    'age_group_match': analysis.get('age_group_match_score', 0),
-                    'clip_potential': analysis.get('clip_potential_score', 0),
-                    'overall': analysis.get('overall_score', 0)
-                },
-                'reason': analysis.get('reason', ''),
-                'best_moment': analysis.get('best_moment', ''),
-                'recommended_for': target_age_group,
-                'vibe': target_vibe
-            })
-        
-        return ranked_clips
-    
-    def _empty_result(self) -> Dict:
-        """Return empty result structure."""
-        return {
-            'selected_vibe': '',
-            'selected_age_group': '',
-            'total_chunks_analyzed': 0,
-            'clips_found': 0,
-            'top_clips': [],
-            'status': 'no_content',
-            'message': 'No valid transcription chunks found for analysis'
-        }
 
 
-class GeminiVibeAnalyzer:
+_gemini_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_gemini_executor() -> ThreadPoolExecutor:
+    """Bounded pool for blocking Gemini SDK calls, so they never occupy the default executor."""
+    global _gemini_executor
+    if _gemini_executor is None:
+        _gemini_executor = ThreadPoolExecutor(max_workers=max(1, GEMINI_MAX_THREADS), thread_name_prefix="gemini")
+    return _gemini_executor
+
+
+class GeminiVibeAnalyzer(VibeAnalyzerBase):
     """
     Vibe analyzer using Google Gemini 2.5 Pro API (default: models/gemini-2.5-pro-latest).
     Matches interface of SimpleVibeAnalyzer for parallel use.
     Set GEMINI_MODEL in your .env to override.
     """
-    VIBES = SimpleVibeAnalyzer.VIBES
-    AGE_GROUPS = SimpleVibeAnalyzer.AGE_GROUPS
 
-    def __init__(self, api_key: Optional[str] = None, model: str = "gemini-1.5-flash-latest"):
+    def __init__(self, api_key: Optional[str] = None, model: str = "gemini-1.5-flash-latest",
+                 scheduler: Optional[LLMScheduler] = None, cache: Optional[LLMResponseCache] = None,
+                 batch_token_budget: int = VIBE_BATCH_TOKEN_BUDGET, batch_max_chunks: int = VIBE_BATCH_MAX_CHUNKS):
         if genai is None:
             raise ImportError("google-generativeai not installed. Run: pip install google-generativeai")
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
@@ -303,6 +562,10 @@ class GeminiVibeAnalyzer:
             raise ValueError("Gemini API key not provided. Set GEMINI_API_KEY environment variable.")
         genai.configure(api_key=self.api_key)
         self.model = model
+        self.scheduler = scheduler or get_scheduler("gemini")
+        self.cache = cache if cache is not None else get_llm_cache()
+        self.batch_token_budget = batch_token_budget
+        self.batch_max_chunks = batch_max_chunks
         # Debug: List available models (uncomment for troubleshooting)
         # try:
         #     models = genai.list_models()
@@ -312,7 +575,8 @@ class GeminiVibeAnalyzer:
         #     print(f"[Gemini] Could not list models: {e}")
         self.gemini_model = genai.GenerativeModel(self.model)
 
-    async def analyze_video_chunks(self, transcription_data: Dict, selected_vibe: str, selected_age_group: str) -> Dict:
+    async def analyze_video_chunks(self, transcription_data: Dict, selected_vibe: str, selected_age_group: str,
+                                   scores_only: bool = VIBE_SCORES_ONLY) -> Dict:
         if selected_vibe not in self.VIBES:
             logger.warning(f"Unknown vibe: {selected_vibe}, defaulting to 'Happy'")
             selected_vibe = "Happy"
@@ -322,55 +586,47 @@ class GeminiVibeAnalyzer:
         chunks = transcription_data.get('chunks', [])
         if not chunks:
             return self._empty_result()
-        valid_chunks = [
-            chunk for chunk in chunks
-            if chunk.get('success') and chunk.get('transcription', {}).get('text', '').strip() and len(chunk.get('transcription', {}).get('text', '')) > 4
-        ]
-        if len(valid_chunks) > 10:
-            logger.info(f"Limiting analysis to first 10 chunks (out of {len(valid_chunks)}) to save API credits")
-            valid_chunks = valid_chunks[:10]
+        valid_chunks = [chunk for chunk in chunks if is_scorable_chunk(chunk)]
+        if len(valid_chunks) > VIBE_MAX_LLM_CHUNKS:
+            valid_chunks = select_candidates(valid_chunks, selected_vibe, VIBE_MAX_LLM_CHUNKS)
         if not valid_chunks:
             return self._empty_result()
-        analyzed_chunks = await self._analyze_chunks_for_vibe(valid_chunks, selected_vibe, selected_age_group)
+        analyzed_chunks = await self._analyze_chunks_for_vibe(valid_chunks, selected_vibe, selected_age_group, scores_only)
         top_clips = self._rank_clips(analyzed_chunks, selected_vibe, selected_age_group)
         return {
             'selected_vibe': selected_vibe,
             'selected_age_group': selected_age_group,
             'total_chunks_analyzed': len(valid_chunks),
+            'chunks_scored': len(analyzed_chunks),
             'clips_found': len(top_clips),
             'top_clips': top_clips[:5],
             'status': 'success'
         }
 
-    async def _analyze_chunks_for_vibe(self, chunks: List[Dict], target_vibe: str, target_age_group: str) -> List[Dict]:
-        analyzed_chunks = []
-        batch_size = 3
-        for i in range(0, len(chunks), batch_size):
-            batch = chunks[i:i + batch_size]
-            batch_results = await self._analyze_chunk_batch(batch, target_vibe, target_age_group)
-            analyzed_chunks.extend(batch_results)
-        return analyzed_chunks
-
-    async def _analyze_chunk_batch(self, chunks: List[Dict], target_vibe: str, target_age_group: str) -> List[Dict]:
-        results = []
-        for chunk in chunks:
-            text = chunk.get('transcription', {}).get('text', '')
-            start_time = chunk.get('start_time', 0)
-            end_time = chunk.get('end_time', 0)
-            analysis = await self._analyze_single_chunk(text, start_time, end_time, target_vibe, target_age_group)
-            if analysis:
-                results.append({
-                    'chunk_id': chunk.get('id'),
-                    'start_time': start_time,
-                    'end_time': end_time,
-                    'duration': end_time - start_time,
-                    'text': text,
-                    'analysis': analysis
-                })
-            await asyncio.sleep(1) # Add a 1-second delay to respect rate limits
-        return results
-
-    async def _analyze_single_chunk(self, text: str, start_time: float, end_time: float, target_vibe: str, target_age_group: str) -> Optional[Dict]:
+    async def _analyze_chunks_for_vibe(self, chunks: List[Dict], target_vibe: str, target_age_group: str,
+                                       scores_only: bool = False) -> List[Dict]:
+        return await self._analyze_chunk_batch(chunks, target_vibe, target_age_group, scores_only)
+
+    async def _analyze_chunk_batch(self, chunks: List[Dict], target_vibe: str, target_age_group: str,
+                                   scores_only: bool = False) -> List[Dict]:
+        async def call_batch(prompt: str, expected_ids: List[int], max_tokens: int) -> str:
+            return await self.scheduler.run(self._call_gemini_with_timeout, prompt,
+                                            timeout=2 * GEMINI_CALL_DEADLINE,
+                                            expected_ids=expected_ids, scores_only=scores_only)
+
+        return await analyze_chunks_batched(
+            f"gemini:{self.model}", chunks, target_vibe, target_age_group, scores_only, call_batch,
+            lambda chunk: self._analyze_single_chunk(
+                chunk.get('transcription', {}).get('text', ''), chunk.get('start_time', 0), chunk.get('end_time', 0),
+                target_vibe, target_age_group, scores_only, audio=chunk_audio(chunk)
+            ),
+            log_prefix="[Gemini] ", cache=self.cache,
+            token_budget=self.batch_token_budget, max_chunks=self.batch_max_chunks
+        )
+
+    async def _analyze_single_chunk(self, text: str, start_time: float, end_time: float, target_vibe: str, target_age_group: str,
+                                    scores_only: bool = False, audio: str = '') -> Optional[Dict]:
+        audio_line = f"Audio: {audio}\n" if audio else ""
         # Log input size and prompt
         logger.info(f"[Gemini] Analyzing chunk {start_time:.1f}-{end_time:.1f}s, text length: {len(text)}")
         # Truncate text if too long (e.g., >2000 chars)
@@ -386,7 +642,7 @@ Target Age Group: {target_age_group}
 
 Segment (from {start_time:.1f}s to {end_time:.1f}s):
 "{text}"
-
+{audio_line}
 Rate this segment on:
 1. How well it matches the \"{target_vibe}\" vibe (0-100)
 2. How suitable it is for \"{target_age_group}\" audience (0-100)
@@ -394,52 +650,72 @@ Rate this segment on:
 
 Respond in this exact JSON format:
 {{
-    "vibe_match_score": 0-100,
-    "age_group_match_score": 0-100,
-    "clip_potential_score": 0-100,
-    "overall_score": 0-100,
-    "reason": "brief explanation of why this does/doesn't match",
-    "best_moment": "describe the most interesting part if any"
+{score_format("    ", scores_only)}
 }}
 """
         logger.info(f"[Gemini] Prompt (first 500 chars): {prompt[:500]}")
-        import asyncio
         try:
-            response = await asyncio.wait_for(
-                asyncio.to_thread(self._call_gemini, prompt),
-                timeout=60
-            )
+            response = await self.scheduler.run(self._call_gemini_with_timeout, prompt,
+                                                timeout=GEMINI_CALL_DEADLINE, scores_only=scores_only)
             return self._parse_response(response)
         except asyncio.TimeoutError:
-            logger.error("[Gemini] Vibe analysis timed out for chunk {start_time}-{end_time}s")
-            return {
-                "vibe_match_score": 0,
-                "age_group_match_score": 0,
-                "clip_potential_score": 0,
-                "overall_score": 0,
-                "reason": "Timeout during Gemini analysis.",
-                "best_moment": ""
-            }
+            # Left out of the results, so a fully timed-out analysis triggers the manager's fallback
+            logger.error(f"[Gemini] Vibe analysis timed out for chunk {start_time}-{end_time}s")
+            return None
         except Exception as e:
             logger.error(f"[Gemini] Error analyzing chunk: {e}")
             return None
 
-    def _call_gemini(self, prompt: str) -> str:
-        max_retries = 5
-        base_delay = 2  # seconds
-        print(f"Using Gemini API Key: {self.api_key}") # Print the key for debugging
-        for attempt in range(max_retries):
-            try:
-                response = self.gemini_model.generate_content(prompt)
-                return response.text
-            except Exception as e:
-                if "429" in str(e) and attempt < max_retries - 1:
-                    delay = base_delay * (2 ** attempt) + random.uniform(0, 1)
-                    logger.warning(f"Rate limit exceeded. Retrying in {delay:.2f} seconds...")
-                    time.sleep(delay)
-                else:
-                    logger.error(f"Gemini generate_content failed: {e}")
-                    raise
+    async def _call_gemini_with_timeout(self, prompt: str, timeout: float = GEMINI_CALL_DEADLINE,
+                                        expected_ids: Optional[List[int]] = None, scores_only: bool = False) -> str:
+        """
+        One Gemini attempt bounded by `timeout` seconds. Uses the SDK's async client when
+        available; otherwise the blocking call runs on the dedicated Gemini executor.
+        """
+        if hasattr(self.gemini_model, 'generate_content_async'):
+            return await asyncio.wait_for(
+                self._call_gemini_async(prompt, timeout, expected_ids, scores_only), timeout=timeout
+            )
+        loop = asyncio.get_running_loop()
+        call = functools.partial(self._call_gemini, prompt, expected_ids, scores_only,
+                                 deadline=time.monotonic() + timeout)
+        return await asyncio.wait_for(loop.run_in_executor(get_gemini_executor(), call), timeout=timeout)
+
+    async def _call_gemini_async(self, prompt: str, timeout: float,
+                                 expected_ids: Optional[List[int]] = None, scores_only: bool = False) -> str:
+        # Single streaming attempt; 429 backoff is handled by the shared scheduler
+        parser = ScoreStreamParser(expected_ids, scores_only)
+        try:
+            response = await self.gemini_model.generate_content_async(
+                prompt, stream=True, request_options={"timeout": timeout}
+            )
+            async for chunk in response:
+                if parser.feed(chunk.text):
+                    break
+        except Exception as e:
+            logger.error(f"Gemini generate_content_async failed: {e}")
+            raise
+        if parser.stopped_early:
+            logger.info(f"[Gemini] Closed stream early after {len(parser.text)} chars")
+        return parser.result_text()
+
+    def _call_gemini(self, prompt: str, expected_ids: Optional[List[int]] = None, scores_only: bool = False,
+                     deadline: Optional[float] = None) -> str:
+        # Blocking fallback; gives the executor thread back once the deadline has passed
+        parser = ScoreStreamParser(expected_ids, scores_only)
+        request_options = {"timeout": max(1.0, deadline - time.monotonic())} if deadline else {}
+        try:
+            for chunk in self.gemini_model.generate_content(prompt, stream=True, request_options=request_options):
+                if parser.feed(chunk.text):
+                    break
+                if deadline and time.monotonic() > deadline:
+                    raise asyncio.TimeoutError("Gemini call exceeded its deadline")
+        except Exception as e:
+            logger.error(f"Gemini generate_content failed: {e}")
+            raise
+        if parser.stopped_early:
+            logger.info(f"[Gemini] Closed stream early after {len(parser.text)} chars")
+        return parser.result_text()
 
     def _parse_response(self, response: str) -> Optional[Dict]:
         try:
@@ -456,54 +732,58 @@ Respond in this exact JSON format:
             logger.warning(f"Failed to parse Gemini response: {e}")
             return None
 
-    def _rank_clips(self, analyzed_chunks: List[Dict], target_vibe: str, target_age_group: str) -> List[Dict]:
-        valid_chunks = [
-            chunk for chunk in analyzed_chunks
-            if chunk.get('analysis') and chunk['analysis'].get('overall_score', 0) > 15
-        ]
-        valid_chunks.sort(key=lambda x: x.get('analysis', {}).get('overall_score', 0), reverse=True)
-        ranked_clips = []
-        for i, chunk in enumerate(valid_chunks):
-            analysis = chunk.get('analysis', {})
-            ranked_clips.append({
-                'rank': i + 1,
-                'start_time': chunk.get('start_time'),
-                'end_time': chunk.get('end_time'),
-                'duration': chunk.get('duration'),
-                'title': f"{target_vibe} Clip {i + 1}",
-                'text_preview': chunk.get('text', '')[:100] + "..." if len(chunk.get('text', '')) > 100 else chunk.get('text', ''),
-                'scores': {
-                    'vibe_match': analysis.get('vibe_match_score', 0),
-                    'age_group_match': analysis.get('age_group_match_score', 0),
-                    'clip_potential': analysis.get('clip_potential_score', 0),
-                    'overall': analysis.get('overall_score', 0)
-                },
-                'reason': analysis.get('reason', ''),
-                'best_moment': analysis.get('best_moment', ''),
-                'recommended_for': target_age_group,
-                'vibe': target_vibe
-            })
-        return ranked_clips
-
-    def _empty_result(self) -> Dict:
-        return {
-            'selected_vibe': '',
-            'selected_age_group': '',
-            'total_chunks_analyzed': 0,
-            'clips_found': 0,
-            'top_clips': [],
-            'status': 'no_content',
-            'message': 'No valid transcription chunks found for analysis'
-        }
-
 
 class VibeAnalysisManager:
     """
     Simple manager for coordinating vibe analysis workflow.
+    Falls back to `fallback_analyzer` (e.g. the local embedding scorer) when the
+    primary analyzer fails, exceeds VIBE_LLM_TIMEOUT or scores no chunks.
+    `fallback_factory` builds it on the first fallback instead, so a model it
+    loads is only loaded once the primary analyzer has actually failed.
     """
     
-    def __init__(self, vibe_analyzer: SimpleVibeAnalyzer):
+    def __init__(self, vibe_analyzer: VibeAnalyzerBase, fallback_analyzer: Optional[VibeAnalyzerBase] = None,
+                 fallback_factory: Optional[Callable[[], VibeAnalyzerBase]] = None):
         self.vibe_analyzer = vibe_analyzer
+        self.fallback_analyzer = fallback_analyzer
+        self.fallback_factory = fallback_factory
+        self._fallback_lock = asyncio.Lock()
+    
+    async def _get_fallback(self) -> VibeAnalyzerBase:
+        async with self._fallback_lock:
+            if self.fallback_analyzer is None:
+                # Building may load (or download) an embedding model; keep it off the event loop
+                self.fallback_analyzer = await asyncio.to_thread(self.fallback_factory)
+        return self.fallback_analyzer
+    
+    async def _analyze_with_fallback(self, transcription_result: Dict, selected_vibe: str,
+                                     selected_age_group: str, scores_only: bool) -> Dict:
+        if self.fallback_analyzer is None and self.fallback_factory is None:
+            return await self.vibe_analyzer.analyze_video_chunks(
+                transcription_result, selected_vibe, selected_age_group, scores_only=scores_only
+            )
+        try:
+            result = await asyncio.wait_for(
+                self.vibe_analyzer.analyze_video_chunks(
+                    transcription_result, selected_vibe, selected_age_group, scores_only=scores_only
+                ),
+                timeout=VIBE_LLM_TIMEOUT
+            )
+            # Every remote call failing leaves chunks analyzed but none scored
+            if not (result.get('total_chunks_analyzed') and not result.get('clips_found')
+                    and not result.get('chunks_scored')):
+                return result
+            logger.warning("Vibe analyzer scored no chunks, using fallback analyzer")
+        except asyncio.TimeoutError:
+            logger.warning(f"Vibe analysis exceeded {VIBE_LLM_TIMEOUT:g}s, using fallback analyzer")
+        except Exception as e:
+            logger.warning(f"Vibe analysis failed ({e}), using fallback analyzer")
+        fallback_analyzer = await self._get_fallback()
+        result = await fallback_analyzer.analyze_video_chunks(
+            transcription_result, selected_vibe, selected_age_group, scores_only=scores_only
+        )
+        result['fallback'] = True
+        return result
     
     async def analyze_video_vibe(self, transcription_result: Dict, 
                                project_context: Optional[Dict] = None) -> Dict:
@@ -533,8 +813,9 @@ class VibeAnalysisManager:
             logger.info(f"🎭 Selected vibe: {selected_vibe}, Age group: {selected_age_group}")
             
             # Perform analysis
-            result = await self.vibe_analyzer.analyze_video_chunks(
-                transcription_result, selected_vibe, selected_age_group
+            result = await self._analyze_with_fallback(
+                transcription_result, selected_vibe, selected_age_group,
+                bool(project_context.get('scores_only', VIBE_SCORES_ONLY))
             )
             
             return {
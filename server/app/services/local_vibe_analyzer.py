@@ -0,0 +1,153 @@
+"""
+Offline vibe analyzer: scores transcript chunks by embedding similarity to
+per-vibe and per-age-group prototypes, with no API calls.
+Same interface as SimpleVibeAnalyzer, usable as the default provider
+(VIBE_LLM_PROVIDER=local) or as a fallback when the remote LLM fails.
+"""
+
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .llm_service import VibeAnalyzerBase, build_chunk_results, is_scorable_chunk, VIBE_SCORES_ONLY
+from ..utils.prerank import VIBE_KEYWORDS, chunk_features, prerank_scores
+from ..utils.text_embedding import TextEmbedder, get_text_embedder
+
+logger = logging.getLogger(__name__)
+
+# Descriptions each prototype embedding is averaged from
+VIBE_DESCRIPTIONS = {
+    "Happy": ["a cheerful, joyful moment full of smiles and laughter",
+              "people celebrating good news and feeling glad"],
+    "Dramatic": ["a tense dramatic reveal, a secret or betrayal comes out",
+                 "a shocking turn of events with raised emotions"],
+    "intense": ["a fast, high-stakes action scene with urgency and danger",
+                "shouting, running and fighting under pressure"],
+    "Fun": ["a playful, silly and funny moment with jokes and games",
+            "friends laughing and goofing around at a party"],
+    "Inspiring": ["a motivational speech about dreams, hope and never giving up",
+                  "overcoming obstacles and achieving success together"],
+    "Mysterious": ["a strange, unexplained event with hidden clues in the dark",
+                   "whispers about an unknown secret and someone who disappeared"],
+    "Emotional": ["a heartfelt, tearful moment about family, love and loss",
+                  "saying sorry, saying goodbye, remembering someone missed"],
+    "cool": ["a smooth, stylish and confident moment, calm and effortless",
+             "a chill, slick scene with a fresh, laid-back vibe"],
+    "musical": ["someone singing a song with melody, rhythm and a beat",
+                "music playing and people dancing along to the tune"],
+}
+
+AGE_GROUP_DESCRIPTIONS = {
+    "kids": ["simple, gentle and colorful content for young children, cartoons, toys and animals"],
+    "teens": ["trendy content for teenagers about school, friends, games and social media"],
+    "young-adults": ["content for young adults about college, careers, dating, travel and nightlife"],
+    "adults": ["mature content for adults about work, family, money, relationships and news"],
+    "seniors": ["calm, clear content for older viewers about memories, health, grandchildren and tradition"],
+    "general": ["family-friendly content suitable for any audience of all ages"],
+}
+
+# Cosine margin over the average prototype that maps to a ~73/100 score
+SIMILARITY_SCALE = 0.05
+# Weight of the lexical/acoustic pre-rank features next to embedding similarity
+PRERANK_WEIGHT = 0.5
+# Feature columns of prerank.chunk_features that make a chunk punchy as a short clip
+CLIP_FEATURES = [2, 3, 4, 6]  # intensity, energy, emphasis, onset rate
+OVERALL_WEIGHTS = {'vibe_match_score': 0.5, 'age_group_match_score': 0.2, 'clip_potential_score': 0.3}
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+class LocalVibeAnalyzer(VibeAnalyzerBase):
+    """
+    Scores all chunks at once: one embedding call, then (n_chunks, n_vibes) and
+    (n_chunks, n_age_groups) similarity matrices against the prototypes.
+    """
+
+    def __init__(self, embedder: Optional[TextEmbedder] = None):
+        self.embedder = embedder or get_text_embedder()
+        self.model = f"local:{self.embedder.backend}"
+        self.vibe_prototypes = self._prototypes(
+            [VIBE_DESCRIPTIONS[v] + [' '.join(VIBE_KEYWORDS.get(v, []))] for v in self.VIBES]
+        )
+        self.age_prototypes = self._prototypes([AGE_GROUP_DESCRIPTIONS[a] for a in self.AGE_GROUPS])
+
+    def _prototypes(self, descriptions: List[List[str]]) -> np.ndarray:
+        flat = [text for group in descriptions for text in group]
+        vectors = self.embedder.embed(flat)
+        prototypes, start = [], 0
+        for group in descriptions:
+            prototypes.append(vectors[start:start + len(group)].mean(axis=0))
+            start += len(group)
+        prototypes = np.stack(prototypes)
+        norms = np.linalg.norm(prototypes, axis=1, keepdims=True)
+        return (prototypes / np.where(norms > 0, norms, 1.0)).astype(np.float32)
+
+    async def analyze_video_chunks(self, transcription_data: Dict,
+                                 selected_vibe: str,
+                                 selected_age_group: str,
+                                 scores_only: bool = VIBE_SCORES_ONLY) -> Dict:
+        if selected_vibe not in self.VIBES:
+            logger.warning(f"Unknown vibe: {selected_vibe}, defaulting to 'Happy'")
+            selected_vibe = "Happy"
+        if selected_age_group not in self.AGE_GROUPS:
+            logger.warning(f"Unknown age group: {selected_age_group}, defaulting to 'general'")
+            selected_age_group = "general"
+
+        valid_chunks = [chunk for chunk in transcription_data.get('chunks', []) if is_scorable_chunk(chunk)]
+        if not valid_chunks:
+            return self._empty_result()
+
+        # No per-chunk cost here, so every chunk is scored rather than a pre-ranked subset
+        analyses = await asyncio.to_thread(self.score_chunks, valid_chunks, selected_vibe, selected_age_group)
+        analyzed_chunks = build_chunk_results(valid_chunks, dict(enumerate(analyses)))
+        top_clips = self._rank_clips(analyzed_chunks, selected_vibe, selected_age_group)
+        logger.info(f"[local] Scored {len(valid_chunks)} chunks with {self.model}")
+
+        return {
+            'selected_vibe': selected_vibe,
+            'selected_age_group': selected_age_group,
+            'total_chunks_analyzed': len(valid_chunks),
+            'chunks_scored': len(analyzed_chunks),
+            'clips_found': len(top_clips),
+            'top_clips': top_clips[:5],
+            'status': 'success'
+        }
+
+    def score_chunks(self, chunks: List[Dict], target_vibe: str, target_age_group: str) -> List[Dict]:
+        """Analyses in the LLM response format, one per chunk."""
+        texts = [chunk.get('transcription', {}).get('text', '') for chunk in chunks]
+        embeddings = self.embedder.embed(texts)
+        vibe_sims = embeddings @ self.vibe_prototypes.T
+        age_sims = embeddings @ self.age_prototypes.T
+        vibe_index = self.VIBES.index(target_vibe)
+        age_index = self.AGE_GROUPS.index(target_age_group)
+
+        # Margin over the average prototype, so generic text does not score high on every vibe
+        vibe_margin = (vibe_sims[:, vibe_index] - vibe_sims.mean(axis=1)) / SIMILARITY_SCALE
+        age_margin = (age_sims[:, age_index] - age_sims.mean(axis=1)) / SIMILARITY_SCALE
+        features = chunk_features(chunks, target_vibe)
+        lexical = prerank_scores(chunks, target_vibe)
+        lexical_std = lexical.std()
+        if lexical_std > 0:
+            lexical = (lexical - lexical.mean()) / lexical_std
+
+        scores = {
+            'vibe_match_score': 100 * _sigmoid(vibe_margin + PRERANK_WEIGHT * lexical),
+            'age_group_match_score': 100 * _sigmoid(age_margin),
+            'clip_potential_score': 100 * _sigmoid(features[:, CLIP_FEATURES].mean(axis=1)),
+        }
+        scores['overall_score'] = sum(weight * scores[field] for field, weight in OVERALL_WEIGHTS.items())
+
+        closest = vibe_sims.argmax(axis=1)
+        analyses = []
+        for row in range(len(chunks)):
+            analysis = {field: int(round(float(values[row]))) for field, values in scores.items()}
+            analysis['reason'] = (f"Local similarity to '{target_vibe}' {vibe_sims[row, vibe_index]:.2f}; "
+                                  f"closest vibe '{self.VIBES[closest[row]]}'")
+            analysis['best_moment'] = ''
+            analyses.append(analysis)
+        return analyses
@@ -0,0 +1,123 @@
+"""
+Per-project segment manifest for incremental timeline re-rendering.
+Tracks a content hash for every normalized segment so unchanged timeline
+regions can be stream-copied instead of re-encoded.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bump when the normalization command changes so stale segments are not reused
+NORMALIZE_VERSION = 1
+
+
+def hash_parts(*parts) -> str:
+    """Stable sha256 over a sequence of JSON-serializable parts."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def hash_file(path: str, block_size: int = 1024 * 1024) -> str:
+    """sha256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class SegmentManifest:
+    """
+    Manifest of normalized segments for one project.
+
+    Layout on disk:
+        <cache_dir>/manifest.json
+        <cache_dir>/seg_<key>.mp4
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.manifest_path = os.path.join(cache_dir, "manifest.json")
+        os.makedirs(cache_dir, exist_ok=True)
+        self.data = self._load()
+
+    def _load(self) -> Dict:
+        empty = {'version': NORMALIZE_VERSION, 'sources': {}, 'segments': {}, 'sections': []}
+        if not os.path.exists(self.manifest_path):
+            return empty
+        try:
+            with open(self.manifest_path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') != NORMALIZE_VERSION:
+                logger.info(f"[manifest] Version changed, discarding {self.manifest_path}")
+                return empty
+            return data
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"[manifest] Failed to load {self.manifest_path}: {e}")
+            return empty
+
+    def save(self):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def source_hash(self, path: str) -> str:
+        """Content hash of a source file, re-hashed only when size or mtime change."""
+        st = os.stat(path)
+        cached = self.data['sources'].get(path)
+        if cached and cached['size'] == st.st_size and cached['mtime_ns'] == st.st_mtime_ns:
+            return cached['sha256']
+        digest = hash_file(path)
+        self.data['sources'][path] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest}
+        return digest
+
+    def segment_key(self, source_path: str, target: Dict) -> str:
+        """Key of a normalized segment: source content plus every encode setting."""
+        return hash_parts(NORMALIZE_VERSION, self.source_hash(source_path), target)
+
+    def segment_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"seg_{key[:24]}.mp4")
+
+    def lookup(self, key: str) -> Optional[Dict]:
+        """Return the cached segment entry if its file is still on disk."""
+        entry = self.data['segments'].get(key)
+        if entry and os.path.exists(entry['path']) and os.path.getsize(entry['path']) > 0:
+            return entry
+        return None
+
+    def store(self, key: str, path: str, duration: float, source: str):
+        self.data['segments'][key] = {'path': path, 'duration': duration, 'source': source}
+
+    def record_sections(self, keys: List[str]):
+        """
+        Record the ordered output sections of the latest render and drop segments
+        it no longer references. Each section is a closed GOP run starting on a
+        keyframe, so sections can be concatenated without re-encoding.
+        """
+        previous = [s['key'] for s in self.data.get('sections', [])]
+        reused = sum(1 for k in keys if k in previous)
+        self.data['sections'] = [
+            {'index': i, 'key': k, 'duration': self.data['segments'][k]['duration']}
+            for i, k in enumerate(keys)
+        ]
+        self.data['timeline_hash'] = hash_parts(keys)
+        live = set(keys)
+        for key in list(self.data['segments']):
+            if key not in live:
+                stale = self.data['segments'].pop(key)
+                try:
+                    os.remove(stale['path'])
+                except OSError:
+                    pass
+        live_sources = {entry.get('source') for entry in self.data['segments'].values()}
+        for path in list(self.data['sources']):
+            if path not in live_sources:
+                del self.data['sources'][path]
+        logger.info(f"[manifest] {len(keys)} sections, {reused} unchanged since last render")
+        self.save()
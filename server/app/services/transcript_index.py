@@ -0,0 +1,386 @@
+"""
+Persistent per-video transcript index for the /find route.
+
+The first query of a video transcribes it once and stores its segments, with
+absolute timestamps, as JSON keyed by the video's content hash, language and
+chunk strategy. Queries normalize the text, look up candidate segments in an
+inverted index of character n-grams (which works the same for Latin and Indic
+scripts, where words are not reliably split), and run rapidfuzz only over
+those candidates.
+
+Semantic queries use sentence embeddings of the segments, computed once per
+video and embedder and stored as a float16 matrix next to the JSON index.
+"""
+
+import os
+import json
+import logging
+import threading
+import unicodedata
+from collections import Counter, OrderedDict, defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+from .render_manifest import hash_file, hash_parts
+
+logger = logging.getLogger(__name__)
+
+# Bump when normalization or the stored layout changes so stale indexes are rebuilt
+TRANSCRIPT_INDEX_VERSION = 2
+NGRAM_SIZE = 3
+# Transcripts up to this many segments are scored in full; larger ones through n-gram candidates
+MAX_CANDIDATES = 200
+# partial_ratio a segment must exceed to match, as in the original linear scan
+MATCH_THRESHOLD = 80
+# Cosine similarity (x100) a segment needs to be a semantic match
+SEMANTIC_MIN_SCORE = float(os.getenv("SEMANTIC_MIN_SCORE", "35"))
+# Share of the fuzzy score in hybrid ranking; the rest is semantic similarity
+HYBRID_FUZZY_WEIGHT = float(os.getenv("HYBRID_FUZZY_WEIGHT", "0.4"))
+# Segments embedded per call, so building embeddings stays linear in the transcript with bounded memory
+EMBED_BATCH = 256
+
+
+def normalize_text(text: str) -> str:
+    """
+    NFC, lowercase, punctuation and symbols replaced by spaces, whitespace collapsed.
+    Combining marks are kept (Indic vowel signs and viramas are part of the word) and
+    zero-width joiners dropped, so their presence or absence does not break matches.
+    """
+    text = unicodedata.normalize('NFC', text or '').lower()
+    chars = []
+    for ch in text:
+        category = unicodedata.category(ch)
+        if category == 'Cf':
+            continue
+        chars.append(' ' if category[0] in 'PSZC' else ch)
+    return ' '.join(''.join(chars).split())
+
+
+def text_ngrams(normalized: str, n: int = NGRAM_SIZE) -> Set[str]:
+    """Character n-grams of each space-padded word; words shorter than n count as one gram."""
+    grams = set()
+    for word in normalized.split():
+        padded = f" {word} "
+        if len(padded) <= n:
+            grams.add(padded)
+        else:
+            grams.update(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return grams
+
+
+def _segment_text(segment) -> str:
+    return segment.get('text', '') if isinstance(segment, dict) else getattr(segment, 'text', '') or ''
+
+
+def _segment_words(segment, offset: float) -> List[Dict]:
+    """Word timings of a Whisper segment (word_timestamps=True), shifted by `offset` seconds."""
+    words = segment.get('words') if isinstance(segment, dict) else getattr(segment, 'words', None)
+    timed = []
+    for word in words or []:
+        if word.get('start') is None or word.get('end') is None:
+            continue
+        timed.append({'word': word.get('word', ''), 'start': offset + float(word['start']),
+                      'end': offset + float(word['end'])})
+    return timed
+
+
+def match_span(segment: Dict, query: str, padding: float = 0.0, min_duration: float = 0.0) -> Tuple[float, float]:
+    """
+    (start, end) seconds of the part of `segment` that matches `query`: the words the
+    best partial_ratio alignment covers when the segment has word timings, the whole
+    segment otherwise or for an empty query. Padded by `padding` on both sides, then widened around its
+    centre to at least `min_duration`, never starting before 0.
+    """
+    start, end = segment['start'], segment['end']
+    normalized_query = normalize_text(query)
+    words = segment.get('words') or []
+    if words and normalized_query:
+        tokens, offsets, position = [], [], 0
+        for word in words:
+            token = normalize_text(word['word'])
+            offsets.append((position, position + len(token)) if token else None)
+            if token:
+                tokens.append(token)
+                position += len(token) + 1
+        alignment = fuzz.partial_ratio_alignment(normalized_query, ' '.join(tokens))
+        matched = [word for word, offset in zip(words, offsets)
+                   if offset and offset[0] < alignment.dest_end and offset[1] > alignment.dest_start]
+        if matched:
+            start, end = matched[0]['start'], matched[-1]['end']
+
+    start, end = start - padding, end + padding
+    if end - start < min_duration:
+        centre = (start + end) / 2
+        start, end = centre - min_duration / 2, centre + min_duration / 2
+    if start < 0:
+        start, end = 0.0, end - start
+    return start, end
+
+
+class TranscriptIndex:
+    """
+    Transcript segments of one video and an n-gram inverted index over them.
+    Each segment: {start, end (absolute seconds), text, chunk_start, chunk_end, words},
+    where words ([{word, start, end}], absolute) is empty unless the transcriber timed them.
+    """
+
+    def __init__(self, segments: List[Dict]):
+        self.segments = segments
+        # float16 (n, dim) unit rows, attached by TranscriptIndexStore.load_embeddings
+        self.embeddings: Optional[np.ndarray] = None
+        self.embeddings_path: Optional[str] = None
+        self.normalized = [normalize_text(segment['text']) for segment in segments]
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+        for position, normalized in enumerate(self.normalized):
+            for gram in text_ngrams(normalized):
+                self.postings[gram].append(position)
+
+    @classmethod
+    def from_transcriptions(cls, chunks: List[Dict], results: List[Dict]) -> "TranscriptIndex":
+        """Segments from per-chunk transcription results, shifted to absolute video time."""
+        segments = []
+        for chunk, result in zip(chunks, results):
+            chunk_start, chunk_end = chunk['start_time'], chunk['end_time']
+            chunk_segments = result.get('segments') or []
+            if not chunk_segments and result.get('text'):
+                # Providers that return the whole chunk as 'text' (Sarvam) span the whole chunk
+                chunk_segments = [{'start': None, 'end': None, 'text': result['text']}]
+            for segment in chunk_segments:
+                text = _segment_text(segment).strip()
+                if not text:
+                    continue
+                start = segment.get('start') if isinstance(segment, dict) else getattr(segment, 'start', None)
+                end = segment.get('end') if isinstance(segment, dict) else getattr(segment, 'end', None)
+                segments.append({
+                    'start': chunk_start + start if start is not None else chunk_start,
+                    'end': min(chunk_start + end, chunk_end) if end is not None else chunk_end,
+                    'text': text,
+                    'chunk_start': chunk_start,
+                    'chunk_end': chunk_end,
+                    'words': _segment_words(segment, chunk_start),
+                })
+        segments.sort(key=lambda segment: segment['start'])
+        return cls(segments)
+
+    def __len__(self) -> int:
+        return len(self.segments)
+
+    def candidates(self, normalized_query: str, limit: int = MAX_CANDIDATES) -> List[int]:
+        """Segments sharing the most n-grams with the query."""
+        counts = Counter()
+        for gram in text_ngrams(normalized_query):
+            counts.update(self.postings.get(gram, ()))
+        return [position for position, _ in counts.most_common(limit)]
+
+    def search(self, query: str, limit: int = 3, fuzzy: bool = True,
+               threshold: float = MATCH_THRESHOLD) -> List[Tuple[Dict, float]]:
+        """
+        (segment, score) for segments containing the query (score 100) or, with `fuzzy`,
+        with a partial_ratio above `threshold`. Best first, earlier segments on ties.
+        """
+        normalized_query = normalize_text(query)
+        if not normalized_query or not self.segments:
+            return []
+        if len(self.segments) <= MAX_CANDIDATES:
+            positions = range(len(self.segments))
+        else:
+            positions = self.candidates(normalized_query)
+        choices = {position: self.normalized[position] for position in positions}
+
+        scores = {position: 100.0 for position, text in choices.items() if normalized_query in text}
+        if fuzzy:
+            for _, score, position in process.extract(normalized_query, choices, scorer=fuzz.partial_ratio,
+                                                      score_cutoff=threshold, limit=None):
+                if score > threshold:
+                    scores.setdefault(position, float(score))
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], self.segments[item[0]]['start']))
+        return [(self.segments[position], score) for position, score in ranked[:limit]]
+
+    def embed(self, embedder) -> np.ndarray:
+        """Segment embeddings from a TextEmbedder, as a compact float16 matrix."""
+        texts = [segment['text'] for segment in self.segments]
+        blocks = [embedder.embed(texts[i:i + EMBED_BATCH]).astype(np.float16)
+                  for i in range(0, len(texts), EMBED_BATCH)]
+        return np.concatenate(blocks) if blocks else np.zeros((0, embedder.dim), dtype=np.float16)
+
+    def semantic_search(self, query: str, embedder, limit: int = 3, fuzzy_weight: float = 0.0,
+                        min_score: float = SEMANTIC_MIN_SCORE) -> List[Tuple[Dict, float]]:
+        """
+        (segment, score) ranked by cosine similarity between the query and segment
+        embeddings, scaled to 0-100. With `fuzzy_weight` > 0 the score blends in the
+        substring/partial_ratio score of the plain search, so exact wording still
+        counts. Only scores of at least `min_score` are returned.
+        """
+        normalized_query = normalize_text(query)
+        if not normalized_query or not self.segments:
+            return []
+        if self.embeddings is None:
+            self.embeddings = self.embed(embedder)
+        query_vector = embedder.embed([query])[0]
+        scores = np.clip(self.embeddings.astype(np.float32) @ query_vector, 0.0, 1.0) * 100.0
+
+        if fuzzy_weight > 0:
+            # Fuzzy-score the best semantic segments plus the n-gram candidates, in one cdist call
+            if len(self.segments) <= MAX_CANDIDATES:
+                positions = np.arange(len(self.segments))
+            else:
+                pool = set(np.argpartition(-scores, MAX_CANDIDATES)[:MAX_CANDIDATES].tolist())
+                pool.update(self.candidates(normalized_query))
+                positions = np.fromiter(pool, dtype=np.int64)
+            fuzzy_scores = process.cdist([normalized_query], [self.normalized[p] for p in positions],
+                                         scorer=fuzz.partial_ratio, dtype=np.float32)[0]
+            exact = np.array([normalized_query in self.normalized[p] for p in positions], dtype=bool)
+            fuzzy_scores[exact] = 100.0
+            blended = scores * (1.0 - fuzzy_weight)
+            blended[positions] += fuzzy_weight * fuzzy_scores
+            scores = blended
+
+        k = min(limit, len(scores))
+        if k <= 0:
+            return []
+        # Everything tied with the k-th best score competes, so ties go to earlier segments as in search()
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        top = np.flatnonzero(scores >= max(kth, min_score))
+        ranked = sorted(top.tolist(), key=lambda p: (-scores[p], self.segments[p]['start']))
+        return [(self.segments[p], float(scores[p])) for p in ranked[:k]]
+
+    def save(self, path: str):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': TRANSCRIPT_INDEX_VERSION, 'segments': self.segments}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "TranscriptIndex":
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != TRANSCRIPT_INDEX_VERSION:
+            raise ValueError(f"transcript index version {data.get('version')}, expected {TRANSCRIPT_INDEX_VERSION}")
+        return cls(data['segments'])
+
+
+class TranscriptIndexStore:
+    """
+    Content-addressed transcript indexes, with the most recently used ones kept built
+    in memory so repeated queries skip even the JSON load.
+
+    Layout on disk:
+        <cache_dir>/<key>.json               segments
+        <cache_dir>/<key>.<embedder>.npy     float16 segment embeddings, per embedder
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 64 * 1024 * 1024, memory_entries: int = 16):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        os.makedirs(cache_dir, exist_ok=True)
+        self._memory: "OrderedDict[str, TranscriptIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def index_path(self, video_path: str, language: str, chunk_strategy: str) -> str:
+        key = hash_parts(hash_file(video_path), language, chunk_strategy, TRANSCRIPT_INDEX_VERSION)
+        return os.path.join(self.cache_dir, f"{key[:32]}.json")
+
+    def embeddings_path(self, path: str, embedder) -> str:
+        tag = hash_parts(embedder.name, embedder.dim)[:12]
+        return f"{os.path.splitext(path)[0]}.{tag}.npy"
+
+    def load_embeddings(self, path: str, index: TranscriptIndex, embedder) -> np.ndarray:
+        """
+        Attach the embeddings of `index` (stored at `path`) for `embedder`: kept in
+        memory with the index, loaded from disk, or computed once and saved.
+        """
+        embeddings_path = self.embeddings_path(path, embedder)
+        if index.embeddings is not None and index.embeddings_path == embeddings_path:
+            return index.embeddings
+        matrix = None
+        if os.path.exists(embeddings_path):
+            try:
+                matrix = np.load(embeddings_path)
+                if matrix.shape != (len(index), embedder.dim):
+                    raise ValueError(f"shape {matrix.shape}, expected {(len(index), embedder.dim)}")
+                os.utime(embeddings_path)
+            except (OSError, ValueError) as e:
+                logger.warning(f"[transcript_index] Unusable embeddings {embeddings_path}, re-embedding: {e}")
+                matrix = None
+        if matrix is None:
+            matrix = index.embed(embedder)
+            tmp_path = f"{embeddings_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, matrix)
+            os.replace(tmp_path, embeddings_path)
+            logger.info(f"[transcript_index] Embedded {len(index)} segments with {embedder.name}")
+            self.evict()
+        index.embeddings, index.embeddings_path = matrix, embeddings_path
+        return matrix
+
+    def _remember(self, path: str, index: TranscriptIndex):
+        with self._lock:
+            self._memory[path] = index
+            self._memory.move_to_end(path)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def load(self, path: str) -> Optional[TranscriptIndex]:
+        with self._lock:
+            index = self._memory.get(path)
+            if index is not None:
+                self._memory.move_to_end(path)
+        if index is None:
+            if not os.path.exists(path):
+                return None
+            try:
+                index = TranscriptIndex.load(path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"[transcript_index] Unusable entry {path}, re-transcribing: {e}")
+                return None
+            self._remember(path, index)
+        if os.path.exists(path):
+            os.utime(path)
+        return index
+
+    def save(self, path: str, index: TranscriptIndex):
+        index.save(path)
+        self._remember(path, index)
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used indexes until the store fits max_bytes."""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(('.json', '.npy')):
+                    continue
+                full = os.path.join(self.cache_dir, name)
+                try:
+                    st = os.stat(full)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, full))
+            total = sum(size for _, size, _ in entries)
+            for _, size, full in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(full)
+                    self._memory.pop(full, None)
+                    total -= size
+                    logger.info(f"[transcript_index] Evicted {os.path.basename(full)}")
+                except OSError:
+                    pass
+
+
+_transcript_index_store: Optional[TranscriptIndexStore] = None
+
+
+def get_transcript_index_store() -> TranscriptIndexStore:
+    """Shared store, configured by TRANSCRIPT_INDEX_DIR and TRANSCRIPT_INDEX_MAX_MB."""
+    global _transcript_index_store
+    if _transcript_index_store is None:
+        cache_dir = os.getenv("TRANSCRIPT_INDEX_DIR", os.path.join(os.getcwd(), "transcript_index"))
+        max_mb = int(os.getenv("TRANSCRIPT_INDEX_MAX_MB", "64"))
+        _transcript_index_store = TranscriptIndexStore(cache_dir, max_bytes=max_mb * 1024 * 1024)
+    return _transcript_index_store
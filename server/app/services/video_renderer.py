@@ -3,19 +3,57 @@ Video rendering service for stitching timeline clips into final video.
 """
 
 import os
+import asyncio
 import subprocess
 import tempfile
 import uuid
+import time
 import logging
 from typing import List, Dict, Optional
 from pathlib import Path
 import shlex
 import shutil
 import json
+import re
+
+from .render_manifest import SegmentManifest, hash_file, hash_parts
+from .audio_mixer import AudioMixer
+from .audio_cache import get_audio_cache
 
 logger = logging.getLogger(__name__)
 
-async def generate_video_from_image(image_path: str, output_path: str, duration: int = 3, resolution: str = "1280x720"):
+# Encode settings per render profile. 'preview' renders a low-resolution proxy for
+# fast timeline previews; durations, frame rate and audio mixing match 'final'.
+RENDER_PROFILES = {
+    'final': {'max_height': None, 'preset': 'fast', 'crf': 22, 'audio_bitrate': '192k'},
+    'preview': {'max_height': 360, 'preset': 'ultrafast', 'crf': 30, 'audio_bitrate': '96k'},
+}
+
+# Fragmented MP4: moov up front and self-contained fragments, so the file is playable
+# while ffmpeg is still writing it and no separate +faststart rewrite is needed.
+FRAGMENTED_MP4_FLAGS = ['-movflags', '+frag_keyframe+empty_moov+default_base_moof']
+
+# Content-addressed image_/text_ cards in generated_clips unused for this many seconds are deleted
+TITLE_CARD_MAX_AGE = float(os.getenv("TITLE_CARD_MAX_AGE", str(7 * 24 * 3600)))
+TITLE_CARD_PATTERN = re.compile(r'^(?:image|text)_[0-9a-f]{16}\.mp4$')
+
+def build_output_filename(project_name: str, render_id: str, render_profile: str = "final", output_format: str = "mp4") -> str:
+    return f"{project_name}_{render_id}_{render_profile}.{output_format}"
+
+def get_render_profile(name: str) -> Dict:
+    if name not in RENDER_PROFILES:
+        raise ValueError(f"Unknown render profile: {name}")
+    return RENDER_PROFILES[name]
+
+def scale_for_profile(width: int, height: int, profile: Dict):
+    """Scale a resolution down to the profile's max height, keeping aspect ratio and even dimensions."""
+    max_height = profile.get('max_height')
+    if not max_height or height <= max_height:
+        return width, height
+    scaled_width = int(round(width * max_height / height / 2)) * 2
+    return max(2, scaled_width), max_height
+
+async def generate_video_from_image(image_path: str, output_path: str, duration: int = 3, resolution: str = "1280x720", preset: str = "medium"):
     cmd = [
         "ffmpeg", "-y",
         "-loop", "1",
@@ -24,6 +62,7 @@ async def generate_video_from_image(image_path: str, output_path: str, duration:
         "-vf", f"scale={resolution},format=yuv420p",
         "-r", "25",
         "-c:v", "libx264",
+        "-preset", preset,
         "-pix_fmt", "yuv420p",
         output_path
     ]
@@ -33,7 +72,7 @@ async def generate_video_from_image(image_path: str, output_path: str, duration:
         logger.error(f"Failed to generate video from image: {result.stderr}")
         raise RuntimeError(result.stderr)
 
-async def generate_video_from_text(text: str, output_path: str, duration: int = 3, resolution: str = "1280x720"):
+async def generate_video_from_text(text: str, output_path: str, duration: int = 3, resolution: str = "1280x720", preset: str = "medium"):
     # Use Inter.ttf from titan/public/fonts/
     project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..'))
     # Escape comma in font filename for ffmpeg
@@ -47,6 +86,7 @@ async def generate_video_from_text(text: str, output_path: str, duration: int =
         f"-vf", f"drawtext=fontfile={font_path}:text='{safe_text}':fontcolor=white:fontsize=48:x=(w-text_w)/2:y=(h-text_h)/2",
         "-r", "25",
         "-c:v", "libx264",
+        "-preset", preset,
         "-pix_fmt", "yuv420p",
         output_path
     ]
@@ -56,13 +96,14 @@ async def generate_video_from_text(text: str, output_path: str, duration: int =
         logger.error(f"Failed to generate video from text: {result.stderr}")
         raise RuntimeError(result.stderr)
 
-async def preprocess_timeline_items(timeline_clips: List[Dict], temp_dir: str) -> List[Dict]:
+async def preprocess_timeline_items(timeline_clips: List[Dict], temp_dir: str, render_profile: str = "final") -> List[Dict]:
+    profile = get_render_profile(render_profile)
     processed_clips = []
     clips_dir = os.path.join(os.getcwd(), "generated_clips")
     os.makedirs(clips_dir, exist_ok=True)
     project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../..'))
     # --- Detect target resolution from first video clip ---
-    target_resolution = "1280x720"  # fallback default
+    target_width, target_height = 1280, 720  # fallback default
     for item in timeline_clips:
         if item.get('type') == 'clip':
             # Try to get the file path for the first video clip
@@ -84,10 +125,12 @@ async def preprocess_timeline_items(timeline_clips: List[Dict], temp_dir: str) -
                         ]
                         result = subprocess.run(cmd, capture_output=True, text=True, check=True)
                         w, h = result.stdout.strip().split(',')
-                        target_resolution = f"{w}x{h}"
+                        target_width, target_height = int(w), int(h)
                         break
                     except Exception as e:
                         pass
+    target_width, target_height = scale_for_profile(target_width, target_height, profile)
+    target_resolution = f"{target_width}x{target_height}"
     # --- End detect target resolution ---
     for idx, item in enumerate(timeline_clips):
         logger.warning(f"[debug] Timeline item {idx}: {item}")
@@ -145,12 +188,19 @@ async def preprocess_timeline_items(timeline_clips: List[Dict], temp_dir: str) -
                 image_path = os.path.join(project_root, 'titan/public/assets/bg', 'black.jpg')
                 logger.warning(f"[preprocess_timeline_items] Image item {idx} missing or invalid. Using fallback black image.")
             duration = int(item.get('duration', 3))
-            out_path = os.path.join(temp_dir, f"image_{idx}.mp4")
-            await generate_video_from_image(image_path, out_path, duration=duration, resolution=target_resolution)
-            filename = os.path.basename(out_path)
+            # Content-addressed name so an unchanged image card is never regenerated
+            key = hash_parts('image', hash_file(image_path), duration, target_resolution, profile['preset'])
+            filename = f"image_{key[:16]}.mp4"
             dest_path = os.path.join(clips_dir, filename)
-            shutil.copy2(out_path, dest_path)
-            logger.info(f"[preprocess_timeline_items] Image segment {idx} generated and copied as {filename}")
+            if os.path.exists(dest_path):
+                logger.info(f"[preprocess_timeline_items] Image segment {idx} unchanged, reusing {filename}")
+                # Mark the card as recently used so prune_title_cards keeps it
+                os.utime(dest_path)
+            else:
+                out_path = os.path.join(temp_dir, filename)
+                await generate_video_from_image(image_path, out_path, duration=duration, resolution=target_resolution, preset=profile['preset'])
+                shutil.copy2(out_path, dest_path)
+                logger.info(f"[preprocess_timeline_items] Image segment {idx} generated and copied as {filename}")
             processed_clips.append({
                 'timelineId': int(item.get('timelineId', idx)),
                 'id': int(item.get('id', idx)),
@@ -172,12 +222,18 @@ async def preprocess_timeline_items(timeline_clips: List[Dict], temp_dir: str) -
                 text = 'Untitled'
                 logger.warning(f"[preprocess_timeline_items] Text item {idx} missing 'text' or 'name'. Using fallback 'Untitled'.")
             duration = int(item.get('duration', 3))
-            out_path = os.path.join(temp_dir, f"text_{idx}.mp4")
-            await generate_video_from_text(text, out_path, duration=duration, resolution=target_resolution)
-            filename = os.path.basename(out_path)
+            key = hash_parts('text', text, duration, target_resolution, profile['preset'])
+            filename = f"text_{key[:16]}.mp4"
             dest_path = os.path.join(clips_dir, filename)
-            shutil.copy2(out_path, dest_path)
-            logger.info(f"[preprocess_timeline_items] Text segment {idx} generated and copied as {filename}")
+            if os.path.exists(dest_path):
+                logger.info(f"[preprocess_timeline_items] Text segment {idx} unchanged, reusing {filename}")
+                # Mark the card as recently used so prune_title_cards keeps it
+                os.utime(dest_path)
+            else:
+                out_path = os.path.join(temp_dir, filename)
+                await generate_video_from_text(text, out_path, duration=duration, resolution=target_resolution, preset=profile['preset'])
+                shutil.copy2(out_path, dest_path)
+                logger.info(f"[preprocess_timeline_items] Text segment {idx} generated and copied as {filename}")
             processed_clips.append({
                 'timelineId': int(item.get('timelineId', idx)),
                 'id': int(item.get('id', idx)),
@@ -197,6 +253,27 @@ async def preprocess_timeline_items(timeline_clips: List[Dict], temp_dir: str) -
             logger.warning(f"[preprocess_timeline_items] Unknown timeline item type: {item_type}, skipping.")
     return processed_clips
 
+def prune_title_cards(clips_dir: str, max_age: float = TITLE_CARD_MAX_AGE) -> int:
+    """Delete image/text cards not generated or reused for `max_age` seconds. Returns the count removed."""
+    cutoff = time.time() - max_age
+    removed = 0
+    try:
+        entries = list(os.scandir(clips_dir))
+    except OSError:
+        return 0
+    for entry in entries:
+        if not TITLE_CARD_PATTERN.match(entry.name):
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            pass
+    if removed:
+        logger.info(f"[preprocess_timeline_items] Removed {removed} unused title cards from {clips_dir}")
+    return removed
+
 # Helper to robustly parse durations in 'mm:ss' or seconds format
 
 def parse_duration(duration):
@@ -223,6 +300,10 @@ class VideoRenderer:
             os.makedirs(self.output_base_dir, exist_ok=True)
         else:
             self.output_base_dir = output_base_dir
+        # Filenames of renders still in progress; their outputs may be streamed while growing
+        self.pending_outputs = set()
+        # Segment cache dir -> lock serializing renders that share its manifest
+        self._manifest_locks: Dict[str, asyncio.Lock] = {}
         self._verify_ffmpeg()
     
     def _verify_ffmpeg(self):
@@ -241,7 +322,9 @@ class VideoRenderer:
                                   sfx_list: Optional[List[Dict]] = None,
                                   output_format: str = "mp4",
                                   project_name: str = "final_video",
-                                  bgm_regions: Optional[List[Dict[str, float]]] = None) -> Dict:
+                                  bgm_regions: Optional[List[Dict[str, float]]] = None,
+                                  render_profile: str = "final",
+                                  render_id: Optional[str] = None) -> Dict:
         """
         Render timeline clips into a final video.
         Args:
@@ -251,18 +334,23 @@ class VideoRenderer:
             output_format: Output video format (mp4, mov, etc.)
             project_name: Project name for output filename
             bgm_regions: List of {start, duration} dicts for selective BGM (as a hint)
+            render_profile: 'final' for full quality or 'preview' for a fast low-resolution proxy
+            render_id: Optional id used in the output filename, so callers can expose the
+                stream URL before rendering finishes
         Returns:
             Dict with rendered video info
         """
         if not timeline_clips:
             raise ValueError("No clips provided for rendering")
-        render_id = str(uuid.uuid4())[:8]
-        output_filename = f"{project_name}_{render_id}_final.{output_format}"
+        profile = get_render_profile(render_profile)
+        render_id = render_id or str(uuid.uuid4())[:8]
+        output_filename = build_output_filename(project_name, render_id, render_profile, output_format)
         output_path = os.path.join(self.output_base_dir, output_filename)
         logger.info(f"🎬 Starting video rendering: {len(timeline_clips)} clips")
+        self.pending_outputs.add(output_filename)
         try:
             with tempfile.TemporaryDirectory() as temp_dir:
-                processed_clips = await preprocess_timeline_items(timeline_clips, temp_dir)
+                processed_clips = await preprocess_timeline_items(timeline_clips, temp_dir, render_profile)
                 # --- Compute mute regions for BGM (where timeline item is a video/clip) ---
                 mute_regions = []
                 play_regions = []
@@ -280,35 +368,18 @@ class VideoRenderer:
                 logger.info(f"[BGM] Computed mute regions for BGM: {mute_regions}")
                 logger.info(f"[BGM] Computed play regions for BGM: {play_regions}")
                 concat_file_path = await self._prepare_concat_list(processed_clips, temp_dir)
-                temp_video_path = os.path.join(temp_dir, "concatenated_video.mp4")
-                await self._concatenate_clips(concat_file_path, temp_video_path)
-                # --- Ensure audio stream exists ---
-                if not await self._has_audio_stream(temp_video_path):
-                    logger.warning('[audio-fix] No audio stream detected, adding silent audio track...')
-                    temp_with_audio = os.path.join(temp_dir, "concatenated_with_audio.mp4")
-                    cmd = [
-                        'ffmpeg', '-y',
-                        '-i', temp_video_path,
-                        '-f', 'lavfi',
-                        '-i', 'anullsrc=channel_layout=stereo:sample_rate=44100',
-                        '-shortest',
-                        '-c:v', 'copy',
-                        '-c:a', 'aac',
-                        temp_with_audio
-                    ]
-                    result = subprocess.run(cmd, capture_output=True, text=True)
-                    if result.returncode != 0:
-                        logger.error(f"[audio-fix] Failed to add silent audio: {result.stderr}")
-                        raise RuntimeError(f"Failed to add silent audio: {result.stderr}")
-                    temp_video_path = temp_with_audio
-                # --- End ensure audio stream ---
+                needs_mix = bool(bgm_file_path and os.path.exists(bgm_file_path)) or bool(sfx_list)
+                # Normalized segments always carry audio, so without BGM or SFX the stream-copy
+                # concat writes the streamable output directly
+                temp_video_path = os.path.join(temp_dir, "concatenated_video.mp4") if needs_mix else output_path
+                await self._concatenate_clips(concat_file_path, temp_video_path, project_name, render_profile,
+                                              fragmented=not needs_mix)
                 # Step 3: Add BGM and SFX if provided
-                if (bgm_file_path and os.path.exists(bgm_file_path)):
-                    final_video_path = await self._add_bgm_and_sfx_with_mute(
-                        temp_video_path, bgm_file_path, sfx_list or [], output_path, mute_regions
+                if needs_mix:
+                    await self._add_bgm_and_sfx_with_mute(
+                        temp_video_path, bgm_file_path, sfx_list or [], output_path, mute_regions,
+                        audio_bitrate=profile['audio_bitrate']
                     )
-                else:
-                    await self._finalize_video(temp_video_path, output_path)
                 if not os.path.exists(output_path):
                     raise RuntimeError("Output video file was not created")
                 file_size = os.path.getsize(output_path)
@@ -324,12 +395,16 @@ class VideoRenderer:
                     'clips_count': len(processed_clips),
                     'has_bgm': bgm_file_path is not None,
                     'has_sfx': bool(sfx_list),
+                    'render_profile': render_profile,
                     'url': f"/api/v1/process/rendered-videos/{output_filename}",
                     'status': 'success'
                 }
         except Exception as e:
             logger.error(f"Video rendering failed: {e}")
             raise RuntimeError(f"Video rendering failed: {str(e)}")
+        finally:
+            self.pending_outputs.discard(output_filename)
+            await asyncio.to_thread(prune_title_cards, os.path.join(os.getcwd(), "generated_clips"))
     
     async def _prepare_concat_list(self, timeline_clips: List[Dict], temp_dir: str) -> str:
         """Prepare ffmpeg concat list file."""
@@ -363,8 +438,48 @@ class VideoRenderer:
         
         return concat_file_path
     
-    async def _concatenate_clips(self, concat_file_path: str, output_path: str):
-        """Concatenate video clips using a robust ffmpeg filter_complex command."""
+    def _segment_cache_dir(self, project_name: str, render_profile: str = "final") -> str:
+        """Directory holding the normalized segment cache for a project and profile."""
+        safe_name = re.sub(r'[^A-Za-z0-9_-]', '_', project_name) or "project"
+        return os.path.join(self.output_base_dir, ".segments", safe_name, render_profile)
+
+    async def _normalize_segment(self, in_path: str, out_path: str, target: Dict, has_audio: bool):
+        """
+        Re-encode one clip to the shared target format. Every segment gets an audio
+        track and starts on a keyframe, so segments can be joined with stream copy.
+        """
+        cmd = ['ffmpeg', '-y', '-i', in_path]
+        if not has_audio:
+            cmd.extend(['-f', 'lavfi', '-i', f"anullsrc=channel_layout=stereo:sample_rate={target['sample_rate']}"])
+        cmd.extend([
+            '-vf', f"scale={target['width']}:{target['height']}:force_original_aspect_ratio=decrease,pad={target['width']}:{target['height']}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={target['fps']}",
+            '-pix_fmt', target['pix_fmt'],
+            '-c:v', 'libx264', '-preset', target['preset'], '-crf', str(target['crf']),
+            '-g', str(target['gop']),
+            '-c:a', 'aac', '-b:a', target['audio_bitrate'],
+            '-ar', str(target['sample_rate']), '-ac', str(target['channels']),
+            '-map', '0:v:0', '-map', '0:a:0' if has_audio else '1:a:0',
+        ])
+        if not has_audio:
+            cmd.append('-shortest')
+        tmp_path = out_path + ".part.mp4"
+        cmd.append(tmp_path)
+        result = await asyncio.to_thread(subprocess.run, cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            logger.error(f"[fix_concat] Failed to process {in_path}: {result.stderr}")
+            raise RuntimeError(f"Failed to process {in_path}: {result.stderr}")
+        os.replace(tmp_path, out_path)
+
+    async def _concatenate_clips(self, concat_file_path: str, output_path: str, project_name: str = "final_video",
+                                 render_profile: str = "final", fragmented: bool = False):
+        """
+        Concatenate clips incrementally: each clip is normalized once and cached in the
+        project's segment manifest, then all segments are stream-copied into the output.
+        Only clips whose content or target format changed are re-encoded. Preview
+        segments are cached separately and double as reusable proxy sources.
+        With fragmented=True the output is fragmented MP4, playable while being written.
+        """
+        profile = get_render_profile(render_profile)
         try:
             with open(concat_file_path, 'r') as f:
                 concat_contents = f.read()
@@ -390,90 +505,67 @@ class VideoRenderer:
                 return False
 
         target_width, target_height, target_fps, target_pix_fmt = get_video_props(file_paths[0])
+        target_width, target_height = scale_for_profile(target_width, target_height, profile)
         logger.info(f"[fix_concat] Target properties: {target_width}x{target_height}, {target_fps:.2f}fps, {target_pix_fmt}")
+        target = {
+            'width': target_width,
+            'height': target_height,
+            'fps': round(target_fps, 3),
+            'pix_fmt': target_pix_fmt,
+            'preset': profile['preset'],
+            'crf': profile['crf'],
+            'gop': max(1, int(round(target_fps * 2))),
+            'audio_bitrate': profile['audio_bitrate'],
+            'sample_rate': 44100,
+            'channels': 2,
+        }
 
-        with tempfile.TemporaryDirectory() as fix_dir:
-            fixed_files = []
-            audio_flags = []
+        cache_dir = self._segment_cache_dir(project_name, render_profile)
+        # Renders of the same project and profile share the segment dir and manifest.json:
+        # one at a time, so a render never drops segments another is still concatenating
+        async with self._manifest_locks.setdefault(cache_dir, asyncio.Lock()):
+            manifest = SegmentManifest(cache_dir)
+            section_keys = []
+            encoded = 0
             for i, in_path in enumerate(file_paths):
-                audio_flags.append(has_audio(in_path))
-                w, h, fps, pix_fmt = get_video_props(in_path)
-                needs_fix = (w != target_width) or (h != target_height) or (abs(fps - target_fps) > 0.01) or (pix_fmt != target_pix_fmt)
-                out_path = os.path.join(fix_dir, f"fixed_{i}.mp4")
-                
-                cmd_fix = [
-                    'ffmpeg', '-y', '-i', in_path,
-                    '-vf', f'scale={target_width}:{target_height}:force_original_aspect_ratio=decrease,pad={target_width}:{target_height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={target_fps}',
-                    '-pix_fmt', target_pix_fmt,
-                    '-c:v', 'libx264', '-preset', 'fast', '-crf', '22',
-                ]
-                if audio_flags[i]:
-                    cmd_fix.extend(['-c:a', 'aac', '-b:a', '192k'])
+                key = manifest.segment_key(in_path, target)
+                entry = manifest.lookup(key)
+                if entry:
+                    logger.info(f"[fix_concat] Segment {i} unchanged, reusing cached section")
                 else:
-                    cmd_fix.extend(['-an'])
-                cmd_fix.append(out_path)
-                
-                logger.info(f"[fix_concat] Processing segment {i}: {'Re-encoding' if needs_fix else 'Copying'}")
-                result = subprocess.run(cmd_fix, capture_output=True, text=True)
-                if result.returncode != 0:
-                    logger.error(f"[fix_concat] Failed to process {in_path}: {result.stderr}")
-                    raise RuntimeError(f"Failed to process {in_path}: {result.stderr}")
-                fixed_files.append(out_path)
-
-            input_args = []
-            video_chain = ""
-            audio_chain = ""
-            num_audio_inputs = 0
-
-            for i, path in enumerate(fixed_files):
-                input_args.extend(['-i', path])
-                video_chain += f'[{i}:v:0]'
-                if audio_flags[i]:
-                    audio_chain += f'[{i}:a:0]'
-                    num_audio_inputs += 1
-
-            if num_audio_inputs == 0:
-                # No audio streams at all, create silent video
-                filter_complex = f"{video_chain}concat=n={len(fixed_files)}:v=1:a=0[v]"
-                map_args = ['-map', '[v]']
-                audio_codec_args = ['-an']
-            else:
-                # Some streams have audio, create silent streams for those that don't
-                final_audio_chain = ""
-                audio_input_idx = 0
-                for i in range(len(fixed_files)):
-                    if audio_flags[i]:
-                        final_audio_chain += f'[{audio_input_idx}:a:0]'
-                        audio_input_idx += 1
-                    else:
-                        # Create a silent audio stream for the duration of the video segment
-                        duration = await self._get_video_duration(fixed_files[i])
-                        input_args.extend(['-f', 'lavfi', '-t', str(duration), '-i', 'anullsrc=channel_layout=stereo:sample_rate=44100'])
-                        final_audio_chain += f'[{len(fixed_files) + i - audio_input_idx}:a:0]'
+                    seg_path = manifest.segment_path(key)
+                    logger.info(f"[fix_concat] Segment {i} changed, re-encoding")
+                    await self._normalize_segment(in_path, seg_path, target, has_audio(in_path))
+                    manifest.store(key, seg_path, await self._get_video_duration(seg_path), in_path)
+                    encoded += 1
+                section_keys.append(key)
+            manifest.record_sections(section_keys)
+            logger.info(f"[fix_concat] Re-encoded {encoded}/{len(file_paths)} segments")
 
-                filter_complex = f"{video_chain}concat=n={len(fixed_files)}:v=1:a=0[v];{final_audio_chain}concat=n={len(fixed_files)}:v=0:a=1[a]"
-                map_args = ['-map', '[v]', '-map', '[a]']
-                audio_codec_args = ['-c:a', 'aac', '-b:a', '192k']
+            segments_list_path = os.path.join(os.path.dirname(concat_file_path), "segments_list.txt")
+            with open(segments_list_path, 'w') as f:
+                for key in section_keys:
+                    escaped_path = manifest.data['segments'][key]['path'].replace("'", "'\\''")
+                    f.write(f"file '{escaped_path}'\n")
 
             cmd = [
-                'ffmpeg', '-y', *input_args,
-                '-filter_complex', filter_complex,
-                *map_args,
-                '-c:v', 'libx264', '-pix_fmt', 'yuv420p',
-                *audio_codec_args,
-                '-shortest', output_path
+                'ffmpeg', '-y',
+                '-f', 'concat', '-safe', '0',
+                '-i', segments_list_path,
+                '-c', 'copy',
+                *(FRAGMENTED_MP4_FLAGS if fragmented else []),
+                output_path
             ]
-
-            logger.warning(f"[debug] ffmpeg filter_complex concat command: {' '.join(shlex.quote(s) for s in cmd)}")
-            logger.info("🔗 Concatenating video clips with filter_complex...")
+            logger.warning(f"[debug] ffmpeg concat command: {' '.join(shlex.quote(s) for s in cmd)}")
+            logger.info("🔗 Concatenating video segments (stream copy)...")
             try:
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=300, check=True)
-                logger.info("✅ Video clips concatenated successfully (filter_complex)")
+                await asyncio.to_thread(subprocess.run, cmd, capture_output=True, text=True, timeout=300, check=True)
+                logger.info("✅ Video clips concatenated successfully")
             except subprocess.CalledProcessError as e:
-                logger.error(f"ffmpeg filter_complex concat failed: {e.stderr}")
+                logger.error(f"ffmpeg concat failed: {e.stderr}")
                 raise RuntimeError(f"Video concatenation failed: {e.stderr}")
             except subprocess.TimeoutExpired:
-                logger.error("ffmpeg filter_complex concat timed out")
+                logger.error("ffmpeg concat timed out")
                 raise RuntimeError("Video concatenation timed out")
 
     async def _get_video_duration(self, video_path: str) -> float:
@@ -495,153 +587,33 @@ class VideoRenderer:
             return 0.0
 
     async def _add_bgm_and_sfx(self, video_path: str, bgm_path: Optional[str], sfx_list: list, output_path: str) -> str:
-        input_args = ['-i', video_path]
-        filter_parts = []
-        amix_inputs = '[0:a]'
-        idx = 1
-        # Add BGM if provided
-        if bgm_path and os.path.exists(bgm_path):
-            input_args += ['-i', bgm_path]
-            filter_parts.append(f'[{idx}]aloop=loop=-1:size=2e+09,asetpts=N/SR/TB[bgm]')
-            amix_inputs += '[bgm]'
-            idx += 1
-        # Add SFX
-        for i, sfx in enumerate(sfx_list):
-            sfx_path = sfx.get('path')
-            delay = int(sfx.get('delay_ms', 0))
-            if not sfx_path or not os.path.exists(sfx_path):
-                continue
-            input_args += ['-i', sfx_path]
-            filter_parts.append(f'[{idx}]adelay={delay}|{delay}[sfx{i}]')
-            amix_inputs += f'[sfx{i}]'
-            idx += 1
-        n_inputs = amix_inputs.count('[')
-        filter_parts.append(f'{amix_inputs}amix=inputs={n_inputs}:duration=longest[aout]')
-        filter_complex = ';'.join(filter_parts)
-        cmd = [
-            'ffmpeg', '-y',
-            *input_args,
-            '-filter_complex', filter_complex,
-            '-map', '0:v:0',
-            '-map', '[aout]',
-            '-c:v', 'copy',
-            '-c:a', 'aac',
-            '-shortest',
-            '-b:a', '128k',
-            output_path
-        ]
-        logger.info("🎵 Adding BGM and SFX (if any)...")
-        logger.warning(f"[debug] ffmpeg BGM+SFX command: {' '.join(cmd)}")
-        try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=240,
-                check=True
-            )
-            logger.info("✅ BGM and SFX added successfully")
-            return output_path
-        except subprocess.CalledProcessError as e:
-            logger.error(f"ffmpeg BGM+SFX addition failed: {e.stderr}")
-            raise RuntimeError(f"BGM+SFX addition failed: {e.stderr}")
-        except subprocess.TimeoutExpired:
-            logger.error("ffmpeg BGM+SFX addition timed out")
-            raise RuntimeError("BGM+SFX addition timed out")
-    
-    async def _add_bgm_and_sfx_with_mute(self, video_path: str, bgm_path: Optional[str], sfx_list: list, output_path: str, mute_regions: list) -> str:
+        """Mix looped BGM and SFX over the clip audio at full BGM volume."""
+        return await self._add_bgm_and_sfx_with_mute(video_path, bgm_path, sfx_list, output_path, [])
+
+    async def _add_bgm_and_sfx_with_mute(self, video_path: str, bgm_path: Optional[str], sfx_list: list, output_path: str, mute_regions: list,
+                                         audio_bitrate: str = '192k') -> str:
         """
         Add BGM with audio ducking: BGM is lowered during video clips and at full volume otherwise.
+        SFX are placed by their delay. The audio bed is mixed in-process and encoded once.
         """
-        input_args = ['-i', video_path]
-        
-        if not (bgm_path and os.path.exists(bgm_path)):
-            # No BGM, just ensure the output file exists in the correct format.
-            cmd_copy = ['ffmpeg', '-y', '-i', video_path, '-c', 'copy', output_path]
-            subprocess.run(cmd_copy, check=True, capture_output=True, text=True)
-            return output_path
-
-        input_args.extend(['-stream_loop', '-1', '-i', bgm_path])
-
-        filter_parts = []
-        
-        # If there are clips with audio, set up ducking
-        if mute_regions:
-            # Ducking expression: sets volume to 0.2 during clip regions, 1.0 otherwise.
-            ducking_expr = '+'.join([f'between(t,{r["start"]},{r["end"]})' for r in mute_regions])
-            volume_filter = f"[1:a]volume=if({ducking_expr}, 0.2, 1.0)[bgm_ducked]"
-            filter_parts.append(volume_filter)
-            
-            # Mix the original audio with the ducked BGM
-            mix_filter = f"[0:a][bgm_ducked]amerge=inputs=2[aout]"
-            filter_parts.append(mix_filter)
-            map_audio = '[aout]'
-        else:
-            # No clips, just mix main audio (which should be silent) with BGM at full volume
-            mix_filter = "[0:a][1:a]amerge=inputs=2[aout]"
-            filter_parts.append(mix_filter)
-            map_audio = '[aout]'
-
-        filter_complex = ';'.join(filter_parts)
-        
-        cmd = [
-            'ffmpeg', '-y',
-            *input_args,
-            '-filter_complex', filter_complex,
-            '-map', '0:v:0',
-            '-map', f'{map_audio}',
-            '-c:v', 'copy',
-            '-c:a', 'aac',
-            '-shortest',
-            '-b:a', '192k',
-            output_path
-        ]
-        
-        logger.info("🎵 Adding BGM with audio ducking...")
-        logger.warning(f"[debug] ffmpeg audio ducking command: {' '.join(shlex.quote(s) for s in cmd)}")
+        mixer = AudioMixer(decoder=get_audio_cache().decode)
+        logger.info("🎵 Mixing BGM and SFX with audio ducking...")
         try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=300,
-                check=True
+            await asyncio.to_thread(
+                mixer.mix_to_file,
+                video_path,
+                output_path,
+                bgm_path=bgm_path,
+                sfx_list=sfx_list,
+                duck_regions=mute_regions,
+                audio_bitrate=audio_bitrate,
+                output_flags=FRAGMENTED_MP4_FLAGS
             )
-            logger.info("✅ BGM with audio ducking added successfully")
+            logger.info("✅ BGM and SFX mixed successfully")
             return output_path
-        except subprocess.CalledProcessError as e:
-            logger.error(f"ffmpeg audio ducking failed: {e.stderr}")
-            raise RuntimeError(f"BGM ducking failed: {e.stderr}")
-        except subprocess.TimeoutExpired:
-            logger.error("ffmpeg audio ducking timed out")
-            raise RuntimeError("BGM ducking timed out")
-
-    async def _finalize_video(self, temp_video_path: str, output_path: str):
-        """Finalize video with optimization."""
-        cmd = [
-            'ffmpeg', '-y',
-            '-i', temp_video_path,
-            '-c:v', 'copy',    # Re-encode with H.264
-            '-c:a', 'copy',        # Re-encode audio with AAC
-            '-movflags', '+faststart',  # Web optimization
-            output_path
-        ]
-        logger.info("🎞️ Finalizing video...")
-        try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=180,  # 3 minute timeout
-                check=True
-            )
-            logger.info("✅ Video finalized successfully")
-        except subprocess.CalledProcessError as e:
-            logger.error(f"ffmpeg finalization failed: {e.stderr}")
-            raise RuntimeError(f"Video finalization failed: {e.stderr}")
-        except subprocess.TimeoutExpired:
-            logger.error("ffmpeg finalization timed out")
-            raise RuntimeError("Video finalization timed out")
+        except (RuntimeError, subprocess.CalledProcessError, OSError) as e:
+            logger.error(f"Audio mixing failed: {e}")
+            raise RuntimeError(f"BGM+SFX mixing failed: {e}")
 
     async def _get_video_duration(self, video_path: str) -> float:
         """Get video duration using ffprobe."""
@@ -690,7 +662,8 @@ class VideoRenderingManager:
         """
         Render final video from project timeline data.
         Args:
-            timeline_data: Dict containing timeline_clips and optional bgm_path and sfx_list and bgm_regions
+            timeline_data: Dict containing timeline_clips and optional bgm_path, sfx_list, bgm_regions,
+                render_profile and render_id
             project_name: Name for the output video file
         Returns:
             Dict with render result information
@@ -699,6 +672,7 @@ class VideoRenderingManager:
         bgm_path = timeline_data.get('bgm_path')
         sfx_list = timeline_data.get('sfx_list', [])
         bgm_regions = timeline_data.get('bgm_regions', None)
+        render_profile = timeline_data.get('render_profile', 'final')
         if not timeline_clips:
             raise ValueError("No clips in timeline to render")
         try:
@@ -707,7 +681,9 @@ class VideoRenderingManager:
                 bgm_file_path=bgm_path,
                 sfx_list=sfx_list,
                 project_name=project_name,
-                bgm_regions=bgm_regions
+                bgm_regions=bgm_regions,
+                render_profile=render_profile,
+                render_id=timeline_data.get('render_id')
             )
             logger.info(f"✅ Project video rendered successfully: {render_result['filename']}")
             return render_result
@@ -18,6 +18,8 @@ import numpy as np
 import requests
 from sarvamai import SarvamAI
 
+from ..utils.audio_features import acoustic_features
+
 logger = logging.getLogger(__name__)
 
 class WhisperCppService:
@@ -72,13 +74,15 @@ class WhisperCppService:
             self._use_mock = True
             self._use_openai_whisper = False
     
-    async def transcribe_audio(self, audio_path: str, output_format: str = "json", language: str = None) -> Dict:
+    async def transcribe_audio(self, audio_path: str, output_format: str = "json", language: str = None,
+                               word_timestamps: bool = False) -> Dict:
         """
         Transcribe a single audio file using Sarvam AI SDK for Malayalam, Whisper for English/others.
         Args:
             audio_path: Path to audio file
             output_format: Output format ("json", "txt", "srt", "vtt")
             language: Language code ("en", "ml", etc.)
+            word_timestamps: Ask the OpenAI Whisper backend for per-word timings (segment 'words')
         Returns:
             Transcription result dictionary
         """
@@ -150,6 +154,14 @@ class WhisperCppService:
                 logger.warning(f"[AudioCheck] Skipping silent chunk: {audio_path}")
                 logger.info(f"[AudioCheck] First 10 samples: {data[:10]}")
                 raise ValueError(f"Audio file {audio_path} is silent.")
+            # Loudness of the chunk, used by the vibe pre-ranker as an energy feature
+            audio_rms = float(np.sqrt(np.mean(np.square(data))))
+            # Loudness, onset rate, brightness and speech/music ratio for vibe scoring
+            try:
+                acoustic = acoustic_features(data, rate)
+            except Exception as feature_e:
+                logger.warning(f"[AudioCheck] Could not compute acoustic features for {audio_path}: {feature_e}")
+                acoustic = None
             # Detailed diagnostics
             logger.info(f"[AudioCheck] {audio_path}: shape={data.shape}, rate={rate}, dtype={data.dtype}, duration={duration:.2f}s, mean={np.mean(data):.4f}, std={np.std(data):.4f}, max={np.max(data):.4f}, min={np.min(data):.4f}")
             # Optionally, log log_mel shape if OpenAI Whisper is available
@@ -169,13 +181,19 @@ class WhisperCppService:
         
         # Use mock transcription if neither whisper available
         if self._use_mock:
-            return self._generate_mock_transcription(audio_path)
-        
+            result = self._generate_mock_transcription(audio_path)
         # Use OpenAI Whisper Python package
-        if self._use_openai_whisper:
-            return await self._transcribe_with_openai_whisper(audio_path, language=lang)
-        
+        elif self._use_openai_whisper:
+            result = await self._transcribe_with_openai_whisper(audio_path, language=lang, word_timestamps=word_timestamps)
         # Use whisper.cpp executable
+        else:
+            result = await self._transcribe_with_whisper_cpp(audio_path, output_format)
+        result['audio_rms'] = audio_rms
+        result['acoustic'] = acoustic
+        return result
+    
+    async def _transcribe_with_whisper_cpp(self, audio_path: str, output_format: str = "json") -> Dict:
+        """Transcribe a single audio file with the whisper.cpp executable."""
         with tempfile.TemporaryDirectory() as temp_dir:
             output_file = os.path.join(temp_dir, f"output.{output_format}")
             
@@ -413,7 +431,8 @@ class WhisperCppService:
             'using_openai_whisper': self._use_openai_whisper
         }
     
-    async def _transcribe_with_openai_whisper(self, audio_path: str, language: str = None) -> Dict:
+    async def _transcribe_with_openai_whisper(self, audio_path: str, language: str = None,
+                                              word_timestamps: bool = False) -> Dict:
         """Transcribe audio using OpenAI Whisper Python package."""
         try:
             import whisper
@@ -436,7 +455,7 @@ class WhisperCppService:
                     fp16=False,  # Use fp32 for compatibility
                     verbose=False,
                     # Speed optimizations
-                    word_timestamps=False,  # Disable word-level timestamps for speed
+                    word_timestamps=word_timestamps,  # Off by default for speed; /find uses them to cut precisely
                     condition_on_previous_text=False  # Disable for speed
                 )
             
@@ -0,0 +1,129 @@
+"""
+Acoustic features of a transcribed chunk, computed from the samples the
+transcriber already loaded.
+
+All frame-level measures come from one strided frame matrix and one batched
+FFT: RMS envelope, spectral centroid, spectral-flux onsets (and a tempo
+estimate from their autocorrelation) and a heuristic speech/music ratio.
+"""
+
+import logging
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FRAME_SECONDS = 0.046
+HOP_SECONDS = 0.023
+# Analysis rate; higher input rates are decimated first, speech/music cues live below 8 kHz
+ANALYSIS_RATE = 16000
+SPEECH_BAND_HZ = (300.0, 3400.0)
+# Chunks with no usable transcript are still scored when they are at least this loud
+MIN_ACOUSTIC_RMS = 0.02
+
+
+def _frames(signal: np.ndarray, frame: int, hop: int) -> np.ndarray:
+    if len(signal) < frame:
+        signal = np.pad(signal, (0, frame - len(signal)))
+    count = 1 + (len(signal) - frame) // hop
+    return np.lib.stride_tricks.as_strided(
+        signal, shape=(count, frame), strides=(signal.strides[0] * hop, signal.strides[0])
+    )
+
+
+def _tempo_bpm(onset_envelope: np.ndarray, frames_per_second: float) -> float:
+    """Strongest autocorrelation lag of the onset envelope within 60-180 BPM."""
+    envelope = onset_envelope - onset_envelope.mean()
+    min_lag = int(frames_per_second * 60 / 180)
+    max_lag = int(frames_per_second * 60 / 60)
+    if len(envelope) <= max_lag or not envelope.any():
+        return 0.0
+    spectrum = np.fft.rfft(envelope, n=2 * len(envelope))
+    autocorr = np.fft.irfft(spectrum * np.conj(spectrum))[:len(envelope)]
+    if autocorr[0] <= 0:
+        return 0.0
+    lags = autocorr[min_lag:max_lag + 1] / autocorr[0]
+    best = int(np.argmax(lags))
+    # Weak periodicity means no steady beat
+    return float(60.0 * frames_per_second / (min_lag + best)) if lags[best] > 0.1 else 0.0
+
+
+def acoustic_features(data: np.ndarray, rate: int) -> Dict[str, float]:
+    """
+    Per-chunk acoustic summary:
+        rms, rms_db, dynamics (envelope std / mean), onset_rate (per second),
+        tempo_bpm (0 when there is no steady beat), spectral_centroid (Hz),
+        speech_ratio (0 = music-like, 1 = speech-like)
+    """
+    signal = np.asarray(data, dtype=np.float32)
+    if signal.ndim > 1:
+        signal = signal.mean(axis=1)
+    step = max(1, int(rate // ANALYSIS_RATE))
+    if step > 1:
+        signal = signal[:len(signal) // step * step].reshape(-1, step).mean(axis=1)
+        rate = rate / step
+    signal = np.ascontiguousarray(signal)
+
+    frame = int(rate * FRAME_SECONDS)
+    hop = int(rate * HOP_SECONDS)
+    frames = _frames(signal, frame, hop)
+    frames_per_second = rate / hop
+
+    envelope = np.sqrt(np.mean(np.square(frames), axis=1))
+    magnitude = np.abs(np.fft.rfft(frames * np.hanning(frame).astype(np.float32), axis=1))
+    freqs = np.fft.rfftfreq(frame, d=1.0 / rate)
+    power = magnitude.sum(axis=1)
+    centroid = (magnitude @ freqs) / np.where(power > 0, power, 1.0)
+
+    # Spectral flux onsets: local maxima above an adaptive threshold
+    flux = np.maximum(np.diff(np.log1p(magnitude), axis=0), 0.0).sum(axis=1)
+    if len(flux) >= 3:
+        threshold = flux.mean() + flux.std()
+        peaks = (flux[1:-1] > flux[:-2]) & (flux[1:-1] >= flux[2:]) & (flux[1:-1] > threshold)
+        onsets = int(peaks.sum())
+    else:
+        onsets = 0
+    duration = len(signal) / rate
+
+    # Speech alternates syllables and pauses (many low-energy frames) and keeps its energy
+    # in the voice band; music is denser and spreads across the spectrum.
+    rms = float(np.sqrt(np.mean(np.square(signal)))) if len(signal) else 0.0
+    mean_envelope = float(envelope.mean())
+    low_energy_ratio = float((envelope < 0.5 * mean_envelope).mean()) if mean_envelope > 0 else 1.0
+    band = (freqs >= SPEECH_BAND_HZ[0]) & (freqs <= SPEECH_BAND_HZ[1])
+    band_fraction = magnitude[:, band].sum(axis=1) / np.where(power > 0, power, 1.0)
+    voiced = envelope > 0.5 * mean_envelope
+    band_score = float((band_fraction[voiced] > 0.6).mean()) if voiced.any() else 0.0
+    speech_ratio = 0.6 * float(np.clip((low_energy_ratio - 0.1) / 0.3, 0.0, 1.0)) + 0.4 * band_score
+
+    return {
+        'rms': round(rms, 5),
+        'rms_db': round(float(20 * np.log10(max(rms, 1e-6))), 1),
+        'dynamics': round(float(envelope.std() / mean_envelope) if mean_envelope > 0 else 0.0, 3),
+        'onset_rate': round(onsets / duration, 2) if duration > 0 else 0.0,
+        'tempo_bpm': round(_tempo_bpm(flux, frames_per_second), 1),
+        'spectral_centroid': round(float(np.average(centroid, weights=envelope + 1e-9)), 1),
+        'speech_ratio': round(speech_ratio, 3),
+    }
+
+
+def describe_acoustics(acoustic: Optional[Dict]) -> str:
+    """Compact description for LLM prompts, e.g. 'loud, 3.1 onsets/s, ~120 BPM, bright, mostly music'."""
+    if not acoustic:
+        return ''
+    db = acoustic.get('rms_db', -60.0)
+    parts = ['loud' if db > -15 else 'quiet' if db < -35 else 'moderate volume',
+             f"{acoustic.get('onset_rate', 0):.1f} onsets/s"]
+    if acoustic.get('tempo_bpm'):
+        parts.append(f"~{acoustic['tempo_bpm']:.0f} BPM")
+    centroid = acoustic.get('spectral_centroid', 0)
+    parts.append('bright' if centroid > 2500 else 'dark' if centroid < 1000 else 'balanced tone')
+    speech = acoustic.get('speech_ratio', 0.5)
+    parts.append('mostly speech' if speech > 0.6 else 'mostly music' if speech < 0.35 else 'speech over music')
+    return ', '.join(parts)
+
+
+def has_acoustic_content(acoustic: Optional[Dict]) -> bool:
+    """True when a chunk is loud enough to be worth scoring on its audio alone."""
+    return bool(acoustic) and acoustic.get('rms', 0.0) >= MIN_ACOUSTIC_RMS
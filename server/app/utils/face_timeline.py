@@ -0,0 +1,162 @@
+"""
+Timeline logic for find-by-image face search, independent of the decoder and
+the face detector.
+
+Detection runs on a sparse set of sampled frames (a fixed rate, or scene-change
+keyframes). Clip boundaries are then refined by binary search between the last
+sampled miss and the first sampled hit. Hits are turned into (start, end)
+periods with the same hysteresis as the original per-frame loop: a clip stays
+open until more than `frames_after_detection` consecutive frames have no match.
+Frame numbers are 1-based and a frame's timestamp is frame / fps.
+"""
+
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Mean absolute difference (0-255) of downscaled grayscale frames that counts as a cut
+SCENE_CHANGE_THRESHOLD = 18.0
+SCENE_THUMB_SIZE = 64
+
+
+def sample_step(fps: float, sample_fps: float, frames_after_detection: int) -> int:
+    """
+    Frames between detections. Never larger than the hysteresis window, so a
+    sampled miss-run can only close a clip if the per-frame loop would have.
+    """
+    step = max(1, int(round(fps / sample_fps))) if sample_fps > 0 else 1
+    return max(1, min(step, frames_after_detection))
+
+
+def hits_to_clips(hit_frames: List[int], fps: float, frames_after_detection: int,
+                  total_frames: int) -> List[Tuple[float, float]]:
+    """
+    (start, end) seconds for runs of hits separated by at most `frames_after_detection`
+    misses. A run ends `frames_after_detection` frames after its last hit, or at the end
+    of the video.
+    """
+    clips = []
+    hits = sorted(set(hit_frames))
+    if not hits or fps <= 0:
+        return clips
+    start = last = hits[0]
+    for frame in hits[1:]:
+        if frame - last - 1 > frames_after_detection:
+            clips.append((start / fps, min(last + frames_after_detection, total_frames) / fps))
+            start = frame
+        last = frame
+    clips.append((start / fps, min(last + frames_after_detection, total_frames) / fps))
+    return clips
+
+
+def settled_clips(clips: List[Tuple[float, float]], fps: float, last_sample: int) -> List[Tuple[float, float]]:
+    """
+    Clips (from hits_to_clips with total_frames=last_sample) that no later sample can
+    change: their hysteresis window closed before the last sample scanned so far.
+    """
+    return [clip for clip in clips if round(clip[1] * fps) < last_sample]
+
+
+def refine_boundary(miss_frame: int, hit_frame: int, probe: Callable[[int], bool]) -> int:
+    """
+    Binary search between a sampled miss and a sampled hit (either order) for the hit
+    frame nearest the miss. `probe(frame)` runs detection on one frame.
+    """
+    lo, hi = miss_frame, hit_frame
+    while abs(hi - lo) > 1:
+        mid = (lo + hi) // 2
+        if probe(mid):
+            hi = mid
+        else:
+            lo = mid
+    return hi
+
+
+def sample_transitions(samples: Dict[int, bool]) -> List[Tuple[int, int]]:
+    """(miss frame, hit frame) for every pair of neighbouring samples that disagree with a gap between them."""
+    frames = sorted(samples)
+    transitions = []
+    for previous, current in zip(frames, frames[1:]):
+        if samples[previous] != samples[current] and current - previous > 1:
+            transitions.append((previous, current) if samples[current] else (current, previous))
+    return transitions
+
+
+def refine_hits(samples: Dict[int, bool], probe: Callable[[int], bool]) -> List[int]:
+    """
+    Sampled hits plus the refined first/last hit of every run. `samples` maps sampled
+    frame numbers to detection results.
+    """
+    refined = {frame for frame, found in samples.items() if found}
+    refined.update(refine_boundary(miss, hit, probe) for miss, hit in sample_transitions(samples))
+    return sorted(refined)
+
+
+def plan_shards(total_frames: int, step: int, shards: int, min_frames: int) -> List[Tuple[int, Optional[int]]]:
+    """
+    Split frames 1..total_frames into up to `shards` contiguous (start, end) ranges of at
+    least `min_frames`, each starting on the global sampling grid. The last range is
+    open-ended (end None) since container frame counts are only estimates.
+    """
+    count = max(1, min(shards, total_frames // max(1, min_frames)))
+    size = -(-total_frames // count)
+    size = max(step, -(-size // step) * step)
+    ranges = []
+    start = 1
+    while len(ranges) < count - 1 and start + size <= total_frames:
+        ranges.append((start, start + size - 1))
+        start += size
+    ranges.append((start, None))
+    return ranges
+
+
+class SceneChangeDetector:
+    """Flags frames whose downscaled grayscale content differs sharply from the previous frame."""
+
+    def __init__(self, threshold: float = SCENE_CHANGE_THRESHOLD):
+        self.threshold = threshold
+        self._previous: Optional[np.ndarray] = None
+
+    def is_cut(self, frame: np.ndarray) -> bool:
+        step_y = max(1, frame.shape[0] // SCENE_THUMB_SIZE)
+        step_x = max(1, frame.shape[1] // SCENE_THUMB_SIZE)
+        thumb = frame[::step_y, ::step_x]
+        if thumb.ndim == 3:
+            thumb = thumb.mean(axis=2)
+        thumb = thumb.astype(np.float32)
+        previous, self._previous = self._previous, thumb
+        if previous is None or previous.shape != thumb.shape:
+            return True
+        return float(np.abs(thumb - previous).mean()) > self.threshold
+
+
+class FrameSampler:
+    """
+    Decides which frames get face detection.
+
+    - "fps": every `step`-th frame.
+    - "keyframes": scene cuts, plus a detection at least every `step` frames so the
+      hysteresis window is always covered.
+    """
+
+    def __init__(self, mode: str, step: int):
+        if mode not in ("fps", "keyframes"):
+            raise ValueError(f"Unknown face sampling mode '{mode}', expected 'fps' or 'keyframes'")
+        self.mode = mode
+        self.step = step
+        self.scenes = SceneChangeDetector() if mode == "keyframes" else None
+        self._last_sampled = None
+
+    def wants(self, frame_number: int, frame: Optional[np.ndarray] = None) -> bool:
+        if self.mode == "fps":
+            return (frame_number - 1) % self.step == 0
+        # Every frame goes through the cut detector so its reference frame stays current
+        due = self._last_sampled is None or frame_number - self._last_sampled >= self.step
+        if frame is not None and self.scenes.is_cut(frame):
+            due = True
+        if due:
+            self._last_sampled = frame_number
+        return due
@@ -0,0 +1,286 @@
+"""
+Threaded video frame source for face search.
+
+Frames that the sampler does not want are skipped on the decode side
+(`cap.grab()` without `retrieve()`, or ffmpeg's select filter). Wanted frames
+are scaled and converted to RGB straight into a preallocated ring buffer of
+NumPy arrays, handed to the consumer under a condition variable (no polling).
+"""
+
+import os
+import shutil
+import logging
+import threading
+import subprocess
+from typing import Optional, Tuple
+
+import numpy as np
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+from .face_timeline import FrameSampler
+
+logger = logging.getLogger(__name__)
+
+# "opencv" (grab/retrieve) or "ffmpeg" (decoder pipe with select + scale filters)
+FRAME_SOURCE = os.getenv("FRAME_SOURCE", "opencv").lower()
+FRAME_RING_SIZE = int(os.getenv("FRAME_RING_SIZE", "8"))
+
+
+def seek_to_frame(cap, frames_before: int, fps: float, max_backoff: float = 4.0) -> int:
+    """
+    Position `cap` so its next grab() decodes frame `frames_before + 1` (1-based).
+
+    Frame-index seeks are approximate on long-GOP and variable-frame-rate inputs, so
+    this seeks by timestamp, reads back the frame position the demuxer actually landed
+    on and grabs forward to the target; landing past it seeks again further back.
+    Returns the frames before the new position: `frames_before` unless the video ends
+    first (or no seek up to `max_backoff` seconds earlier lands before the target).
+    """
+    backoff = 0.0
+    while True:
+        target_ms = max(0.0, frames_before / fps - backoff) * 1000.0 if fps > 0 else 0.0
+        cap.set(cv2.CAP_PROP_POS_MSEC, target_ms)
+        position = int(round(cap.get(cv2.CAP_PROP_POS_FRAMES)))
+        if position <= frames_before or target_ms == 0 or backoff >= max_backoff:
+            break
+        backoff = backoff * 2 if backoff else 0.5
+    while position < frames_before and cap.grab():
+        position += 1
+    return position
+
+
+class FrameRing:
+    """
+    Fixed set of preallocated frame buffers shared by one producer and one consumer.
+    The producer fills `slot()` then `commit()`s it; the consumer `read()`s the oldest
+    frame and `release()`s it when done.
+    """
+
+    def __init__(self, size: int, shape: Tuple[int, ...], dtype=np.uint8):
+        self.size = max(1, size)
+        self.buffers = np.empty((self.size, *shape), dtype=dtype)
+        self.frame_numbers = [0] * self.size
+        self._head = 0
+        self._count = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def slot(self) -> Optional[np.ndarray]:
+        """Next free buffer to write into, waiting while the ring is full. None once closed."""
+        with self._cond:
+            while self._count == self.size and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return None
+            return self.buffers[(self._head + self._count) % self.size]
+
+    def commit(self, frame_number: int):
+        with self._cond:
+            self.frame_numbers[(self._head + self._count) % self.size] = frame_number
+            self._count += 1
+            self._cond.notify_all()
+
+    def read(self, timeout: Optional[float] = None) -> Optional[Tuple[int, np.ndarray]]:
+        """Oldest unread (frame number, frame); None when closed and drained, or on timeout."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._count > 0 or self._closed, timeout=timeout):
+                return None
+            if self._count == 0:
+                return None
+            return self.frame_numbers[self._head], self.buffers[self._head]
+
+    def release(self):
+        with self._cond:
+            if self._count:
+                self._head = (self._head + 1) % self.size
+                self._count -= 1
+                self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class FrameReader:
+    """
+    Reads the frames `sampler` asks for, scaled by `scale_factor` and in RGB, on a
+    background thread. `read()` returns (frame_number, frame); the array is a ring
+    slot that stays valid until the next `read()`. `start_frame` / `end_frame`
+    (1-based, inclusive) restrict reading to one shard of the video.
+    """
+
+    def __init__(self, video_path: str, sampler: Optional[FrameSampler] = None, scale_factor: float = 1.0,
+                 ring_size: int = FRAME_RING_SIZE, backend: str = FRAME_SOURCE,
+                 start_frame: int = 1, end_frame: Optional[int] = None):
+        self.video_path = video_path
+        self.start_frame = max(1, start_frame)
+        self.end_frame = end_frame
+        self.sampler = sampler or FrameSampler("fps", 1)
+        self.scale_factor = scale_factor
+        self.ring_size = ring_size
+        self.backend = backend
+        self.cap = None
+        self.ring: Optional[FrameRing] = None
+        self.process: Optional[subprocess.Popen] = None
+        self.fps = 0.0
+        self.width = self.height = 0
+        self.out_width = self.out_height = 0
+        self.frames_decoded = 0
+        self.stopped = False
+        self._reading = False
+        self.thread = threading.Thread(target=self._reader_loop, args=(), daemon=True)
+
+    def start(self):
+        if cv2 is None:
+            logger.error("opencv-python is not installed; cannot read video frames.")
+            return None
+        self.cap = cv2.VideoCapture(self.video_path)
+        if not self.cap.isOpened():
+            logger.error(f"Error: Could not open video file '{self.video_path}' in FrameReader.")
+            self.stopped = True
+            return None
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.out_width = max(1, int(round(self.width * self.scale_factor)))
+        self.out_height = max(1, int(round(self.height * self.scale_factor)))
+        self.ring = FrameRing(self.ring_size, (self.out_height, self.out_width, 3))
+        self.frames_decoded = self.start_frame - 1
+
+        if self.backend == "ffmpeg":
+            if self.sampler.mode != "fps" or not shutil.which("ffmpeg"):
+                logger.info("FrameReader: ffmpeg source needs fps sampling and an ffmpeg binary, using OpenCV")
+                self.backend = "opencv"
+            else:
+                self.cap.release()
+                self.cap = None
+                self._start_ffmpeg()
+        self.thread.start()
+        return self
+
+    def _start_ffmpeg(self):
+        step = self.sampler.step
+        cmd = ["ffmpeg", "-v", "error"]
+        if self.start_frame > 1 and self.fps > 0:
+            cmd += ["-ss", f"{(self.start_frame - 1) / self.fps:.6f}"]
+        cmd += ["-i", self.video_path,
+                "-vf", f"select='not(mod(n\\,{step}))',scale={self.out_width}:{self.out_height}",
+                "-vsync", "0"]
+        if self.end_frame is not None:
+            cmd += ["-frames:v", str(-(-(self.end_frame - self.start_frame + 1) // step))]
+        cmd += ["-f", "rawvideo", "-pix_fmt", "rgb24", "-"]
+        self.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                        bufsize=self.out_width * self.out_height * 3)
+
+    def _reader_loop(self):
+        try:
+            if self.process is not None:
+                self._ffmpeg_loop()
+            else:
+                self._opencv_loop()
+        except Exception as e:
+            logger.error(f"FrameReader failed on '{self.video_path}': {e}")
+        finally:
+            self.stopped = True
+            self.ring.close()
+
+    def _opencv_loop(self):
+        resize = (self.out_width, self.out_height) != (self.width, self.height)
+        needs_frames = self.sampler.mode != "fps"
+        raw = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        small = np.empty((self.out_height, self.out_width, 3), dtype=np.uint8) if resize else raw
+        frame_number = self.start_frame - 1
+        if frame_number:
+            # Frames are labelled from where the seek really landed, so shard timelines line up
+            frame_number = seek_to_frame(self.cap, frame_number, self.fps)
+            if frame_number != self.start_frame - 1:
+                logger.warning(f"FrameReader: shard starting at frame {self.start_frame} resumed at {frame_number + 1}")
+        while not self.stopped and (self.end_frame is None or frame_number < self.end_frame):
+            # grab() advances without the colour conversion and copy of retrieve()
+            if not self.cap.grab():
+                break
+            frame_number += 1
+            self.frames_decoded = frame_number
+            if needs_frames:
+                ok, frame = self.cap.retrieve(raw)
+                if not ok or not self.sampler.wants(frame_number, frame):
+                    continue
+            elif not self.sampler.wants(frame_number):
+                continue
+            else:
+                ok, frame = self.cap.retrieve(raw)
+                if not ok:
+                    continue
+            slot = self.ring.slot()
+            if slot is None:
+                break
+            if resize:
+                cv2.resize(frame, (self.out_width, self.out_height), dst=small)
+            cv2.cvtColor(small if resize else frame, cv2.COLOR_BGR2RGB, dst=slot)
+            self.ring.commit(frame_number)
+
+    def _ffmpeg_loop(self):
+        step = self.sampler.step
+        frame_bytes = self.out_width * self.out_height * 3
+        index = 0
+        while not self.stopped:
+            slot = self.ring.slot()
+            if slot is None:
+                break
+            view = memoryview(slot.reshape(-1))
+            filled = 0
+            while filled < frame_bytes:
+                n = self.process.stdout.readinto(view[filled:])
+                if not n:
+                    break
+                filled += n
+            if filled < frame_bytes:
+                break
+            frame_number = self.start_frame + index * step
+            index += 1
+            self.frames_decoded = frame_number
+            self.ring.commit(frame_number)
+
+    def read(self) -> Optional[Tuple[int, np.ndarray]]:
+        if self.ring is None:
+            return None
+        if self._reading:
+            self.ring.release()
+        item = self.ring.read()
+        self._reading = item is not None
+        return item
+
+    def total_frames(self) -> int:
+        """Frames in the video: counted while decoding, or from container metadata for ffmpeg."""
+        if self.backend == "ffmpeg" and cv2 is not None:
+            cap = cv2.VideoCapture(self.video_path)
+            try:
+                count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            finally:
+                cap.release()
+            return max(count, self.frames_decoded)
+        return self.frames_decoded
+
+    def running(self):
+        return not self.stopped
+
+    def stop(self):
+        self.stopped = True
+        if self.ring is not None:
+            self.ring.close()
+        if self.process is not None and self.process.poll() is None:
+            self.process.kill()
+        if self.thread.is_alive():
+            self.thread.join(timeout=5)  # Join with a timeout
+            if self.thread.is_alive():
+                logger.warning("FrameReader thread did not terminate gracefully.")
+        if self.process is not None:
+            self.process.wait()
+        if self.cap:
+            self.cap.release()
+        logger.info("FrameReader stopped and resources released.")
@@ -0,0 +1,165 @@
+"""
+Persistent SQLite cache of LLM vibe scores.
+
+Entries are keyed per chunk by a hash of the normalized chunk text, vibe, age
+group and prompt version, and namespaced per provider/model. Expired entries
+(TTL) and the least recently used entries beyond the size cap are evicted
+every EVICT_EVERY_WRITES writes or EVICT_INTERVAL seconds, not on every write.
+Calls block on SQLite; async callers run them in a thread.
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+EVICT_EVERY_WRITES = 1000
+EVICT_INTERVAL = 300.0
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE.sub(' ', text or '').strip().lower()
+
+
+def score_cache_key(text: str, vibe: str, age_group: str, prompt_version: int) -> str:
+    payload = json.dumps([normalize_text(text), vibe, age_group, prompt_version])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    SQLite-backed key/value cache with TTL, size-capped LRU eviction and
+    hit/miss counters per namespace.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float = 30 * 24 * 3600, max_entries: int = 100000):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.metrics: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._writes_since_evict = 0
+        self._last_evict = time.monotonic()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)")
+        self._conn.commit()
+
+    def _count(self, namespace: str, field: str, n: int = 1):
+        counters = self.metrics.setdefault(namespace, {'hits': 0, 'misses': 0, 'writes': 0})
+        counters[field] += n
+
+    def get_many(self, namespace: str, keys: Iterable[str]) -> Dict[str, Dict]:
+        """Return {key: value} for the keys present and not expired."""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        now = time.time()
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM llm_cache WHERE namespace = ? AND created_at > ? "
+                    f"AND key IN ({','.join('?' * len(part))})",
+                    [namespace, now - self.ttl_seconds, *part]
+                ).fetchall()
+                found.update({key: json.loads(value) for key, value in rows})
+            if found:
+                self._conn.executemany(
+                    "UPDATE llm_cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                    [(now, namespace, key) for key in found]
+                )
+                self._conn.commit()
+        self._count(namespace, 'hits', len(found))
+        self._count(namespace, 'misses', len(keys) - len(found))
+        return found
+
+    def get(self, namespace: str, key: str) -> Optional[Dict]:
+        return self.get_many(namespace, [key]).get(key)
+
+    def put_many(self, namespace: str, items: Dict[str, Dict]):
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO llm_cache (namespace, key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(namespace, key, json.dumps(value), now, now) for key, value in items.items()]
+            )
+            self._conn.commit()
+        self._count(namespace, 'writes', len(items))
+        self._writes_since_evict += len(items)
+        if self._writes_since_evict >= EVICT_EVERY_WRITES or time.monotonic() - self._last_evict >= EVICT_INTERVAL:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used ones beyond max_entries."""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache WHERE created_at <= ?", (time.time() - self.ttl_seconds,))
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE rowid IN "
+                    "(SELECT rowid FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+            self._writes_since_evict = 0
+            self._last_evict = time.monotonic()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT namespace, COUNT(*) FROM llm_cache GROUP BY namespace").fetchall()
+        entries = dict(rows)
+        namespaces = set(entries) | set(self.metrics)
+        result = {}
+        for namespace in sorted(namespaces):
+            counters = self.metrics.get(namespace, {'hits': 0, 'misses': 0, 'writes': 0})
+            lookups = counters['hits'] + counters['misses']
+            result[namespace] = {
+                **counters,
+                'entries': entries.get(namespace, 0),
+                'hit_rate': round(counters['hits'] / lookups, 3) if lookups else 0.0,
+            }
+        return result
+
+
+_llm_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """
+    Shared cache configured by LLM_CACHE_PATH, LLM_CACHE_TTL_DAYS and LLM_CACHE_MAX_ENTRIES.
+    Returns None when LLM_CACHE_DISABLED is set.
+    """
+    global _llm_cache
+    if os.getenv("LLM_CACHE_DISABLED", "").lower() in ("1", "true", "yes"):
+        return None
+    if _llm_cache is None:
+        db_path = os.getenv("LLM_CACHE_PATH", os.path.join(os.getcwd(), "llm_cache.sqlite3"))
+        ttl_days = float(os.getenv("LLM_CACHE_TTL_DAYS", "30"))
+        max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "100000"))
+        _llm_cache = LLMResponseCache(db_path, ttl_seconds=ttl_days * 24 * 3600, max_entries=max_entries)
+        logger.info(f"[llm_cache] Using {db_path} (ttl {ttl_days:g} days, max {max_entries} entries)")
+    return _llm_cache
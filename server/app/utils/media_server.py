@@ -0,0 +1,176 @@
+"""
+Media serving with HTTP Range, size+mtime ETags and long-lived caching for
+generated clips, rendered videos and extracted clips.
+"""
+
+import os
+import re
+import asyncio
+import logging
+from email.utils import formatdate
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from starlette.responses import Response
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPES = {
+    '.mp4': 'video/mp4',
+    '.mov': 'video/quicktime',
+    '.webm': 'video/webm',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+}
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+CHUNK_SIZE = 256 * 1024
+
+# Names we generate once and never rewrite: clip_generator clips and thumbnails (uuid fragment),
+# find-by-image clips (random request id) and renderer segments (content hash)
+CONTENT_ADDRESSED_PATTERN = re.compile(
+    r'^(?:clip_\d+_[0-9a-f]{8}_\d+s-\d+s\.mp4'
+    r'|thumb_\d+_[0-9a-f]{8}_\d+s\.jpg'
+    r'|clip_\d+_[0-9a-f]{16}\.mp4'
+    r'|(?:image|text)_[0-9a-f]{16}\.mp4'
+    r'|seg_[0-9a-f]{24}\.mp4)$'
+)
+
+
+def guess_media_type(filename: str) -> str:
+    return MEDIA_TYPES.get(os.path.splitext(filename)[1].lower(), "application/octet-stream")
+
+
+def is_content_addressed(filename: str) -> bool:
+    """Whether a filename is one of our generated, never-rewritten names, so it can be cached forever."""
+    return bool(CONTENT_ADDRESSED_PATTERN.match(os.path.basename(filename)))
+
+
+def resolve_media_path(base_dir: str, relative_path: str) -> str:
+    """Resolve a request path inside base_dir, rejecting traversal and missing files."""
+    base = os.path.realpath(base_dir)
+    file_path = os.path.realpath(os.path.join(base, relative_path))
+    if os.path.commonpath([base, file_path]) != base or not os.path.isfile(file_path):
+        raise HTTPException(status_code=404, detail="File not found")
+    return file_path
+
+
+def file_etag(st: os.stat_result) -> str:
+    """ETag from size and mtime: free to compute, and changes whenever the file is rewritten."""
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    candidates = [c.strip() for c in header.split(',')]
+    return '*' in candidates or etag in candidates
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single 'bytes=' range into an inclusive (start, end) pair.
+    Returns None for headers we serve in full (multi-range, malformed, end before start).
+    Raises 416 when the range starts past the end of the file.
+    """
+    if not header.startswith('bytes=') or ',' in header:
+        return None
+    start_str, _, end_str = header[len('bytes='):].strip().partition('-')
+    try:
+        if not start_str:
+            # Suffix range: last N bytes
+            length = int(end_str)
+            if length <= 0:
+                raise ValueError
+            start, end = max(0, size - length), size - 1
+        else:
+            start = int(start_str)
+            end = int(end_str) if end_str else size - 1
+            if end_str and end < start:
+                # Syntactically invalid, so the header is ignored (RFC 7233 section 2.1)
+                raise ValueError
+    except ValueError:
+        return None
+    if start >= size:
+        raise HTTPException(status_code=416, detail="Requested range not satisfiable",
+                            headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size - 1)
+
+
+class MediaFileResponse(Response):
+    """
+    Sends a byte range of a file. Uses the ASGI zero-copy extension (sendfile)
+    when the server offers it, and falls back to chunked reads otherwise.
+    """
+
+    def __init__(self, path: str, offset: int, count: int, status_code: int,
+                 headers: Dict[str, str], media_type: str):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.offset = offset
+        self.count = count
+        self.headers["content-length"] = str(count)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope.get("method") == "HEAD" or self.count == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        zerocopy = "http.response.zerocopy" in scope.get("extensions", {})
+        with open(self.path, 'rb') as f:
+            if zerocopy:
+                await send({"type": "http.response.zerocopy", "file": f.fileno(),
+                            "offset": self.offset, "count": self.count, "more_body": False})
+                return
+            f.seek(self.offset)
+            remaining = self.count
+            while remaining > 0:
+                chunk = await asyncio.to_thread(f.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # File shrank underneath us; close the response cleanly
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+async def serve_media(request: Request, file_path: str, download_name: Optional[str] = None,
+                      immutable: Optional[bool] = None) -> Response:
+    """
+    Serve a media file with Range (206), ETag / If-None-Match (304),
+    If-Range and Cache-Control. Content-addressed names are cached as immutable.
+    """
+    st = os.stat(file_path)
+    size = st.st_size
+    filename = os.path.basename(file_path)
+    if immutable is None:
+        immutable = is_content_addressed(filename)
+    etag = file_etag(st)
+    headers = {
+        "etag": etag,
+        "accept-ranges": "bytes",
+        "cache-control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+        "last-modified": formatdate(st.st_mtime, usegmt=True),
+    }
+    if download_name:
+        headers["content-disposition"] = f'attachment; filename="{download_name}"'
+    media_type = guess_media_type(filename)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if range_header:
+        if_range = request.headers.get("if-range")
+        # A stale If-Range validator means the client must get the full, current file
+        if not if_range or if_range.strip() == etag:
+            byte_range = parse_range(range_header, size)
+
+    if byte_range is None:
+        return MediaFileResponse(file_path, 0, size, 200, headers, media_type)
+    start, end = byte_range
+    headers["content-range"] = f"bytes {start}-{end}/{size}"
+    return MediaFileResponse(file_path, start, end - start + 1, 206, headers, media_type)
@@ -0,0 +1,158 @@
+"""
+Cheap local pre-ranking of transcript chunks before LLM vibe scoring.
+
+Every chunk gets lexical (vibe keywords), sentiment and acoustic features
+(loudness, onset rate, brightness, music vs speech), computed as one count
+matrix over all chunks. The top-K candidates are then
+picked so they cover the whole video, and only those are sent to the LLM.
+"""
+
+import os
+import re
+import logging
+from typing import Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VIBE_MAX_LLM_CHUNKS = int(os.getenv("VIBE_MAX_LLM_CHUNKS", "20"))
+
+# Share of the K slots reserved for the best chunk of each time stratum
+COVERAGE_FRACTION = 0.5
+
+VIBE_KEYWORDS = {
+    "Happy": ["happy", "glad", "smile", "laugh", "joy", "great", "wonderful", "love", "yay", "awesome", "celebrate", "good"],
+    "Dramatic": ["never", "suddenly", "betray", "truth", "secret", "why", "how", "can't", "finally", "everything", "nothing", "gone"],
+    "intense": ["now", "run", "fight", "go", "hurry", "stop", "kill", "danger", "attack", "fast", "move", "watch"],
+    "Fun": ["fun", "haha", "lol", "crazy", "silly", "joke", "game", "play", "funny", "wow", "party", "dance"],
+    "Inspiring": ["dream", "believe", "achieve", "hope", "future", "change", "never give up", "together", "success", "journey", "possible", "power"],
+    "Mysterious": ["strange", "unknown", "secret", "hidden", "mystery", "dark", "who", "shadow", "clue", "disappeared", "weird", "whisper"],
+    "Emotional": ["miss", "sorry", "cry", "tears", "heart", "love", "lost", "family", "remember", "goodbye", "alone", "forgive"],
+    "cool": ["cool", "smooth", "style", "easy", "chill", "boss", "slick", "vibe", "fresh", "clean", "nice", "sick"],
+    "musical": ["sing", "song", "music", "beat", "melody", "dance", "rhythm", "la", "na", "oh", "yeah", "baby"],
+}
+
+POSITIVE_WORDS = ["good", "great", "love", "happy", "amazing", "awesome", "best", "beautiful", "wonderful",
+                  "excellent", "fun", "glad", "nice", "yes", "win", "perfect", "brilliant", "thank"]
+NEGATIVE_WORDS = ["bad", "hate", "sad", "terrible", "awful", "worst", "angry", "afraid", "scared", "no",
+                  "never", "cry", "hurt", "pain", "die", "dead", "lost", "wrong"]
+
+# Feature weights per vibe: keywords, polarity, intensity, energy, emphasis, speech rate,
+# onset rate, brightness (spectral centroid), music (1 - speech ratio)
+FEATURE_NAMES = ['keywords', 'polarity', 'intensity', 'energy', 'emphasis', 'speech_rate',
+                 'onset_rate', 'brightness', 'music']
+DEFAULT_WEIGHTS = [1.0, 0.0, 0.3, 0.3, 0.2, 0.1, 0.2, 0.0, 0.0]
+VIBE_WEIGHTS = {
+    "Happy": [1.0, 0.8, 0.1, 0.3, 0.3, 0.1, 0.2, 0.3, 0.1],
+    "Dramatic": [1.0, -0.2, 0.8, 0.3, 0.5, 0.0, 0.1, -0.1, 0.2],
+    "intense": [1.0, -0.1, 0.6, 0.8, 0.5, 0.4, 0.6, 0.3, 0.0],
+    "Fun": [1.0, 0.6, 0.2, 0.5, 0.5, 0.3, 0.3, 0.2, 0.1],
+    "Inspiring": [1.0, 0.7, 0.3, 0.2, 0.2, 0.0, 0.0, 0.0, 0.2],
+    "Mysterious": [1.0, -0.2, 0.2, -0.3, 0.3, -0.2, -0.2, -0.4, 0.2],
+    "Emotional": [1.0, -0.1, 0.8, 0.0, 0.2, -0.2, -0.3, -0.2, 0.2],
+    "cool": [1.0, 0.3, 0.0, 0.2, 0.0, 0.0, 0.1, 0.0, 0.3],
+    "musical": [0.8, 0.2, 0.0, 1.0, 0.0, -0.3, 0.5, 0.1, 1.2],
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z']+")
+
+
+def _chunk_text(chunk: Dict) -> str:
+    return (chunk.get('transcription') or {}).get('text', '') or ''
+
+
+def _zscore(values: np.ndarray) -> np.ndarray:
+    std = values.std(axis=0)
+    return np.where(std > 0, (values - values.mean(axis=0)) / np.where(std > 0, std, 1.0), 0.0)
+
+
+def chunk_features(chunks: List[Dict], vibe: str) -> np.ndarray:
+    """(n_chunks, len(FEATURE_NAMES)) feature matrix, z-scored per feature."""
+    keywords = [w for w in VIBE_KEYWORDS.get(vibe, []) if ' ' not in w]
+    phrases = [w for w in VIBE_KEYWORDS.get(vibe, []) if ' ' in w]
+    vocab = {w: i for i, w in enumerate(dict.fromkeys(keywords + POSITIVE_WORDS + NEGATIVE_WORDS))}
+    # vocab -> (keyword, positive, negative) membership
+    membership = np.zeros((len(vocab), 3), dtype=np.float32)
+    for word, i in vocab.items():
+        membership[i] = [word in keywords, word in POSITIVE_WORDS, word in NEGATIVE_WORDS]
+
+    n = len(chunks)
+    rows, cols = [], []
+    word_counts = np.zeros(n, dtype=np.float32)
+    emphasis = np.zeros(n, dtype=np.float32)
+    phrase_hits = np.zeros(n, dtype=np.float32)
+    for row, chunk in enumerate(chunks):
+        text = _chunk_text(chunk).lower()
+        tokens = TOKEN_PATTERN.findall(text)
+        word_counts[row] = len(tokens)
+        emphasis[row] = text.count('!') + text.count('?')
+        phrase_hits[row] = sum(text.count(p) for p in phrases)
+        ids = [vocab[t] for t in tokens if t in vocab]
+        rows.extend([row] * len(ids))
+        cols.extend(ids)
+
+    counts = np.zeros((n, len(vocab)), dtype=np.float32)
+    if rows:
+        np.add.at(counts, (np.array(rows), np.array(cols)), 1.0)
+    hits = counts @ membership  # (n, 3): keyword, positive, negative
+    norm = np.sqrt(np.maximum(word_counts, 1.0))
+    durations = np.array([max(float(c.get('end_time', 0)) - float(c.get('start_time', 0)), 1e-3) for c in chunks],
+                         dtype=np.float32)
+    acoustics = [(c.get('transcription') or {}).get('acoustic') or {} for c in chunks]
+    energy = np.array([float(a.get('rms') or (c.get('transcription') or {}).get('audio_rms') or 0.0)
+                       for a, c in zip(acoustics, chunks)], dtype=np.float32)
+    onset_rate = np.array([float(a.get('onset_rate', 0.0)) for a in acoustics], dtype=np.float32)
+    brightness = np.array([float(a.get('spectral_centroid', 0.0)) for a in acoustics], dtype=np.float32)
+    # Chunks without acoustic features count as neutral (0.5) on the speech/music axis
+    music = np.array([1.0 - float(a.get('speech_ratio', 0.5)) for a in acoustics], dtype=np.float32)
+
+    features = np.stack([
+        (hits[:, 0] + 2.0 * phrase_hits) / norm,
+        (hits[:, 1] - hits[:, 2]) / norm,
+        (hits[:, 1] + hits[:, 2]) / norm,
+        energy,
+        emphasis / norm,
+        word_counts / durations,
+        onset_rate,
+        brightness,
+        music,
+    ], axis=1)
+    return _zscore(features)
+
+
+def prerank_scores(chunks: List[Dict], vibe: str) -> np.ndarray:
+    """Weighted pre-rank score per chunk; higher means more likely to match the vibe."""
+    if not chunks:
+        return np.zeros(0, dtype=np.float32)
+    weights = np.array(VIBE_WEIGHTS.get(vibe, DEFAULT_WEIGHTS), dtype=np.float32)
+    return chunk_features(chunks, vibe) @ weights
+
+
+def select_candidates(chunks: List[Dict], vibe: str, k: int = VIBE_MAX_LLM_CHUNKS) -> List[Dict]:
+    """
+    Pick up to k chunks for LLM scoring: the best chunk of each time stratum first
+    (so late moments are always considered), then the best of the rest by score.
+    Returned in timeline order.
+    """
+    if len(chunks) <= k:
+        return list(chunks)
+    scores = prerank_scores(chunks, vibe)
+    starts = np.array([float(c.get('start_time', 0)) for c in chunks])
+    n_strata = max(1, int(round(k * COVERAGE_FRACTION)))
+    edges = np.linspace(starts.min(), starts.max(), n_strata + 1)
+    strata = np.clip(np.searchsorted(edges, starts, side='right') - 1, 0, n_strata - 1)
+
+    selected = set()
+    for stratum in range(n_strata):
+        members = np.nonzero(strata == stratum)[0]
+        if len(members):
+            selected.add(int(members[np.argmax(scores[members])]))
+    for index in np.argsort(-scores, kind='stable'):
+        if len(selected) >= k:
+            break
+        selected.add(int(index))
+
+    logger.info(f"[prerank] Selected {len(selected)} of {len(chunks)} chunks for '{vibe}' "
+                f"({n_strata} time strata)")
+    return [chunks[i] for i in sorted(selected, key=lambda i: starts[i])]
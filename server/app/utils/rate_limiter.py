@@ -0,0 +1,177 @@
+"""
+Rate-limit-aware scheduler for LLM calls.
+
+Combines a token bucket (requests per minute) with adaptive concurrency
+(additive increase, multiplicative decrease on 429) and honours the
+provider's retry-after hint. One scheduler per provider is shared by every
+analyzer that talks to it.
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Status codes that mean "slow down" rather than "this request is broken"
+RATE_LIMIT_STATUS_CODES = {429, 503, 529}
+RATE_LIMIT_ERROR_NAMES = {'RateLimitError', 'ResourceExhausted', 'TooManyRequests', 'OverloadedError'}
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def rate_limit_retry_after(error: Exception) -> Optional[float]:
+    """
+    If `error` is a rate-limit / overload error, return the suggested wait in
+    seconds (0.0 when the provider gave no hint). Returns None for other errors.
+    """
+    response = getattr(error, 'response', None)
+    status = getattr(error, 'status_code', None) or getattr(response, 'status_code', None)
+    # google.api_core and google-genai errors carry the HTTP status as an int `code`
+    code = getattr(error, 'code', None)
+    if status is None and isinstance(code, int):
+        status = code
+    # Only status codes and exception types count: a "429" in the message may be a size, id or port
+    is_rate_limited = (
+        status in RATE_LIMIT_STATUS_CODES
+        or type(error).__name__ in RATE_LIMIT_ERROR_NAMES
+    )
+    if not is_rate_limited:
+        return None
+    headers = getattr(response, 'headers', None) or {}
+    retry_after_ms = _parse_retry_after(headers.get('retry-after-ms'))
+    if retry_after_ms is not None:
+        return retry_after_ms / 1000.0
+    return _parse_retry_after(headers.get('retry-after')) or 0.0
+
+
+class LLMScheduler:
+    """
+    Token bucket plus AIMD concurrency limit for one LLM provider.
+
+    - At most `requests_per_minute` calls start per minute (bursts up to `max_concurrency`).
+    - The concurrency limit grows by ~1 per `limit` successes and halves on a 429.
+    - A 429 pauses all new calls for the retry-after period before retrying.
+    """
+
+    def __init__(self, name: str, requests_per_minute: float = 50, max_concurrency: int = 5,
+                 min_concurrency: int = 1, max_retries: int = 5, base_backoff: float = 1.0):
+        self.name = name
+        self.rate = requests_per_minute / 60.0
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.limit = float(self.max_concurrency)
+        self.tokens = float(self.max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._last_refill = time.monotonic()
+        self._condition: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {'calls': 0, 'rate_limited': 0, 'retries': 0}
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(float(self.max_concurrency), self.tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def _loop_condition(self) -> asyncio.Condition:
+        """The condition for the running loop; a new loop (asyncio.run in scripts, tests) gets a fresh one."""
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._loop is not loop:
+            if self._loop is not None:
+                # Calls of the previous loop can no longer release their slots
+                self.in_flight = 0
+            self._condition = asyncio.Condition()
+            self._loop = loop
+        return self._condition
+
+    async def _acquire(self):
+        async with self._loop_condition():
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.in_flight >= int(self.limit):
+                    wait = None
+                else:
+                    self._refill()
+                    if self.tokens >= 1.0:
+                        self.tokens -= 1.0
+                        self.in_flight += 1
+                        return
+                    wait = (1.0 - self.tokens) / self.rate if self.rate > 0 else 1.0
+                try:
+                    await asyncio.wait_for(self._condition.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _release(self, succeeded: bool = False, rate_limited_for: Optional[float] = None):
+        """Give the slot back; successes grow the limit, rate limits halve it and pause new calls."""
+        async with self._loop_condition():
+            self.in_flight = max(0, self.in_flight - 1)
+            if succeeded:
+                self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+            elif rate_limited_for is not None:
+                self.limit = max(float(self.min_concurrency), self.limit / 2.0)
+                self.paused_until = max(self.paused_until, time.monotonic() + rate_limited_for)
+            self._condition.notify_all()
+
+    async def run(self, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Await `fn(*args, **kwargs)` within the provider's limits, retrying on rate limits."""
+        for attempt in range(self.max_retries + 1):
+            await self._acquire()
+            self.stats['calls'] += 1
+            succeeded = False
+            rate_limited_for = None
+            try:
+                result = await fn(*args, **kwargs)
+                succeeded = True
+                return result
+            except Exception as e:
+                retry_after = rate_limit_retry_after(e)
+                if retry_after is None or attempt == self.max_retries:
+                    raise
+                # No hint from the provider: exponential backoff with jitter
+                rate_limited_for = retry_after or self.base_backoff * (2 ** attempt) + random.uniform(0, 0.5)
+                self.stats['rate_limited'] += 1
+                self.stats['retries'] += 1
+            finally:
+                # Also runs on cancellation (e.g. an outer wait_for timeout), which is not an Exception;
+                # shielded so a second cancel cannot leave the slot taken
+                await asyncio.shield(self._release(succeeded, rate_limited_for))
+            logger.warning(f"[{self.name}] Rate limited, retrying in {rate_limited_for:.2f}s "
+                           f"(concurrency limit now {int(self.limit)})")
+
+
+_schedulers: Dict[str, LLMScheduler] = {}
+
+
+def get_scheduler(provider: str) -> LLMScheduler:
+    """
+    Shared scheduler for a provider. Limits come from <PROVIDER>_REQUESTS_PER_MINUTE /
+    <PROVIDER>_MAX_CONCURRENCY, falling back to LLM_REQUESTS_PER_MINUTE / LLM_MAX_CONCURRENCY.
+    """
+    if provider not in _schedulers:
+        prefix = provider.upper()
+        rpm = float(os.getenv(f"{prefix}_REQUESTS_PER_MINUTE", os.getenv("LLM_REQUESTS_PER_MINUTE", "50")))
+        concurrency = int(os.getenv(f"{prefix}_MAX_CONCURRENCY", os.getenv("LLM_MAX_CONCURRENCY", "5")))
+        _schedulers[provider] = LLMScheduler(provider, requests_per_minute=rpm, max_concurrency=concurrency)
+        logger.info(f"[{provider}] LLM scheduler: {rpm:g} req/min, up to {concurrency} concurrent")
+    return _schedulers[provider]
@@ -0,0 +1,113 @@
+"""
+Incremental parser for streamed vibe-score JSON.
+
+Fed text deltas as they arrive from a streaming LLM response, it tracks
+top-level JSON objects (a single object, or the objects of a JSON array) and
+reports when the caller has everything it needs, so the stream can be closed
+before the model finishes generating.
+"""
+
+import re
+import json
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SCORE_FIELDS = ['vibe_match_score', 'age_group_match_score', 'clip_potential_score', 'overall_score']
+
+_NUMBER_FIELD = re.compile(r'"(id|' + '|'.join(SCORE_FIELDS) + r')"\s*:\s*(-?\d+(?:\.\d+)?)\s*[,}\n]')
+
+
+class ScoreStreamParser:
+    """
+    Args:
+        expected_ids: ids of a batched request, or None for a single-object reply
+        scores_only: finish once the four score fields are known, without waiting
+            for free-text fields such as reason / best_moment
+    """
+
+    def __init__(self, expected_ids: Optional[List[int]] = None, scores_only: bool = False):
+        self.expected_ids = None if expected_ids is None else set(expected_ids)
+        self.scores_only = scores_only
+        self.text = ''
+        self.objects: List[Dict] = []
+        self.partial: Dict = {}
+        self.stopped_early = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._object_start: Optional[int] = None
+
+    def feed(self, delta: str) -> bool:
+        """Consume a text delta. Returns True once the response is complete enough to stop."""
+        base = len(self.text)
+        self.text += delta
+        for offset, ch in enumerate(delta):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == '{':
+                if self._depth == 0:
+                    self._object_start = base + offset
+                self._depth += 1
+            elif ch == '}' and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._close_object(base + offset + 1)
+        if self._depth > 0 and self._object_start is not None:
+            self.partial = {name: float(value) if '.' in value else int(value)
+                            for name, value in _NUMBER_FIELD.findall(self.text[self._object_start:])}
+        done = self.is_complete()
+        if done and self._depth > 0:
+            self.stopped_early = True
+        return done
+
+    def _close_object(self, end: int):
+        try:
+            obj = json.loads(self.text[self._object_start:end])
+            if isinstance(obj, dict):
+                self.objects.append(obj)
+        except json.JSONDecodeError as e:
+            logger.warning(f"[score_stream] Skipping malformed object: {e}")
+        self._object_start = None
+        self.partial = {}
+
+    def _has_scores(self, obj: Dict) -> bool:
+        return all(field in obj for field in SCORE_FIELDS)
+
+    def _ready_objects(self) -> List[Dict]:
+        ready = list(self.objects)
+        if self.scores_only and self._has_scores(self.partial):
+            ready.append(self.partial)
+        return ready
+
+    def is_complete(self) -> bool:
+        ready = self._ready_objects()
+        if self.expected_ids is None:
+            return any(self._has_scores(obj) for obj in ready)
+        seen = set()
+        for obj in ready:
+            try:
+                seen.add(int(obj.get('id')))
+            except (TypeError, ValueError):
+                continue
+        return self.expected_ids <= seen
+
+    def result_text(self) -> str:
+        """
+        The response as JSON text. When the stream was closed early the text is
+        rebuilt from the parsed objects so it is valid JSON.
+        """
+        if not self.stopped_early:
+            return self.text
+        ready = self._ready_objects()
+        if self.expected_ids is None:
+            return json.dumps(ready[0]) if ready else self.text
+        return json.dumps(ready)
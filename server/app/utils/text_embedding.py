@@ -0,0 +1,90 @@
+"""
+Small CPU text embeddings for local (no-API) scoring.
+
+Uses a sentence-transformers model when the package is installed
+(TEXT_EMBEDDING_MODEL, default all-MiniLM-L6-v2). Otherwise falls back to a
+hashed bag of words and word bigrams, which needs nothing beyond numpy.
+Embeddings are L2-normalized float32 rows, so a dot product is a cosine.
+"""
+
+import os
+import re
+import zlib
+import logging
+from typing import List, Optional
+
+import numpy as np
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+logger = logging.getLogger(__name__)
+
+TEXT_EMBEDDING_MODEL = os.getenv("TEXT_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+HASHING_DIM = 1024
+# Bump when the hashing tokenizer changes, so embeddings stored under the old name are not reused
+HASHING_VERSION = 2
+
+# Words in any script (\w is Unicode). Combining marks are not \w, so the mark ranges of the
+# Latin diacritics, Hebrew, Arabic, Indic (minus the dandas) and Thai blocks are added to keep
+# words like Malayalam "എനിക്ക്" whole instead of splitting them at every vowel sign
+_TOKEN_PATTERN = re.compile(
+    r"[\w'\u0300-\u036f\u0591-\u05c7\u0610-\u061a\u064b-\u065f"
+    r"\u0900-\u0963\u0966-\u0dff\u0e31-\u0e3a\u0e47-\u0e4e]+"
+)
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.where(norms > 0, norms, 1.0)).astype(np.float32)
+
+
+class TextEmbedder:
+    """Embeds a list of texts into an (n, dim) matrix in one call."""
+
+    def __init__(self, model_name: Optional[str] = TEXT_EMBEDDING_MODEL, use_model: bool = True):
+        self.model = None
+        if use_model and SentenceTransformer is not None and model_name:
+            try:
+                self.model = SentenceTransformer(model_name, device="cpu")
+                logger.info(f"[embedding] Using sentence-transformers model {model_name}")
+            except Exception as e:
+                logger.warning(f"[embedding] Could not load {model_name}, using hashed bag of words: {e}")
+        self.backend = "sentence-transformers" if self.model is not None else "hashing"
+        # Identifies the vector space, so stored embeddings are only reused by the same embedder
+        self.name = model_name if self.model is not None else f"hashing-v{HASHING_VERSION}-{HASHING_DIM}"
+        self.dim = self.model.get_sentence_embedding_dimension() if self.model is not None else HASHING_DIM
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        if self.model is not None:
+            vectors = self.model.encode(list(texts), batch_size=64, convert_to_numpy=True,
+                                        normalize_embeddings=True, show_progress_bar=False)
+            return np.asarray(vectors, dtype=np.float32)
+        return self._hash_embed(texts)
+
+    def _hash_embed(self, texts: List[str]) -> np.ndarray:
+        rows, cols = [], []
+        for row, text in enumerate(texts):
+            tokens = _TOKEN_PATTERN.findall((text or '').lower())
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            rows.extend([row] * len(features))
+            cols.extend(zlib.crc32(f.encode('utf-8')) % HASHING_DIM for f in features)
+        counts = np.zeros((len(texts), HASHING_DIM), dtype=np.float32)
+        if rows:
+            np.add.at(counts, (np.array(rows), np.array(cols)), 1.0)
+        return _normalize_rows(np.log1p(counts))
+
+
+_text_embedder: Optional[TextEmbedder] = None
+
+
+def get_text_embedder() -> TextEmbedder:
+    """Shared embedder; TEXT_EMBEDDING_MODEL=hashing skips loading a model."""
+    global _text_embedder
+    if _text_embedder is None:
+        _text_embedder = TextEmbedder(use_model=TEXT_EMBEDDING_MODEL.lower() != "hashing")
+    return _text_embedder
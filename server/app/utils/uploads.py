@@ -0,0 +1,29 @@
+"""
+Upload checks shared by the find-by-image endpoints.
+"""
+
+import os
+from typing import List
+
+from fastapi import HTTPException, UploadFile
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+def validate_uploads(video_file: UploadFile, image_file: UploadFile, reference_files: List[UploadFile]) -> None:
+    """Raise a 400 unless the video, the character image and every reference image have supported formats."""
+    if not video_file.filename or not image_file.filename:
+        raise HTTPException(status_code=400, detail="Video and image files are required.")
+
+    video_ext = os.path.splitext(video_file.filename)[1].lower()
+    image_ext = os.path.splitext(image_file.filename)[1].lower()
+
+    if video_ext not in VIDEO_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"Invalid video file format '{video_ext}'. Supported: MP4, AVI, MOV, MKV, WebM.")
+    if image_ext not in IMAGE_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"Invalid image file format '{image_ext}'. Supported: PNG, JPG, JPEG.")
+    for reference_file in reference_files:
+        reference_ext = os.path.splitext(reference_file.filename or '')[1].lower()
+        if reference_ext not in IMAGE_EXTENSIONS:
+            raise HTTPException(status_code=400, detail=f"Invalid reference image format '{reference_ext}'. Supported: PNG, JPG, JPEG.")
@@ -5,17 +5,22 @@ ClipCraft FastAPI server — Transcribe 🎙️, Analyze 🧠, Export 🎬.
 """
 
 import os
+import asyncio
 import logging
 import subprocess
 from contextlib import asynccontextmanager
 import shutil
 
-from fastapi import FastAPI, File, UploadFile
+from fastapi import FastAPI, File, UploadFile, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 
+from app.services.audio_cache import get_audio_cache
+from app.services.face_search import shutdown_face_pool
+from app.utils.media_server import serve_media, resolve_media_path
+
 load_dotenv()
 
 logging.basicConfig(
@@ -52,7 +57,17 @@ async def lifespan(app: FastAPI):
     os.makedirs(CLIPS_STORAGE_PATH, exist_ok=True)
     logger.info(f"Ensured clip output directory '{CLIPS_STORAGE_PATH}' exists.")
 
+    # Pre-warm the decoded audio cache with the bundled BGM and effects in the background
+    bundled_audio_dirs = [
+        os.path.join(PROJECT_ROOT_FOR_TITAN, "client-2/public/assets/bgm"),
+        os.path.join(PROJECT_ROOT_FOR_TITAN, "client-2/public/assets/effects"),
+        os.path.join(os.getcwd(), "uploaded_bgm"),
+    ]
+    prewarm_task = asyncio.create_task(asyncio.to_thread(get_audio_cache().prewarm, bundled_audio_dirs))
+
     yield
+    prewarm_task.cancel()
+    shutdown_face_pool()
     logger.info("🛑 Shutting down ClipCraft backend server")
     # Optional: Cleanup temp_uploads directory on shutdown if desired
     if os.path.exists(temp_upload_dir) and os.path.isdir(temp_upload_dir):
@@ -134,11 +149,14 @@ os.makedirs(os.path.join(PROJECT_ROOT_FOR_TITAN, "titan/public/assets/images"),
 # Serve static files from /assets/images - this will resolve to ROOT/titan/public/assets/images
 app.mount("/assets/images", StaticFiles(directory=os.path.join(PROJECT_ROOT_FOR_TITAN, "titan/public/assets/images")), name="assets-images")
 
-# --- Mount the directory for extracted video clips ---
-# This path '/extracted_clips' will be the URL prefix for accessing clips
-# It will serve from CLIPS_STORAGE_PATH, which is ROOT/server/public/extracted_clips
-app.mount("/extracted_clips", StaticFiles(directory=CLIPS_STORAGE_PATH), name="extracted_clips")
-logger.info(f"Mounted static directory '/extracted_clips' from '{CLIPS_STORAGE_PATH}'")
+# --- Serve extracted video clips ---
+# '/extracted_clips' is the URL prefix for accessing clips, served from CLIPS_STORAGE_PATH
+# (ROOT/server/public/extracted_clips) with Range, ETag and immutable caching
+@app.api_route("/extracted_clips/{clip_path:path}", methods=["GET", "HEAD"])
+async def get_extracted_clip(clip_path: str, request: Request):
+    file_path = resolve_media_path(CLIPS_STORAGE_PATH, clip_path)
+    return await serve_media(request, file_path)
+logger.info(f"Serving '/extracted_clips' from '{CLIPS_STORAGE_PATH}'")
 
 
 if __name__ == "__main__":
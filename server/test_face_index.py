@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test the persistent per-video face index used by find-by-image
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+
+# Add path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.face_index import FaceIndex, FaceIndexStore, FaceMatcher, ENCODING_SIZE
+from app.utils.face_timeline import FrameSampler, hits_to_clips
+
+FPS = 30
+STEP = 15
+FRAMES_AFTER_DETECTION = 40
+
+def synthetic_shards(rng, characters, present, shard_ranges):
+    """Scan results as the workers return them: every present character's face on every sampled frame."""
+    shards = []
+    for start, end in shard_ranges:
+        sampler = FrameSampler("fps", STEP)
+        sample_frames, face_frames, encodings, boxes = [], [], [], []
+        for n in range(start, end + 1):
+            if not sampler.wants(n):
+                continue
+            sample_frames.append(n)
+            for who, timeline in present.items():
+                if timeline[n - 1]:
+                    face_frames.append(n)
+                    encodings.append(characters[who] + rng.normal(0, 0.01, ENCODING_SIZE))
+                    boxes.append([10, 60, 60, 10])
+        shards.append((sample_frames, face_frames, np.asarray(encodings, np.float32).reshape(-1, ENCODING_SIZE),
+                       np.asarray(boxes, np.int32).reshape(-1, 4), end))
+    return shards
+
+def index_clips(index, encodings, tolerance=0.6):
+    """Clips from the sampled frames alone, as search_characters builds them without refinement."""
+    hits = [frame for frame, found in index.match(encodings, tolerance).items() if found]
+    return hits_to_clips(hits, index.fps, FRAMES_AFTER_DETECTION, index.total_frames)
+
+def test_face_index():
+    """Index queries reproduce the sampled scan, survive a save/load round trip and stay fast."""
+    print("🎯 Testing face index\n")
+    rng = np.random.default_rng(3)
+    frames = 18000
+    characters = {who: rng.normal(0, 0.1, ENCODING_SIZE) for who in ("alice", "bob", "carol")}
+    present = {who: np.repeat(rng.random(frames // 300) < 0.4, 300) for who in characters}
+
+    shards = synthetic_shards(rng, characters, present, [(1, 6000), (6001, 12000), (12001, frames)])
+    index = FaceIndex.from_shards(shards, FPS, STEP)
+    assert len(index.sample_frames) == frames // STEP and index.total_frames == frames
+
+    for who, timeline in present.items():
+        expected_hits = [n for n in range(1, frames + 1, STEP) if timeline[n - 1]]
+        expected = hits_to_clips(expected_hits, FPS, FRAMES_AFTER_DETECTION, frames)
+        assert index_clips(index, characters[who]) == expected, who
+    stranger = rng.normal(0, 0.1, ENCODING_SIZE)
+    assert not any(index.match(stranger, 0.6).values())
+    print(f"   ✅ {len(index)} indexed faces match the sampled scan for every character")
+
+    # One matcher, one distance matrix: several characters with several references each
+    references = {who: characters[who] + rng.normal(0, 0.01, (3, ENCODING_SIZE)) for who in characters}
+    matcher = FaceMatcher(references, 0.6)
+    expected_distances = np.linalg.norm(index.encodings[:, None, :].astype(np.float64) -
+                                        matcher.references[None, :, :], axis=2)
+    assert np.allclose(matcher.distances(index.encodings), expected_distances)
+    together = index.match_all(matcher)
+    for who in characters:
+        assert together[who] == index.match(characters[who], 0.6), who
+    assert matcher.frame_matches(np.empty((0, ENCODING_SIZE))).tolist() == [False] * 3
+    start = time.perf_counter()
+    index.match_all(matcher)
+    all_ms = (time.perf_counter() - start) * 1000
+    print(f"   ✅ {len(characters)} characters x 3 references matched in one pass ({all_ms:.1f} ms)")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        video_path = os.path.join(cache_dir, "video.mp4")
+        with open(video_path, "wb") as f:
+            f.write(os.urandom(4096))
+        store = FaceIndexStore(os.path.join(cache_dir, "index"))
+        path = store.index_path(video_path, "fps", STEP, 0.5)
+        assert store.load(path) is None
+        # Faces of frames probed while refining boundaries are stored with the index
+        probes = {1507: characters["bob"][None, :].astype(np.float32), 1508: np.empty((0, ENCODING_SIZE), np.float32)}
+        assert index.add_probes(probes) == 2 and index.add_probes(probes) == 0
+        store.save(path, index)
+        assert store.index_path(video_path, "fps", STEP, 0.5) == path
+        assert store.index_path(video_path, "fps", STEP, 1.0) != path
+
+        start = time.perf_counter()
+        loaded = store.load(path)
+        clips = index_clips(loaded, characters["alice"])
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        assert clips == index_clips(index, characters["alice"])
+        assert np.array_equal(loaded.boxes, index.boxes)
+        assert sorted(loaded.probes) == [1507, 1508] and loaded.probes[1508].shape == (0, ENCODING_SIZE)
+        assert matcher.frame_matches(loaded.probes[1507]).tolist() == [False, True, False]
+        print(f"   ✅ Reloaded index answered a query in {elapsed_ms:.1f} ms")
+
+        small = FaceIndexStore(store.cache_dir, max_bytes=1)
+        small.evict()
+        assert small.load(path) is None
+        print("   ✅ Size cap evicts stored indexes")
+    return True
+
+if __name__ == "__main__":
+    if test_face_index():
+        print("\n🎉 Face index test passed!")
+    else:
+        print("\n💥 Face index test failed!")
+        sys.exit(1)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test sampled face-search timelines against the original per-frame detection loop
+"""
+
+import os
+import sys
+import random
+
+import numpy as np
+
+# Add path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils.face_timeline import (
+    FrameSampler, sample_step, refine_hits, hits_to_clips, plan_shards, sample_transitions, refine_boundary,
+    settled_clips
+)
+
+FPS = 30
+FRAMES_AFTER_DETECTION = 40
+
+def per_frame_clips(present, fps, frames_after_detection):
+    """The original extract_character_clips loop over every frame."""
+    clips, recording, since, start = [], False, 0, -1
+    for frame_count, found in enumerate(present, start=1):
+        if found:
+            since = 0
+            if not recording:
+                recording, start = True, frame_count
+        elif recording:
+            since += 1
+            if since > frames_after_detection:
+                recording = False
+                clips.append((start / fps, (frame_count - 1) / fps))
+                since, start = 0, -1
+    if recording and start != -1:
+        clips.append((start / fps, len(present) / fps))
+    return clips
+
+def random_presence(rng, step, frames=18000):
+    """Presence runs and gaps long enough to be seen at the sampling rate."""
+    present, on = [], rng.random() < 0.5
+    while len(present) < frames:
+        if on:
+            length = rng.randint(step, 600)
+        else:
+            length = rng.choice([rng.randint(1, FRAMES_AFTER_DETECTION), rng.randint(2 * step, 900)])
+        present.extend([on] * length)
+        on = not on
+    return present[:frames]
+
+def test_face_timeline():
+    """Sampling plus boundary refinement reproduces per-frame timestamps with far fewer detections."""
+    print("🎯 Testing sampled face-search timeline\n")
+    rng = random.Random(7)
+    step = sample_step(FPS, 2.0, FRAMES_AFTER_DETECTION)
+    total_dense = total_sparse = 0
+    for trial in range(20):
+        present = random_presence(rng, step)
+        expected = per_frame_clips(present, FPS, FRAMES_AFTER_DETECTION)
+
+        sampler = FrameSampler("fps", step)
+        samples = {n: present[n - 1] for n in range(1, len(present) + 1) if sampler.wants(n)}
+        probes = []
+        hits = refine_hits(samples, lambda n: probes.append(n) or present[n - 1])
+        clips = hits_to_clips(hits, FPS, FRAMES_AFTER_DETECTION, len(present))
+
+        assert clips == expected, f"trial {trial}: {clips[:3]} != {expected[:3]}"
+        total_dense += len(present)
+        total_sparse += len(samples) + len(probes)
+    speedup = total_dense / total_sparse
+    assert speedup >= 10, f"expected at least 10x fewer detections, got {speedup:.1f}x"
+    print(f"   ✅ 20 ten-minute timelines match the per-frame loop with {speedup:.1f}x fewer detections")
+
+    # Shards scanned independently merge into the same timeline, including clips crossing shard edges
+    present = random_presence(rng, step)
+    shards = plan_shards(len(present), step, 4, 900)
+    assert len(shards) == 4 and all((start - 1) % step == 0 for start, _ in shards)
+    samples = {}
+    for start, end in shards:
+        sampler = FrameSampler("fps", step)
+        samples.update({n: present[n - 1] for n in range(start, (end or len(present)) + 1) if sampler.wants(n)})
+    transitions = sample_transitions(samples)
+    refined = [refine_boundary(miss, hit, lambda n: present[n - 1]) for miss, hit in transitions[1::2] + transitions[0::2]]
+    hits = sorted({n for n, found in samples.items() if found} | set(refined))
+    assert hits_to_clips(hits, FPS, FRAMES_AFTER_DETECTION, len(present)) == \
+        per_frame_clips(present, FPS, FRAMES_AFTER_DETECTION)
+    print(f"   ✅ {len(shards)} shards merge to the per-frame timeline")
+
+    # Clips settled on a finished prefix of the video are exactly the final clips that start there
+    expected = per_frame_clips(present, FPS, FRAMES_AFTER_DETECTION)
+    for prefix_end in range(900, len(present), 900):
+        prefix = {n: found for n, found in samples.items() if n <= prefix_end}
+        last_sample = max(prefix)
+        hits = refine_hits(prefix, lambda n: present[n - 1])
+        settled = settled_clips(hits_to_clips(hits, FPS, FRAMES_AFTER_DETECTION, last_sample), FPS, last_sample)
+        assert settled == expected[:len(settled)], f"prefix {prefix_end}"
+        assert len(settled) >= len([c for c in expected if c[1] * FPS + FRAMES_AFTER_DETECTION + step < last_sample])
+    print("   ✅ Clips settled on partial scans match the final timeline")
+
+    # Keyframe mode samples on cuts and never leaves a gap wider than the step
+    frames = [np.full((72, 128), 40 if n < 100 else 200, dtype=np.uint8) for n in range(1, 301)]
+    sampler = FrameSampler("keyframes", step)
+    sampled = [n for n, frame in enumerate(frames, start=1) if sampler.wants(n, frame)]
+    assert 100 in sampled, "the scene cut should be sampled"
+    assert max(np.diff(sampled)) <= step
+    print(f"   ✅ Keyframe mode sampled {len(sampled)} of {len(frames)} frames including the cut")
+    return True
+
+if __name__ == "__main__":
+    if test_face_timeline():
+        print("\n🎉 Face timeline test passed!")
+    else:
+        print("\n💥 Face timeline test failed!")
+        sys.exit(1)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test the offline embedding-based vibe analyzer and the manager's fallback to it
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+# Add path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.llm_service import GeminiVibeAnalyzer, SimpleVibeAnalyzer, VibeAnalysisManager, VibeAnalyzerBase
+from app.services.local_vibe_analyzer import LocalVibeAnalyzer
+from app.utils.text_embedding import TextEmbedder
+
+TEXTS = [
+    "so then we walked over to the store and picked up a few things for later",
+    "haha this is so much fun, what a silly game, let's play and dance at the party!",
+    "I miss you so much, I'm sorry I never said goodbye, my heart is lost without my family",
+    "the meeting is scheduled for tuesday at three in the main office downstairs",
+    "run! hurry, we have to go now, they are coming to attack, move fast!",
+] * 20
+
+def make_transcription(texts):
+    return {'chunks': [
+        {'id': i, 'success': True, 'start_time': i * 8.0, 'end_time': (i + 1) * 8.0,
+         'transcription': {'text': text}}
+        for i, text in enumerate(texts)
+    ]}
+
+class FailingAnalyzer:
+    async def analyze_video_chunks(self, *args, **kwargs):
+        raise ConnectionError("API unreachable")
+
+def test_local_vibe():
+    """Matching chunks rank first per vibe, offline, for every chunk at once."""
+    print("🧭 Testing local vibe analyzer\n")
+    analyzer = LocalVibeAnalyzer(embedder=TextEmbedder(use_model=False))
+    transcription = make_transcription(TEXTS)
+
+    for vibe, expected in (("Fun", 1), ("Emotional", 2), ("intense", 4)):
+        started = time.time()
+        result = asyncio.run(analyzer.analyze_video_chunks(transcription, vibe, "general"))
+        elapsed = time.time() - started
+        assert result['status'] == 'success' and result['total_chunks_analyzed'] == len(TEXTS)
+        best = result['top_clips'][0]
+        assert int(best['start_time'] // 8) % 5 == expected, f"{vibe}: unexpected best clip {best}"
+        print(f"   ✅ {vibe}: best clip '{best['text_preview'][:40]}...' ({elapsed * 1000:.0f}ms for {len(TEXTS)} chunks)")
+
+    manager = VibeAnalysisManager(FailingAnalyzer(), fallback_analyzer=analyzer)
+    outcome = asyncio.run(manager.analyze_video_vibe(transcription, {'selected_vibe': 'Fun'}))
+    assert outcome['status'] == 'success' and outcome['vibe_analysis']['fallback'] is True
+    assert outcome['vibe_analysis']['clips_found'] > 0
+    print("   ✅ Manager falls back to local scoring when the API fails")
+
+    # A fallback factory is only called once the primary analyzer has failed, and only once
+    builds = []
+    def build_local():
+        builds.append(1)
+        return analyzer
+    lazy = VibeAnalysisManager(analyzer, fallback_factory=build_local)
+    assert 'fallback' not in asyncio.run(lazy.analyze_video_vibe(transcription, {'selected_vibe': 'Fun'}))['vibe_analysis']
+    assert builds == []
+    lazy.vibe_analyzer = FailingAnalyzer()
+    for _ in range(2):
+        assert asyncio.run(lazy.analyze_video_vibe(transcription, {'selected_vibe': 'Fun'}))['vibe_analysis']['fallback']
+    assert builds == [1]
+    print("   ✅ The local fallback is built lazily, on the first failure")
+
+    # Every provider ranks and reports empty results through the shared base
+    for provider in (SimpleVibeAnalyzer, GeminiVibeAnalyzer, LocalVibeAnalyzer):
+        assert issubclass(provider, VibeAnalyzerBase)
+        assert not {'VIBES', 'AGE_GROUPS', '_rank_clips', '_empty_result'} & set(vars(provider)), provider
+    print("   ✅ All providers share the base ranking")
+    return True
+
+if __name__ == "__main__":
+    if test_local_vibe():
+        print("\n🎉 Local vibe test passed!")
+    else:
+        print("\n💥 Local vibe test failed!")
+        sys.exit(1)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test Range, conditional GET and cache headers of the media file server
+"""
+
+import os
+import sys
+import tempfile
+
+# Add path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+from app.utils.media_server import (
+    IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, is_content_addressed, parse_range,
+    resolve_media_path, serve_media
+)
+
+PAYLOAD = bytes(range(256)) * 40  # 10240 bytes
+
+def range_status(header, size=len(PAYLOAD)):
+    try:
+        return parse_range(header, size)
+    except HTTPException as e:
+        return e.status_code
+
+def test_media_server():
+    """Ranges, 304s and immutable caching behave like a static file server should."""
+    print("📼 Testing media server\n")
+    size = len(PAYLOAD)
+    assert range_status("bytes=0-99") == (0, 99)
+    assert range_status("bytes=100-") == (100, size - 1)
+    assert range_status("bytes=-100") == (size - 100, size - 1)
+    assert range_status(f"bytes=0-{size * 2}") == (0, size - 1)
+    assert range_status(f"bytes={size}-") == 416
+    assert range_status("bytes=5-2") is None, "end before start is ignored, not a 416"
+    assert range_status("bytes=0-1,5-9") is None and range_status("items=0-1") is None
+    print("   ✅ parse_range handles open, suffix, clamped, unsatisfiable and invalid ranges")
+
+    assert is_content_addressed("clip_1_1a2b3c4d_12s-20s.mp4")
+    assert is_content_addressed("thumb_3_deadbeef_4s.jpg")
+    assert is_content_addressed("clip_2_0123456789abcdef.mp4")
+    assert is_content_addressed("image_0123456789abcdef.mp4")
+    assert not is_content_addressed("party_20240101.mp4")
+    assert not is_content_addressed("my_project_1a2b3c4d_final.mp4")
+    print("   ✅ Only generated names are treated as immutable")
+
+    with tempfile.TemporaryDirectory() as media_dir:
+        for name in ("clip_1_1a2b3c4d_0s-5s.mp4", "holiday_20240101.mp4"):
+            with open(os.path.join(media_dir, name), "wb") as f:
+                f.write(PAYLOAD)
+
+        app = FastAPI()
+
+        @app.api_route("/media/{path:path}", methods=["GET", "HEAD"])
+        async def media(path: str, request: Request):
+            return await serve_media(request, resolve_media_path(media_dir, path))
+
+        client = TestClient(app)
+        full = client.get("/media/clip_1_1a2b3c4d_0s-5s.mp4")
+        assert full.status_code == 200 and full.content == PAYLOAD
+        assert full.headers["accept-ranges"] == "bytes"
+        assert full.headers["content-type"] == "video/mp4"
+        assert full.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+        etag = full.headers["etag"]
+        print("   ✅ Full GET with ETag and immutable caching")
+
+        partial = client.get("/media/clip_1_1a2b3c4d_0s-5s.mp4", headers={"Range": "bytes=100-199"})
+        assert partial.status_code == 206 and partial.content == PAYLOAD[100:200]
+        assert partial.headers["content-range"] == f"bytes 100-199/{size}"
+        assert client.get("/media/clip_1_1a2b3c4d_0s-5s.mp4", headers={"Range": "bytes=5-2"}).content == PAYLOAD
+        unsatisfiable = client.get("/media/clip_1_1a2b3c4d_0s-5s.mp4", headers={"Range": f"bytes={size}-"})
+        assert unsatisfiable.status_code == 416 and unsatisfiable.headers["content-range"] == f"bytes */{size}"
+        print("   ✅ 206 for ranges, full body for invalid ranges, 416 past the end")
+
+        assert client.get("/media/clip_1_1a2b3c4d_0s-5s.mp4", headers={"If-None-Match": etag}).status_code == 304
+        matching = client.get("/media/clip_1_1a2b3c4d_0s-5s.mp4", headers={"Range": "bytes=0-9", "If-Range": etag})
+        assert matching.status_code == 206 and matching.content == PAYLOAD[:10]
+        stale = client.get("/media/clip_1_1a2b3c4d_0s-5s.mp4", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+        assert stale.status_code == 200 and stale.content == PAYLOAD
+        print("   ✅ If-None-Match gives 304; If-Range honours the range only for the current ETag")
+
+        head = client.head("/media/clip_1_1a2b3c4d_0s-5s.mp4")
+        assert head.status_code == 200 and head.content == b"" and head.headers["content-length"] == str(size)
+        assert client.get("/media/../outside.mp4").status_code == 404
+        assert client.get("/media/missing.mp4").status_code == 404
+        print("   ✅ HEAD sends headers only; missing and outside paths are 404")
+
+        user_named = os.path.join(media_dir, "holiday_20240101.mp4")
+        first = client.get("/media/holiday_20240101.mp4")
+        assert first.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+        with open(user_named, "wb") as f:
+            f.write(PAYLOAD[::-1] + b"re-rendered")
+        second = client.get("/media/holiday_20240101.mp4", headers={"If-None-Match": first.headers["etag"]})
+        assert second.status_code == 200 and second.content.endswith(b"re-rendered")
+        print("   ✅ Other names revalidate, and a rewritten file gets a new ETag")
+    return True
+
+if __name__ == "__main__":
+    if test_media_server():
+        print("\n🎉 Media server test passed!")
+    else:
+        print("\n💥 Media server test failed!")
+        sys.exit(1)
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Test the local pre-ranker that picks chunks for LLM vibe scoring
+"""
+
+import os
+import sys
+
+# Add path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils.prerank import select_candidates, prerank_scores
+
+def make_chunk(i, text, rms=0.05):
+    return {'id': i, 'success': True, 'start_time': i * 8.0, 'end_time': (i + 1) * 8.0,
+            'transcription': {'text': text, 'audio_rms': rms}}
+
+def test_prerank():
+    """A strong late match is kept and candidates cover the whole video."""
+    print("🧮 Testing vibe pre-ranker\n")
+    filler = "so then we walked over to the store and picked up a few things for later"
+    chunks = [make_chunk(i, filler) for i in range(60)]
+    chunks[52] = make_chunk(52, "Haha this is so much fun, what a crazy silly game! Let's play and dance!", rms=0.2)
+
+    scores = prerank_scores(chunks, "Fun")
+    assert int(scores.argmax()) == 52, "the fun chunk should score highest"
+    print("   ✅ Keyword, sentiment and energy features rank the matching chunk first")
+
+    selected = select_candidates(chunks, "Fun", k=10)
+    assert len(selected) == 10
+    assert any(c['id'] == 52 for c in selected), "chunk past the first minute must be considered"
+    starts = [c['start_time'] for c in selected]
+    assert starts == sorted(starts), "candidates come back in timeline order"
+    assert starts[0] < 80 and starts[-1] > 400, "candidates should span the whole video"
+    print(f"   ✅ Selected 10 of 60 chunks spanning {starts[0]:.0f}s-{starts[-1]:.0f}s")
+
+    assert len(select_candidates(chunks[:5], "Fun", k=10)) == 5
+    print("   ✅ Short videos are passed through unchanged")
+    return True
+
+if __name__ == "__main__":
+    if test_prerank():
+        print("\n🎉 Pre-rank test passed!")
+    else:
+        print("\n💥 Pre-rank test failed!")
+        sys.exit(1)
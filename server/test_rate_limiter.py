@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Test concurrent, rate-limit-aware, streamed vibe scoring against a local mock Claude server
+"""
+
+import os
+import sys
+import re
+import json
+import time
+import asyncio
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+MAX_CONCURRENCY = 4
+RATE_LIMITED_REQUESTS = 3
+CHUNKS = 10
+CHUNKS_PER_BATCH = 2
+
+class MockClaudeHandler(BaseHTTPRequestHandler):
+    """Answers /v1/messages like the Anthropic API, returning 429 for the first few requests."""
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+    requests = 0
+    batched_requests = 0
+    streamed_requests = 0
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('content-length', 0))))
+        prompt = request['messages'][0]['content']
+        # Batched prompts list segments as "[id] (start-end): text"
+        segment_ids = [int(i) for i in re.findall(r'^\[(\d+)\]', prompt, flags=re.MULTILINE)]
+        cls = MockClaudeHandler
+        with cls.lock:
+            cls.requests += 1
+            request_number = cls.requests
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            time.sleep(0.2)  # Simulated model latency
+            if request_number <= RATE_LIMITED_REQUESTS:
+                body = {"type": "error", "error": {"type": "rate_limit_error", "message": "slow down"}}
+                self._send(429, body, {"retry-after": "0.3"})
+                return
+            scores = {"vibe_match_score": 80, "age_group_match_score": 70, "clip_potential_score": 75,
+                      "overall_score": 78, "reason": "mock", "best_moment": "mock"}
+            if segment_ids:
+                with cls.lock:
+                    cls.batched_requests += 1
+                scores = [{"id": i, **scores} for i in segment_ids]
+            message = {
+                "id": f"msg_{request_number}", "type": "message", "role": "assistant", "model": "mock",
+                "content": [{"type": "text", "text": json.dumps(scores)}],
+                "stop_reason": "end_turn", "stop_sequence": None,
+                "usage": {"input_tokens": 10, "output_tokens": 10},
+            }
+            if request.get('stream'):
+                with cls.lock:
+                    cls.streamed_requests += 1
+                self._send_stream(message)
+            else:
+                self._send(200, message)
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('content-type', 'application/json')
+        self.send_header('content-length', str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_stream(self, message):
+        """Send the message as server-sent events, a few characters per text delta."""
+        text = message['content'][0]['text']
+        events = [("message_start", {"type": "message_start",
+                                     "message": {**message, "content": [], "stop_reason": None}}),
+                  ("content_block_start", {"type": "content_block_start", "index": 0,
+                                           "content_block": {"type": "text", "text": ""}})]
+        events += [("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                            "delta": {"type": "text_delta", "text": text[i:i + 16]}})
+                   for i in range(0, len(text), 16)]
+        events += [("content_block_stop", {"type": "content_block_stop", "index": 0}),
+                   ("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn"},
+                                      "usage": {"output_tokens": 10}}),
+                   ("message_stop", {"type": "message_stop"})]
+        self.send_response(200)
+        self.send_header('content-type', 'text/event-stream')
+        self.end_headers()
+        try:
+            for name, data in events:
+                self.wfile.write(f"event: {name}\ndata: {json.dumps(data)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client closed the stream early
+
+    def log_message(self, *args):
+        pass
+
+def test_rate_limiter():
+    """Chunks are scored concurrently, capped by the scheduler, and 429s are retried."""
+    print("🚦 Testing LLM scheduler against a mock Claude server\n")
+    from app.utils.rate_limiter import LLMScheduler, rate_limit_retry_after
+
+    class StatusError(Exception):
+        status_code = 429
+    assert rate_limit_retry_after(StatusError("slow down")) == 0.0
+    assert rate_limit_retry_after(ConnectionError("sent 4290 bytes to 10.0.0.1:4293")) is None
+    print("   ✅ Rate limits are recognised by status code, not by '429' in the message")
+
+    # One scheduler serves several event loops, as module-level schedulers do across asyncio.run calls
+    scheduler = LLMScheduler("loops", requests_per_minute=6000, max_concurrency=2)
+    async def echo(value):
+        await asyncio.sleep(0.01)
+        return value
+    async def several():
+        return await asyncio.gather(*(scheduler.run(echo, i) for i in range(4)))
+    assert asyncio.run(several()) == [0, 1, 2, 3] and asyncio.run(several()) == [0, 1, 2, 3]
+    print("   ✅ Scheduler works across event loops")
+
+    # Calls cancelled by an outer timeout give their slot back without shrinking the limit
+    async def cancelled_calls():
+        for _ in range(2):
+            try:
+                await asyncio.wait_for(scheduler.run(asyncio.sleep, 10), timeout=0.05)
+            except asyncio.TimeoutError:
+                pass
+        assert scheduler.in_flight == 0, f"cancelled calls kept {scheduler.in_flight} slots"
+        return await asyncio.wait_for(scheduler.run(echo, "after"), timeout=2)
+    assert asyncio.run(cancelled_calls()) == "after"
+    assert scheduler.limit == scheduler.max_concurrency
+    print("   ✅ Cancelled calls release their slots")
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockClaudeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["ANTHROPIC_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    cache_dir = tempfile.TemporaryDirectory()
+
+    from app.services.llm_service import SimpleVibeAnalyzer
+    from app.utils.llm_cache import LLMResponseCache
+
+    try:
+        # Settings are passed explicitly: module-level defaults were read when llm_service was imported
+        cache = LLMResponseCache(os.path.join(cache_dir.name, "llm_cache.sqlite3"))
+        analyzer = SimpleVibeAnalyzer(
+            api_key="test-key", model="mock",
+            scheduler=LLMScheduler("anthropic", requests_per_minute=6000, max_concurrency=MAX_CONCURRENCY),
+            cache=cache, batch_max_chunks=CHUNKS_PER_BATCH
+        )
+        transcription = {'chunks': [
+            {'id': i, 'success': True, 'start_time': i * 8.0, 'end_time': (i + 1) * 8.0,
+             'transcription': {'text': f"chunk number {i} with some words"}}
+            for i in range(CHUNKS)
+        ]}
+        started = time.time()
+        result = asyncio.run(analyzer.analyze_video_chunks(transcription, "Happy", "general"))
+        elapsed = time.time() - started
+
+        assert result['total_chunks_analyzed'] == CHUNKS
+        assert result['clips_found'] == CHUNKS, f"all chunks should be scored, got {result['clips_found']}"
+        print(f"   ✅ {result['clips_found']} chunks scored in {elapsed:.2f}s")
+        expected_batches = CHUNKS // CHUNKS_PER_BATCH
+        assert MockClaudeHandler.batched_requests == expected_batches, \
+            f"expected {expected_batches} batched requests, got {MockClaudeHandler.batched_requests}"
+        print(f"   ✅ {CHUNKS} chunks packed into {expected_batches} batched requests")
+        assert MockClaudeHandler.streamed_requests == MockClaudeHandler.requests - RATE_LIMITED_REQUESTS
+        print("   ✅ Scores read from streamed responses")
+        assert 1 < MockClaudeHandler.max_in_flight <= MAX_CONCURRENCY, \
+            f"expected concurrent requests capped at {MAX_CONCURRENCY}, saw {MockClaudeHandler.max_in_flight}"
+        print(f"   ✅ Peak concurrency {MockClaudeHandler.max_in_flight} (limit {MAX_CONCURRENCY})")
+        stats = analyzer.scheduler.stats
+        assert stats['rate_limited'] == RATE_LIMITED_REQUESTS, f"expected {RATE_LIMITED_REQUESTS} 429s, got {stats}"
+        print(f"   ✅ {stats['rate_limited']} rate-limited requests retried after retry-after")
+        # The old sequential loop slept 1s per chunk on top of latency
+        assert elapsed < 8, "concurrent scoring should beat the sequential 1s-per-chunk loop"
+
+        # Re-running the same analysis is answered from the persistent score cache
+        requests_before = MockClaudeHandler.requests
+        rerun = asyncio.run(analyzer.analyze_video_chunks(transcription, "Happy", "general"))
+        assert rerun['clips_found'] == CHUNKS
+        assert MockClaudeHandler.requests == requests_before, "cached scores should not call the API"
+        cache_stats = cache.stats()["anthropic:mock"]
+        assert cache_stats['hits'] == CHUNKS and cache_stats['entries'] == CHUNKS, cache_stats
+        print(f"   ✅ Re-run served from cache (hit rate {cache_stats['hit_rate']})")
+
+        # Writes do not evict each time; the size cap is enforced in periodic passes
+        small = LLMResponseCache(os.path.join(cache_dir.name, "small.sqlite3"), max_entries=5)
+        small.put_many("ns", {f"key{i}": {"score": i} for i in range(10)})
+        assert small.stats()["ns"]["entries"] == 10
+        small.evict()
+        assert small.stats()["ns"]["entries"] == 5 and "key9" in small.get_many("ns", ["key9"])
+        print("   ✅ Size cap enforced by periodic eviction")
+    finally:
+        server.shutdown()
+        cache_dir.cleanup()
+    return True
+
+if __name__ == "__main__":
+    if test_rate_limiter():
+        print("\n🎉 Rate limiter test passed!")
+    else:
+        print("\n💥 Rate limiter test failed!")
+        sys.exit(1)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test the segment manifest used for incremental re-rendering
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+# Add path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.render_manifest import SegmentManifest
+from app.services.video_renderer import prune_title_cards
+
+TARGET = {'width': 1280, 'height': 720, 'fps': 25.0, 'pix_fmt': 'yuv420p', 'preset': 'fast', 'crf': 22}
+
+def test_render_manifest():
+    """Unchanged clips keep their key, edited clips get a new one, stale segments are pruned."""
+    print("🧾 Testing segment manifest\n")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        clip_a = os.path.join(temp_dir, "clip_a.mp4")
+        clip_b = os.path.join(temp_dir, "clip_b.mp4")
+        for path, payload in ((clip_a, b"aaaa"), (clip_b, b"bbbb")):
+            with open(path, "wb") as f:
+                f.write(payload)
+
+        cache_dir = os.path.join(temp_dir, "segments")
+        manifest = SegmentManifest(cache_dir)
+        keys = []
+        for path in (clip_a, clip_b):
+            key = manifest.segment_key(path, TARGET)
+            seg_path = manifest.segment_path(key)
+            with open(seg_path, "wb") as f:
+                f.write(b"segment")
+            manifest.store(key, seg_path, 3.0, path)
+            keys.append(key)
+        manifest.record_sections(keys)
+
+        # Reload from disk: both segments are reusable
+        manifest = SegmentManifest(cache_dir)
+        assert manifest.lookup(manifest.segment_key(clip_a, TARGET)), "clip_a should be cached"
+        assert manifest.lookup(manifest.segment_key(clip_b, TARGET)), "clip_b should be cached"
+        print("   ✅ Unchanged clips reuse their segments")
+
+        # A different target format must not reuse the segment
+        preview_target = {**TARGET, 'height': 360}
+        assert not manifest.lookup(manifest.segment_key(clip_a, preview_target))
+        print("   ✅ Target format is part of the key")
+
+        # Edit clip_b: new key, old segment pruned after the next render
+        with open(clip_b, "wb") as f:
+            f.write(b"edited clip b")
+        new_key = manifest.segment_key(clip_b, TARGET)
+        assert new_key != keys[1], "edited clip should get a new key"
+        seg_path = manifest.segment_path(new_key)
+        with open(seg_path, "wb") as f:
+            f.write(b"segment")
+        manifest.store(new_key, seg_path, 3.0, clip_b)
+        old_seg_path = manifest.data['segments'][keys[1]]['path']
+        manifest.record_sections([keys[0], new_key])
+        assert not os.path.exists(old_seg_path), "stale segment should be removed"
+        assert [s['key'] for s in manifest.data['sections']] == [keys[0], new_key]
+        print("   ✅ Edited clip re-keyed and stale segment pruned")
+
+        # Title cards unused for longer than the max age are deleted; clips and fresh cards stay
+        clips_dir = os.path.join(temp_dir, "generated_clips")
+        os.makedirs(clips_dir)
+        names = ["image_0123456789abcdef.mp4", "text_fedcba9876543210.mp4", "clip_1_1a2b3c4d_0s-5s.mp4"]
+        for name in names:
+            with open(os.path.join(clips_dir, name), "wb") as f:
+                f.write(b"card")
+        old = time.time() - 3600
+        for name in (names[0], names[2]):
+            os.utime(os.path.join(clips_dir, name), (old, old))
+        assert prune_title_cards(clips_dir, max_age=60) == 1
+        assert sorted(os.listdir(clips_dir)) == sorted(names[1:])
+        print("   ✅ Unused title cards pruned")
+    return True
+
+if __name__ == "__main__":
+    if test_render_manifest():
+        print("\n🎉 Segment manifest test passed!")
+    else:
+        print("\n💥 Segment manifest test failed!")
+        sys.exit(1)
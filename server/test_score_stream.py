@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Test the incremental parser used to stop streamed vibe-score responses early
+"""
+
+import os
+import sys
+import json
+
+# Add path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils.score_stream import ScoreStreamParser
+
+SCORES = {"vibe_match_score": 80, "age_group_match_score": 70, "clip_potential_score": 75, "overall_score": 78}
+
+def feed_all(parser, text, step=7):
+    """Feed text in small deltas; returns how many characters were consumed before stopping."""
+    for i in range(0, len(text), step):
+        if parser.feed(text[i:i + step]):
+            return i + step
+    return len(text)
+
+def test_score_stream():
+    """Batched and single replies are complete once every score is known."""
+    print("📡 Testing streamed score parser\n")
+    reason = "a very long explanation " * 40
+
+    batch = [{"id": i, **SCORES, "reason": reason, "best_moment": "x"} for i in (3, 4)]
+    text = "Here you go:\n" + json.dumps(batch, indent=2) + "\nLet me know if you need more."
+    parser = ScoreStreamParser(expected_ids=[3, 4])
+    consumed = feed_all(parser, text)
+    assert consumed < len(text) and not parser.stopped_early, "stops after the last object closes"
+    assert [o['id'] for o in parser.objects] == [3, 4] and parser.result_text() == text[:consumed]
+    print("   ✅ Batched reply complete as soon as every expected id is parsed")
+
+    parser = ScoreStreamParser(expected_ids=[3, 4], scores_only=True)
+    consumed = feed_all(parser, json.dumps(batch))
+    assert parser.stopped_early and consumed < len(json.dumps(batch)) - len(reason)
+    rebuilt = json.loads(parser.result_text())
+    assert [o['id'] for o in rebuilt] == [3, 4] and all(o['overall_score'] == 78 for o in rebuilt)
+    print(f"   ✅ Scores-only mode stops mid-reason ({consumed} of {len(json.dumps(batch))} chars)")
+
+    parser = ScoreStreamParser(scores_only=True)
+    single = json.dumps({**SCORES, "reason": 'says "hi} there" ' + reason})
+    feed_all(parser, single, step=3)
+    assert json.loads(parser.result_text()) == SCORES
+    print("   ✅ Single reply rebuilt as valid JSON when closed early")
+
+    parser = ScoreStreamParser(expected_ids=[1, 2])
+    feed_all(parser, json.dumps([{"id": 1, **SCORES}]))
+    assert not parser.is_complete() and parser.result_text() == json.dumps([{"id": 1, **SCORES}])
+    print("   ✅ Incomplete replies are returned unchanged")
+    return True
+
+if __name__ == "__main__":
+    if test_score_stream():
+        print("\n🎉 Score stream test passed!")
+    else:
+        print("\n💥 Score stream test failed!")
+        sys.exit(1)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Test the persistent transcript index behind the /find route
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+
+import numpy as np
+
+# Add path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from rapidfuzz import fuzz
+
+from app.services.transcript_index import (TranscriptIndex, TranscriptIndexStore, normalize_text, match_span,
+                                           MATCH_THRESHOLD)
+from app.utils.text_embedding import TextEmbedder
+
+WORDS = ["river", "market", "yesterday", "phone", "garden", "train", "window", "coffee", "morning",
+         "teacher", "bridge", "festival", "camera", "letter", "mountain", "kitchen", "music", "doctor"]
+MALAYALAM = ["ഞാൻ നാളെ വരും", "ഇത് എന്റെ വീടാണ്", "നിങ്ങൾക്ക് സുഖമാണോ", "മഴ പെയ്യുന്നു"]
+
+def linear_scan(index, query, limit):
+    """The original /find matching: substring or partial_ratio over every segment."""
+    normalized_query = normalize_text(query)
+    scored = []
+    for position, text in enumerate(index.normalized):
+        if normalized_query in text:
+            scored.append((100.0, position))
+        else:
+            score = fuzz.partial_ratio(normalized_query, text)
+            if score > MATCH_THRESHOLD:
+                scored.append((score, position))
+    scored.sort(key=lambda item: (-item[0], index.segments[item[1]]['start']))
+    return [index.segments[position] for _, position in scored[:limit]]
+
+def test_transcript_index():
+    """Indexed search agrees with a full scan, handles Indic text and survives reloads."""
+    print("🎯 Testing transcript index\n")
+    rng = random.Random(11)
+    chunks, results = [], []
+    for c in range(100):
+        chunks.append({'start_time': c * 30.0, 'end_time': (c + 1) * 30.0, 'path': f"chunk_{c}.wav"})
+        segments = [{'start': s * 6.0, 'end': s * 6.0 + 5.5,
+                     'text': ' '.join(rng.choice(WORDS) for _ in range(8)) + '.'} for s in range(5)]
+        if c % 25 == 0:
+            segments[2]['text'] = MALAYALAM[c // 25]
+        results.append({'segments': segments})
+    results[7] = {'segments': [], 'text': "The whole chunk as one transcript about the harbour"}
+    index = TranscriptIndex.from_transcriptions(chunks, results)
+    assert len(index) == 99 * 5 + 1
+
+    # Absolute timestamps, and providers without segments span their chunk
+    (segment, score), = index.search("harbour", limit=1)
+    assert (segment['start'], segment['end'], score) == (210.0, 240.0, 100.0)
+    print("   ✅ Segments carry absolute timestamps")
+
+    # Malayalam: exact phrase, and a query differing only by a zero-width joiner
+    (segment, score), = index.search("എന്റെ വീടാണ്", limit=1)
+    assert segment['text'] == MALAYALAM[1] and score == 100.0
+    assert index.search("എന്റെ\u200d വീടാണ്", limit=1)[0][0]['text'] == MALAYALAM[1]
+    print("   ✅ Malayalam phrases match through normalization")
+
+    queries = ["mountain kitchen", "the coffee", "festivl camera", "yesterday morning teacher", "nothing like it"]
+    for query in queries:
+        expected = linear_scan(index, query, 3)
+        found = [segment for segment, _ in index.search(query, limit=3)]
+        assert [s['text'] for s in found] == [s['text'] for s in expected], query
+    exact_only = index.search("festivl camera", limit=3, fuzzy=False)
+    assert exact_only == []
+    print(f"   ✅ {len(queries)} queries match the linear partial_ratio scan")
+
+    # Word timings narrow the clip to the matched words; without them it spans the segment
+    timed = TranscriptIndex.from_transcriptions(
+        [{'start_time': 60.0, 'end_time': 90.0, 'path': "chunk.wav"}],
+        [{'segments': [{'start': 2.0, 'end': 9.0, 'text': "We crossed the bridge, then had coffee.",
+                        'words': [{'word': w, 'start': 2.0 + i, 'end': 2.8 + i} for i, w in
+                                  enumerate([" We", " crossed", " the", " bridge,", " then", " had", " coffee."])]}]}])
+    (segment, _), = timed.search("the bridge")
+    assert segment['words'][0]['start'] == 62.0
+    assert match_span(segment, "the bridge") == (64.0, 65.8)
+    assert [round(t, 3) for t in match_span(segment, "brige then", padding=0.5)] == [64.5, 67.3]
+    start, end = match_span(segment, "coffee", min_duration=2.0)
+    assert round(start, 3) == 67.4 and round(end, 3) == 69.4
+    untimed = dict(segment, words=[])
+    assert match_span(untimed, "the bridge", padding=0.5) == (61.5, 69.5)
+    assert match_span({'start': 0.2, 'end': 1.0, 'words': []}, "x", padding=0.5, min_duration=2.0) == (0.0, 2.0)
+    print("   ✅ Clip spans follow the matched words, padded and widened to the minimum")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        video_path = os.path.join(cache_dir, "video.mp4")
+        with open(video_path, "wb") as f:
+            f.write(os.urandom(4096))
+        store = TranscriptIndexStore(os.path.join(cache_dir, "index"))
+        path = store.index_path(video_path, "auto", "adaptive")
+        assert store.load(path) is None
+        store.save(path, index)
+        assert store.index_path(video_path, "ml", "adaptive") != path
+
+        reloaded = TranscriptIndexStore(store.cache_dir).load(path)
+        start = time.perf_counter()
+        for query in queries:
+            reloaded.search(query, limit=3)
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        assert [s for s, _ in reloaded.search("mountain kitchen")] == [s for s, _ in index.search("mountain kitchen")]
+        print(f"   ✅ Reloaded index answers a query in {elapsed_ms:.1f} ms")
+
+        # Semantic search: one float16 matrix per video and embedder, cosine top-k over it
+        embedder = TextEmbedder(use_model=False)
+        matrix = store.load_embeddings(path, index, embedder)
+        assert matrix.dtype == np.float16 and matrix.shape == (len(index), embedder.dim)
+        embeddings_path = store.embeddings_path(path, embedder)
+        assert os.path.exists(embeddings_path)
+        fresh = TranscriptIndex.load(path)
+        assert np.array_equal(TranscriptIndexStore(store.cache_dir).load_embeddings(path, fresh, embedder), matrix)
+
+        query = "morning coffee by the river"
+        query_vector = embedder.embed([query])[0]
+        cosine = np.clip(index.embed(embedder).astype(np.float32) @ query_vector, 0, 1) * 100
+        expected = sorted(range(len(index)), key=lambda p: (-cosine[p], index.segments[p]['start']))[:5]
+        found = index.semantic_search(query, embedder, limit=5, min_score=0)
+        assert [s['start'] for s, _ in found] == [index.segments[p]['start'] for p in expected]
+        assert all(score >= 35 for _, score in index.semantic_search(query, embedder, limit=50))
+        assert index.semantic_search("nothing like it", embedder) == []
+
+        # The fuzzy share of hybrid scores is the plain search score: exact wording scores 100
+        phrase = ' '.join(index.normalized[123].split()[2:5])
+        (hybrid_top, score), = index.semantic_search(phrase, embedder, limit=1, fuzzy_weight=1.0)
+        assert score == 100.0 and hybrid_top is index.search(phrase, limit=1)[0][0]
+        start = time.perf_counter()
+        index.semantic_search(query, embedder, limit=3, fuzzy_weight=0.4)
+        hybrid_ms = (time.perf_counter() - start) * 1000
+        print(f"   ✅ Semantic and hybrid search over stored float16 embeddings ({hybrid_ms:.1f} ms)")
+
+        # The hashing embedder tokenizes any script, so Malayalam transcripts match too
+        malayalam = TranscriptIndex.from_transcriptions(
+            [{'start_time': 0.0, 'end_time': 8.0}],
+            [{'segments': [{'start': 0.0, 'end': 4.0, 'text': "നമുക്ക് കടൽത്തീരത്ത് പോകാം"},
+                           {'start': 4.0, 'end': 8.0, 'text': "എനിക്ക് നിന്നെ ഇഷ്ടമാണ്"}]}]
+        )
+        (match, _), = malayalam.semantic_search("നിന്നെ ഇഷ്ടമാണ്", embedder, limit=1)
+        assert match['start'] == 4.0
+        print("   ✅ Non-Latin transcripts embed and match")
+    return True
+
+if __name__ == "__main__":
+    if test_transcript_index():
+        print("\n🎉 Transcript index test passed!")
+    else:
+        print("\n💥 Transcript index test failed!")
+        sys.exit(1)
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Test the upload checks of the find-by-image endpoints
+"""
+
+import io
+import os
+import sys
+
+# Add path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import HTTPException, UploadFile
+
+from app.utils.uploads import validate_uploads
+
+def upload(filename):
+    return UploadFile(file=io.BytesIO(b""), filename=filename)
+
+def rejects(video, image, references=()):
+    try:
+        validate_uploads(upload(video), upload(image), [upload(name) for name in references])
+    except HTTPException as e:
+        assert e.status_code == 400
+        return e.detail
+    return None
+
+def test_upload_validation():
+    """Supported formats pass, anything else is a 400 naming the bad file."""
+    print("🎯 Testing upload validation\n")
+    assert rejects("movie.MP4", "face.jpg", ["side.PNG", "front.jpeg"]) is None
+    print("   ✅ Supported video and image formats pass")
+
+    assert "video file format '.txt'" in rejects("movie.txt", "face.jpg")
+    assert "image file format '.gif'" in rejects("movie.mkv", "face.gif")
+    assert "reference image format '.bmp'" in rejects("movie.webm", "face.png", ["side.png", "back.bmp"])
+    assert "required" in rejects("movie.mp4", "")
+    print("   ✅ Bad extensions and missing files are rejected with a 400")
+    return True
+
+if __name__ == "__main__":
+    if test_upload_validation():
+        print("\n🎉 Upload validation test passed!")
+    else:
+        print("\n💥 Upload validation test failed!")
+        sys.exit(1)